@@ -19,13 +19,46 @@ import socket
 import platform
 import datetime
 import random
+import atexit
+import argparse
+import multiprocessing
+import queue
+import signal
+import csv
 from pathlib import Path
+from itertools import chain
+from contextlib import contextmanager
 from threading import Thread, Lock
 from logging.handlers import RotatingFileHandler
 
-from flask import Flask, jsonify, request, render_template, send_from_directory
+from flask import Flask, Response, jsonify, request, render_template, send_from_directory
 from flask_cors import CORS
 
+from history_store import create_history_store, DEFAULT_ENGINE
+from history_columns import HistoryColumns, records_to_columns
+from net_counters import InterfaceSampler
+from monitor_pipeline import SamplePipeline, MinuteAccumulator, Sample
+from interface_history import InterfaceSeries
+from interface_inventory import InterfaceInventory
+from traffic_attribution import TrafficAttribution, BY_PROCESS, BY_CONNECTION
+from flow_accounting import FlowAccounting
+from flow_history import FlowSeries
+from report_stream import FlowableStream, chunked
+from scheduler import TickScheduler, MISSED_SKIP
+from broadcast import StatusBroadcaster, StreamSlots
+from response_cache import ResponseCache, make_entry, entry_variant, supported_encodings
+from history_rollups import HistoryRollups, WindowAggregates, LatencyWindows, RAW_RESOLUTION
+from latency_probe import (LatencyProber, EchoServer, ALL_TARGETS, DEFAULT_ECHO_PORT,
+                           DEFAULT_ECHO_BIND, DEFAULT_TARGETS as DEFAULT_LATENCY_TARGETS,
+                           DEFAULT_DNS_TTL)
+from latency_history import LatencySeries
+from speedtest_jobs import SpeedTestRunner, PeriodicSpeedTests
+from speedtest_history import SpeedTestSeries
+from throughput import ThroughputServer, measure as measure_throughput, DOWNLOAD, UPLOAD
+from speedtest_client import SpeedtestClientCache
+from shared_state import (SharedStatus, SHARED_MEMORY_AVAILABLE,
+                          ROLE_STANDALONE, ROLE_COLLECTOR, ROLE_READER)
+
 # Importações condicionais para lidar com dependências opcionais
 SPEEDTEST_AVAILABLE = True
 try:
@@ -34,18 +67,18 @@ except ImportError:
     SPEEDTEST_AVAILABLE = False
     logging.warning("Módulo 'speedtest-cli' não encontrado. Testes de velocidade simulados serão usados.")
 
-NETIFACES_AVAILABLE = True
+MSGPACK_AVAILABLE = True
 try:
-    import netifaces
+    import msgpack
 except ImportError:
-    NETIFACES_AVAILABLE = False
-    logging.warning("Módulo 'netifaces' não encontrado. Detecção de interfaces limitada será usada.")
+    MSGPACK_AVAILABLE = False
+    logging.warning("Módulo 'msgpack' não encontrado. Respostas MessagePack não estarão disponíveis.")
 
 REPORTLAB_AVAILABLE = True
 try:
     from reportlab.lib.pagesizes import A4
     from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
     from reportlab.lib.styles import getSampleStyleSheet
 except ImportError:
     REPORTLAB_AVAILABLE = False
@@ -54,7 +87,7 @@ except ImportError:
 # Configuração de logging
 def setup_logging(log_dir=None):
     if not log_dir:
-        log_dir = os.path.join(os.path.dirname(__file__), 'logs')
+        log_dir = os.environ.get('NETWORK_MONITOR_LOG_DIR') or os.path.join(os.path.dirname(__file__), 'logs')
     
     os.makedirs(log_dir, exist_ok=True)
     log_file = os.path.join(log_dir, 'network_monitor.log')
@@ -81,10 +114,25 @@ logger = setup_logging()
 
 # Caminhos importantes
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
+# Diretórios de dados e de logs podem ser trocados por variáveis de ambiente
+DATA_DIR = os.environ.get('NETWORK_MONITOR_DATA_DIR') or os.path.join(BASE_DIR, 'data')
 STATIC_DIR = os.path.join(BASE_DIR, 'static')
 REPORTS_DIR = os.path.join(DATA_DIR, 'reports')
 HISTORY_FILE = os.path.join(DATA_DIR, 'history.json')
+SPEEDTEST_DB = os.path.join(DATA_DIR, 'speedtests.db')
+SPEEDTEST_LOCK = os.path.join(DATA_DIR, 'speedtest.lock')
+LATENCY_DB = os.path.join(DATA_DIR, 'latency.db')
+INTERFACE_DB = os.path.join(DATA_DIR, 'interfaces.db')
+TRAFFIC_FILE = os.path.join(DATA_DIR, 'traffic.json')
+FLOW_DB = os.path.join(DATA_DIR, 'flows.db')
+# Quantidade de consumidores publicada pelo coletor para os workers leitores
+TRAFFIC_PUBLISHED = 100
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+# Entradas dos relatórios sem período e linhas do histórico por página do PDF (A4)
+REPORT_RECENT_ENTRIES = 10
+REPORT_PDF_ROWS = 36
+# Linhas na primeira página do histórico, que também traz o título da seção
+REPORT_PDF_FIRST_ROWS = 34
 CONFIG_FILE = os.path.join(DATA_DIR, 'config.json')
 
 # Cria diretórios necessários
@@ -99,8 +147,33 @@ CORS(app)  # Habilita CORS para todas as rotas
 state = {
     'monitoring': False,
     'monitor_thread': None,
+    'writer_thread': None,
+    'pipeline': None,
+    'scheduler': None,
+    'broadcaster': StatusBroadcaster(),
+    'stream_slots': StreamSlots(4),
+    'response_cache': ResponseCache(),
+    'speedtests': None,
+    'speedtest_client': None,
+    'speedtest_series': None,
+    'speedtest_schedule': None,
+    'throughput_server': None,
+    'prober': None,
+    'traffic': None,
+    'flows': None,
+    'flow_series': None,
+    'echo_server': None,
+    'latency_series': None,
+    'latency_windows': LatencyWindows(),
+    'latency_cursor': None,
+    'history_version': 0,
+    'history_cursor': None,
+    'role': ROLE_STANDALONE,
+    'shared': None,
+    'commands': None,
     'stop_flag': False,
     'data_lock': Lock(),
+    'control_lock': Lock(),
     'current': {
         'download': 0.0,
         'upload': 0.0,
@@ -109,12 +182,72 @@ state = {
         'totalUpload': 0,
         'lastUpdate': None
     },
-    'history': [],
+    # Valores atuais de cada interface monitorada (mesmos campos de 'current')
+    'interfaces': {},
+    'interface_series': None,
+    'interface_inventory': None,
+    'history': HistoryColumns(),
+    'history_store': None,
+    'rollups': HistoryRollups(),
+    'aggregates': WindowAggregates(),
     'config': {
         'updateInterval': 5,
         'maxHistoryDays': 30,
         'selectedInterface': '',
-        'startWithMonitoring': True
+        'monitoredInterfaces': [],
+        'interfaceCheckInterval': 5,
+        'startWithMonitoring': True,
+        'historyEngine': DEFAULT_ENGINE,
+        'historyBatchSize': 50,
+        'historyFlushInterval': 300,
+        'historyMaxPoints': 3000,
+        'sampleQueueSize': 1024,
+        'missedTicks': MISSED_SKIP,
+        'historyCleanupInterval': 3600,
+        'server': 'auto',
+        'serverWorkers': 1,
+        'serverThreads': 8,
+        'maxStreams': 4,
+        'speedtestServerTtl': 3600,
+        'speedtestThreads': 0,
+        'speedtestQuickDuration': 5,
+        'speedtestSchedule': False,
+        'speedtestInterval': 21600,
+        'speedtestJitter': 600,
+        'speedtestWindows': [],
+        'speedtestScheduleQuick': True,
+        'speedtestMode': 'internet',
+        'speedtestLocalHost': '127.0.0.1',
+        # Outros hosts aceitos no campo 'host' de POST /api/speedtest
+        'speedtestLocalHosts': [],
+        'speedtestStreams': 4,
+        'speedtestLocalDuration': 10,
+        'throughputServer': False,
+        'throughputPort': 5201,
+        # 127.0.0.1 atende só esta máquina; '0.0.0.0' abre o servidor para a rede
+        'throughputBind': '127.0.0.1',
+        'throughputMaxConnections': 16,
+        # Alvos externos por padrão; [] desativa a medição ativa (ping fica em 0)
+        'latencyTargets': list(DEFAULT_LATENCY_TARGETS),
+        'latencyDnsTtl': DEFAULT_DNS_TTL,
+        'latencyInterval': 5,
+        'latencyCount': 3,
+        'latencyTimeout': 2.0,
+        'latencyConcurrency': 256,
+        'echoServer': False,
+        'echoPort': DEFAULT_ECHO_PORT,
+        'echoBind': DEFAULT_ECHO_BIND,
+        'trafficAttribution': False,
+        'trafficInterval': 5,
+        'trafficRescanInterval': 30,
+        'trafficTopN': 10,
+        'flowAccounting': False,
+        'flowInterface': '',
+        'flowIdleTimeout': 15,
+        'flowActiveTimeout': 60,
+        'flowMaxFlows': 262144,
+        'flowSampling': 1,
+        'flowRingBlocks': 32
     }
 }
 
@@ -144,30 +277,208 @@ def save_config():
 # Carregar histórico
 def load_history():
     try:
-        if os.path.exists(HISTORY_FILE):
-            with open(HISTORY_FILE, 'r') as f:
-                state['history'] = json.load(f)
-                logger.info(f"Histórico carregado com sucesso: {len(state['history'])} registros")
+        if state['history_store'] is None:
+            engine = state['config'].get('historyEngine', DEFAULT_ENGINE)
+            if state['role'] != ROLE_STANDALONE:
+                # Entre processos o histórico é compartilhado pelo SQLite
+                engine = 'sqlite'
+            options = {}
+            if engine == 'sqlite':
+                options = {
+                    'batch_size': state['config'].get('historyBatchSize', 50),
+                    'flush_interval': state['config'].get('historyFlushInterval', 300)
+                }
+            state['history_store'] = create_history_store(
+                engine,
+                DATA_DIR,
+                legacy_file=HISTORY_FILE,
+                **options
+            )
+        
+        # Reconstrói o histórico em memória (colunar) a partir do log de segmentos
+        # (backends indexados, como o SQLite, não mantêm cópia em memória)
+        state['history'] = HistoryColumns(state['history_store'].load())
+        logger.info(f"Histórico carregado com sucesso: {len(state['history'])} registros")
+        
+        # Reconstrói as camadas de agregação (5 min, 1 h, 1 dia) e as somas das janelas
+        if state['history_store'].indexed:
+            cutoff = datetime.datetime.now() - datetime.timedelta(days=state['config']['maxHistoryDays'])
+            records = state['history_store'].iter_range(cutoff.timestamp() * 1000)
         else:
-            state['history'] = []
-            save_history()
-            logger.info("Arquivo de histórico criado vazio")
+            records = state['history']
+        with state['data_lock']:
+            state['rollups'].clear()
+            state['aggregates'].clear()
+            for record in records:
+                state['rollups'].add(record)
+                state['aggregates'].add(record)
+                state['history_cursor'] = record['timestamp']
     except Exception as e:
         logger.error(f"Erro ao carregar histórico: {e}")
-        state['history'] = []
+        state['history'] = HistoryColumns()
+
+# Abre a série de latência e reconstrói os percentis das janelas (dia/semana/mês)
+def load_latency_series():
+    try:
+        if state['latency_series'] is None:
+            state['latency_series'] = LatencySeries(LATENCY_DB)
+        
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=state['config']['maxHistoryDays'])
+        histograms = state['latency_series'].iter_histograms(cutoff.timestamp() * 1000)
+        with state['data_lock']:
+            state['latency_windows'].clear()
+            for timestamp, histogram in histograms:
+                state['latency_windows'].add(timestamp, histogram)
+                state['latency_cursor'] = timestamp
+    except Exception as e:
+        logger.error(f"Erro ao carregar a série de latência: {e}")
+
+# Grava as medições de latência de um minuto fechado (por alvo e agregada)
+def record_latency(timestamp, rows, histogram):
+    with state['data_lock']:
+        state['latency_windows'].add(timestamp, histogram)
+        state['latency_cursor'] = timestamp
+        history_changed()
+    
+    if state['latency_series'] is not None:
+        state['latency_series'].append_minute(timestamp, rows, histogram, ALL_TARGETS)
+    publish_history()
+
+# Maiores consumidores de banda (por processo ou por conexão)
+def traffic_top(attribution, count, by):
+    return {
+        'stats': attribution.stats(),
+        'talkers': attribution.top(count, by)
+    }
+
+# No processo coletor, publica os maiores consumidores para os workers leitores
+def publish_traffic(attribution):
+    if state['role'] != ROLE_COLLECTOR:
+        return
+    snapshot = {by: attribution.top(TRAFFIC_PUBLISHED, by) for by in (BY_PROCESS, BY_CONNECTION)}
+    snapshot['stats'] = attribution.stats()
+    temp_file = TRAFFIC_FILE + '.tmp'
+    with open(temp_file, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(temp_file, TRAFFIC_FILE)
+
+# Abre a série de fluxos exportados pela contabilização passiva
+def load_flow_series():
+    try:
+        if state['flow_series'] is None:
+            state['flow_series'] = FlowSeries(FLOW_DB)
+    except Exception as e:
+        logger.error(f"Erro ao abrir o histórico de fluxos: {e}")
+
+# Grava os fluxos exportados (ociosos, longos ou no encerramento)
+def record_flows(records):
+    if state['flow_series'] is not None:
+        state['flow_series'].append_many(records)
+
+# Contabilizador de fluxos com os parâmetros da configuração
+def create_flow_accounting():
+    config = state['config']
+    return FlowAccounting(
+        idle_timeout=int(config.get('flowIdleTimeout', 15)),
+        active_timeout=int(config.get('flowActiveTimeout', 60)),
+        max_flows=int(config.get('flowMaxFlows', 262144)),
+        sampling=int(config.get('flowSampling', 1)),
+        on_export=record_flows
+    )
+
+# Captura passiva de fluxos (AF_PACKET; requer root ou CAP_NET_RAW)
+def start_flow_accounting():
+    if not state['config'].get('flowAccounting'):
+        return None
+    flows = create_flow_accounting()
+    try:
+        flows.start(state['config'].get('flowInterface') or None,
+                    block_count=int(state['config'].get('flowRingBlocks', 32)))
+    except (OSError, AttributeError) as e:
+        logger.error(f"Erro ao iniciar a captura de pacotes: {e}")
+        return None
+    state['flows'] = flows
+    return flows
+
+# Reproduz um arquivo .pcap na contabilização de fluxos (modo offline)
+def replay_pcap(path):
+    load_flow_series()
+    flows = create_flow_accounting()
+    started = time.perf_counter()
+    stats = flows.replay(path)
+    elapsed = time.perf_counter() - started
+    logger.info(f"{path}: {stats['packets']} pacotes, {stats['exportedFlows']} fluxos exportados "
+                f"em {elapsed:.2f} s ({stats['packets'] / elapsed if elapsed > 0 else 0:.0f} pacotes/s)")
+    return stats
+
+# Inventário de interfaces em cache, atualizado por netlink ou verificação periódica
+def start_interface_inventory():
+    if state['interface_inventory'] is None:
+        state['interface_inventory'] = InterfaceInventory(
+            check_interval=max(float(state['config'].get('interfaceCheckInterval', 5)), 0.5))
+        state['interface_inventory'].start()
+
+# Abre as séries por interface (SQLite próprio, indexado por interface e timestamp)
+def load_interface_series():
+    try:
+        if state['interface_series'] is None:
+            state['interface_series'] = InterfaceSeries(INTERFACE_DB)
+    except Exception as e:
+        logger.error(f"Erro ao abrir o histórico por interface: {e}")
+
+# Adicionar registro ao histórico (uma única escrita por amostra)
+def append_history(record):
+    append_history_batch([record])
+
+# Adicionar um lote de registros ao histórico (uma escrita por lote)
+def append_history_batch(records):
+    if not records:
+        return
+    
+    with state['data_lock']:
+        for record in records:
+            if not history_indexed():
+                state['history'].append(record)
+            state['rollups'].add(record)
+            state['aggregates'].add(record)
+        history_changed()
+    
+    try:
+        if state['history_store'] is not None:
+            state['history_store'].append_many(records)
+        publish_history()
+    except Exception as e:
+        logger.error(f"Erro ao gravar registros no histórico: {e}")
+
+# Invalida as respostas de histórico em cache (chamar com data_lock)
+def history_changed():
+    state['history_version'] += 1
+    state['response_cache'].invalidate('history')
+
+# Avisa os workers da API que há registros novos no histórico (processo coletor)
+def publish_history():
+    if state['role'] != ROLE_COLLECTOR:
+        return
+    # Os workers leem o banco: os registros precisam estar gravados antes do aviso
+    state['history_store'].flush()
+    state['shared'].publish_history(state['history_version'])
+
+# Indica se as consultas de histórico são respondidas pelo backend
+def history_indexed():
+    return state['history_store'] is not None and state['history_store'].indexed
 
 # Salvar histórico
 def save_history():
     try:
-        with open(HISTORY_FILE, 'w') as f:
-            json.dump(state['history'], f, indent=4)
+        if state['history_store'] is not None:
+            state['history_store'].flush()
         logger.info("Histórico salvo com sucesso")
     except Exception as e:
         logger.error(f"Erro ao salvar histórico: {e}")
 
 # Limpar histórico antigo
 def clean_old_history():
-    if not state['history']:
+    if not state['history'] and not history_indexed():
         return
     
     try:
@@ -176,67 +487,46 @@ def clean_old_history():
         cutoff = now - datetime.timedelta(days=max_days)
         cutoff_timestamp = cutoff.timestamp() * 1000
         
-        old_count = len(state['history'])
-        state['history'] = [record for record in state['history'] 
-                           if record['timestamp'] >= cutoff_timestamp]
-        new_count = len(state['history'])
+        with state['data_lock']:
+            removed = state['history'].trim(cutoff_timestamp)
+            state['rollups'].trim(cutoff_timestamp)
+            state['aggregates'].trim(cutoff_timestamp)
+            history_changed()
         
-        if old_count != new_count:
-            logger.info(f"Limpeza de histórico: {old_count - new_count} registros removidos")
-            save_history()
+        if removed:
+            logger.info(f"Limpeza de histórico: {removed} registros removidos")
+        
+        # Descarta segmentos inteiros expirados e compacta o restante
+        if state['history_store'] is not None:
+            state['history_store'].drop_expired(cutoff_timestamp)
+            state['history_store'].compact(cutoff_timestamp)
+        if state['speedtest_series'] is not None:
+            state['speedtest_series'].drop_expired(cutoff_timestamp)
+        if state['interface_series'] is not None:
+            state['interface_series'].drop_expired(cutoff_timestamp)
+        if state['flow_series'] is not None:
+            state['flow_series'].drop_expired(cutoff_timestamp)
+        if state['latency_series'] is not None:
+            state['latency_series'].drop_expired(cutoff_timestamp)
+            with state['data_lock']:
+                state['latency_windows'].trim(cutoff_timestamp)
+        publish_history()
     except Exception as e:
         logger.error(f"Erro ao limpar histórico antigo: {e}")
 
-# Obter interfaces de rede
-def get_network_interfaces():
-    interfaces = []
-    
-    try:
-        if NETIFACES_AVAILABLE:
-            # Usa netifaces para obter informações detalhadas
-            for iface in netifaces.interfaces():
-                try:
-                    # Pula interfaces que não têm endereços IP
-                    if netifaces.AF_INET not in netifaces.ifaddresses(iface):
-                        continue
-                    
-                    # Obtém o primeiro endereço IPv4
-                    ip = netifaces.ifaddresses(iface)[netifaces.AF_INET][0]['addr']
-                    
-                    # Pula loopback
-                    if ip.startswith('127.'):
-                        continue
-                    
-                    interfaces.append({
-                        'name': iface,
-                        'ip': ip
-                    })
-                except Exception as e:
-                    logger.warning(f"Erro ao processar interface {iface}: {e}")
-        else:
-            # Fallback para socket se netifaces não estiver disponível
-            hostname = socket.gethostname()
-            ip = socket.gethostbyname(hostname)
-            interfaces.append({
-                'name': 'default',
-                'ip': ip
-            })
-    except Exception as e:
-        logger.error(f"Erro ao obter interfaces de rede: {e}")
-        # Fallback básico
-        interfaces.append({
-            'name': 'unknown',
-            'ip': '127.0.0.1'
-        })
-    
-    return interfaces
-
 # Executar teste de velocidade
-def run_speed_test():
+def run_speed_test(progress=None, quick=False, mode=None, host=None):
+    # progress(fase, fração, parcial) informa o andamento para o job em segundo plano
+    progress = progress or (lambda phase, fraction, partial=None: None)
+    
+    # Teste na rede local contra o servidor de vazão de outra instância (ou desta)
+    if (mode or state['config'].get('speedtestMode')) == 'local':
+        return run_local_speed_test(progress, quick, host)
+    
     if not SPEEDTEST_AVAILABLE:
-        # Retorna dados simulados se o speedtest não estiver disponível
+        # Retorna dados simulados se o speedtest não estiver disponível (não são gravados)
         logger.info("Gerando resultados simulados de teste de velocidade")
-        return {
+        result = {
             'download': random.uniform(10, 100),
             'upload': random.uniform(5, 50),
             'ping': random.uniform(10, 100),
@@ -244,15 +534,36 @@ def run_speed_test():
                 'name': 'Servidor Simulado',
                 'country': 'Brasil',
                 'sponsor': 'Simulação'
-            }
+            },
+            'simulated': True
         }
+        progress('download', 0.55, {'ping': result['ping'], 'server': result['server'],
+                                    'download': result['download']})
+        progress('upload', 1.0, {'upload': result['upload']})
+        return result
     
     logger.info("Iniciando teste de velocidade real")
     try:
-        s = speedtest.Speedtest()
-        s.get_best_server()
-        s.download()
-        s.upload()
+        # Cliente e servidor escolhido reaproveitados entre testes (TTL configurável)
+        cache = state['speedtest_client']
+        cache.ttl = state['config'].get('speedtestServerTtl', 3600)
+        quick_duration = state['config'].get('speedtestQuickDuration', 5) if quick else None
+        s = cache.acquire(quick_duration)
+        
+        # Número de conexões paralelas (0 = padrão do speedtest-cli)
+        threads = state['config'].get('speedtestThreads', 0) or None
+        
+        server = {
+            'name': s.results.server.get('name'),
+            'country': s.results.server.get('country'),
+            'sponsor': s.results.server.get('sponsor')
+        }
+        progress('download', 0.1, {'ping': s.results.ping, 'server': server})
+        
+        s.download(callback=speedtest_callback(progress, 'download', 0.1, 0.55), threads=threads)
+        progress('upload', 0.55, {'download': s.results.download / 1_000_000})
+        
+        s.upload(callback=speedtest_callback(progress, 'upload', 0.55, 1.0), threads=threads)
         results = s.results.dict()
         
         return {
@@ -263,42 +574,179 @@ def run_speed_test():
                 'name': results['server']['name'],
                 'country': results['server']['country'],
                 'sponsor': results['server']['sponsor']
-            }
+            },
+            'quick': quick,
+            'threads': threads
         }
     except Exception as e:
         logger.error(f"Erro durante teste de velocidade: {e}")
-        # Retorna dados simulados em caso de erro
-        return {
-            'download': random.uniform(10, 100),
-            'upload': random.uniform(5, 50),
-            'ping': random.uniform(10, 100),
-            'server': {
-                'name': 'Erro - Simulado',
-                'country': 'Brasil',
-                'sponsor': 'Simulação após erro'
-            }
+        state['speedtest_client'].invalidate()
+        # O job termina com erro; nenhum resultado é inventado
+        raise
+
+# Teste de velocidade contra o servidor de vazão embutido, com conexões paralelas
+def run_local_speed_test(progress, quick=False, host=None):
+    host = host or state['config'].get('speedtestLocalHost', '127.0.0.1')
+    port = int(state['config'].get('throughputPort', 5201))
+    streams = max(1, int(state['config'].get('speedtestStreams', 4)))
+    duration = float(state['config'].get('speedtestLocalDuration', 10))
+    if quick:
+        duration = min(duration, float(state['config'].get('speedtestQuickDuration', 5)))
+    
+    # Teste na própria máquina: garante que o servidor local está ativo (só em loopback)
+    if host in LOOPBACK_HOSTS:
+        start_throughput_server(loopback=True)
+    
+    server = {'name': f"{host}:{port}", 'country': '-', 'sponsor': 'Servidor de vazão local'}
+    logger.info(f"Iniciando teste de velocidade local contra {host}:{port} com {streams} conexões")
+    progress('download', 0.0, {'server': server})
+    
+    download = measure_throughput(host, port, DOWNLOAD, streams, duration,
+                                  lambda fraction: progress('download', fraction * 0.5))
+    progress('upload', 0.5, {'download': download['mbps'], 'ping': download['latency']})
+    
+    upload = measure_throughput(host, port, UPLOAD, streams, duration,
+                                lambda fraction: progress('upload', 0.5 + fraction * 0.5))
+    
+    return {
+        'download': download['mbps'],
+        'upload': upload['mbps'],
+        'ping': download['latency'],
+        'server': server,
+        'mode': 'local',
+        'quick': quick,
+        'threads': streams,
+        'streams': {
+            'download': download['streams'],
+            'upload': upload['streams']
         }
+    }
+
+# Hosts aceitos no teste local: speedtestLocalHost, speedtestLocalHosts e loopback
+def allowed_speedtest_hosts():
+    config = state['config']
+    return set(LOOPBACK_HOSTS) | {config.get('speedtestLocalHost', '127.0.0.1')} | \
+        set(config.get('speedtestLocalHosts') or [])
+
+# Inicia o servidor de vazão para testes locais (uma vez por processo)
+def start_throughput_server(loopback=False):
+    with state['control_lock']:
+        if state['throughput_server'] is not None:
+            return state['throughput_server']
+        config = state['config']
+        # Iniciado só para um teste local: nunca fica exposto à rede
+        bind = '127.0.0.1' if loopback else config.get('throughputBind', '127.0.0.1')
+        try:
+            server = ThroughputServer(host=bind, port=int(config.get('throughputPort', 5201)),
+                                      max_connections=int(config.get('throughputMaxConnections', 16)))
+            server.start()
+            state['throughput_server'] = server
+        except OSError as e:
+            logger.error(f"Erro ao iniciar o servidor de vazão: {e}")
+        return state['throughput_server']
+
+# Converte o callback do speedtest-cli (requisições concluídas) em fração do teste
+def speedtest_callback(progress, phase, lower, upper):
+    def callback(current, total, start=False, end=False):
+        if end:
+            callback.finished += 1
+            progress(phase, lower + (upper - lower) * callback.finished / max(total, 1))
+    callback.finished = 0
+    return callback
+
+# Grava o resultado de um teste concluído na série de testes de velocidade
+def record_speed_test(job):
+    if not job.result or job.result.get('simulated'):
+        # Resultados simulados não entram nas médias e percentis gravados
+        return
+    if state['speedtest_series'] is not None:
+        state['speedtest_series'].append(job.finished * 1000, job.result, job.source)
+
+# Abre a série de testes de velocidade (SQLite próprio, indexado por timestamp)
+def load_speedtest_series():
+    try:
+        if state['speedtest_series'] is None:
+            state['speedtest_series'] = SpeedTestSeries(SPEEDTEST_DB)
+    except Exception as e:
+        logger.error(f"Erro ao abrir a série de testes de velocidade: {e}")
+
+# Testes de velocidade executados em segundo plano, um de cada vez
+state['speedtests'] = SpeedTestRunner(run_speed_test, on_complete=record_speed_test,
+                                      lock_path=SPEEDTEST_LOCK)
+state['speedtest_schedule'] = PeriodicSpeedTests(state['speedtests'], lambda: state['config'])
+if SPEEDTEST_AVAILABLE:
+    state['speedtest_client'] = SpeedtestClientCache(speedtest.Speedtest)
+
+# Interfaces a monitorar: a pedida explicitamente, senão monitoredInterfaces,
+# senão a interface selecionada ('' = todas exceto loopback)
+def monitored_interfaces(interface=None):
+    if interface:
+        return [interface]
+    return (state['config'].get('monitoredInterfaces') or
+            [state['config'].get('selectedInterface') or ''])
 
 # Função de monitoramento que roda em thread separada
 def monitor_network(interface=None):
-    logger.info(f"Iniciando monitoramento de rede na interface: {interface or 'auto'}")
+    interfaces = monitored_interfaces(interface)
+    logger.info(f"Iniciando monitoramento de rede na interface: {', '.join(filter(None, interfaces)) or 'auto'}")
     
-    state['stop_flag'] = False
-    last_record_time = 0
     interval = state['config']['updateInterval']
     
+    # Persistência desacoplada: a amostragem só enfileira, a gravação roda em outra thread
+    pipeline = SamplePipeline(
+        maxsize=state['config'].get('sampleQueueSize', 1024),
+        delay_threshold=max(interval, 1)
+    )
+    state['pipeline'] = pipeline
+    state['writer_thread'] = Thread(target=history_writer, args=(pipeline,), daemon=True)
+    state['writer_thread'].start()
+    
+    # Contadores de bytes das interfaces (/proc/net/dev ou psutil), lidos uma
+    # única vez por ciclo para todas as interfaces monitoradas
+    sampler = InterfaceSampler(interfaces)
+    if not sampler.reader.available:
+        logger.warning("Contadores de interface indisponíveis. Medições simuladas serão usadas.")
+        sampler.close()
+        sampler = None
+    else:
+        # Primeira leitura define a linha de base das diferenças
+        sampler.sample()
+    
+    # Latência medida ativamente (TCP/UDP) em um laço asyncio próprio
+    prober = LatencyProber(lambda: state['config'], on_minute=record_latency)
+    prober.start()
+    state['prober'] = prober
+    
+    # Tráfego por conexão/processo (ativado por 'trafficAttribution')
+    traffic = TrafficAttribution(lambda: state['config'], on_sample=publish_traffic)
+    traffic.start()
+    state['traffic'] = traffic
+    
+    # Contabilização passiva de fluxos (ativada por 'flowAccounting')
+    flows = start_flow_accounting()
+    
+    # Ciclos em prazos absolutos, alinhados a múltiplos do intervalo
+    scheduler = TickScheduler(interval, missed=state['config'].get('missedTicks', MISSED_SKIP))
+    state['scheduler'] = scheduler
+    
     while not state['stop_flag']:
         try:
-            # Simula medição de rede (em um aplicativo real, aqui seria implementada a medição real)
-            current_time = time.time()
-            download_speed = random.uniform(10, 100)  # Mbps
-            upload_speed = random.uniform(5, 50)      # Mbps
-            ping = random.uniform(10, 100)            # ms
+            current_time = scheduler.wait(lambda: state['stop_flag'])
+            if current_time is None:
+                break
             
-            # Calcula dados transferidos desde a última atualização
-            time_diff = current_time - last_record_time if last_record_time > 0 else interval
-            downloaded = (download_speed * 1_000_000 / 8) * time_diff / 1_000_000  # MB
-            uploaded = (upload_speed * 1_000_000 / 8) * time_diff / 1_000_000      # MB
+            per_interface = {}
+            if sampler is not None:
+                # Taxas calculadas pela diferença dos contadores desde a última amostra
+                (download_speed, upload_speed, downloaded, uploaded), per_interface = sampler.sample_all()
+            else:
+                # Simula medição de rede quando não há fonte de contadores
+                download_speed = random.uniform(10, 100)  # Mbps
+                upload_speed = random.uniform(5, 50)      # Mbps
+                downloaded = download_speed * 1_000_000 / 8 * interval  # bytes
+                uploaded = upload_speed * 1_000_000 / 8 * interval      # bytes
+            # Mediana do RTT dos alvos na última rodada de sondas (0 sem resposta)
+            ping = prober.ping or 0.0                 # ms
             
             # Atualiza o estado atual
             with state['data_lock']:
@@ -308,53 +756,197 @@ def monitor_network(interface=None):
                 state['current']['totalDownload'] += downloaded
                 state['current']['totalUpload'] += uploaded
                 state['current']['lastUpdate'] = current_time
-            
-            # Registra no histórico a cada intervalo
-            if current_time - last_record_time >= 60:  # A cada minuto
-                record = {
-                    'timestamp': int(current_time * 1000),  # ms
-                    'download': download_speed,
-                    'upload': upload_speed,
-                    'ping': ping,
-                    'totalDownload': state['current']['totalDownload'],
-                    'totalUpload': state['current']['totalUpload']
-                }
-                
-                with state['data_lock']:
-                    state['history'].append(record)
+                total_download = state['current']['totalDownload']
+                total_upload = state['current']['totalUpload']
                 
-                # Salva o histórico
-                save_history()
-                last_record_time = current_time
-                
-                # Limpa histórico antigo periodicamente
-                if random.random() < 0.1:  # ~10% de chance a cada registro
-                    clean_old_history()
+                # Valores de cada interface: {nome: (download, upload, totalDownload, totalUpload)}
+                interface_sample = {}
+                for name, (iface_down, iface_up, iface_rx, iface_tx) in per_interface.items():
+                    current = state['interfaces'].get(name)
+                    if current is None:
+                        current = state['interfaces'][name] = {'totalDownload': 0, 'totalUpload': 0}
+                    current['download'] = iface_down
+                    current['upload'] = iface_up
+                    current['totalDownload'] += iface_rx
+                    current['totalUpload'] += iface_tx
+                    current['lastUpdate'] = current_time
+                    interface_sample[name] = (iface_down, iface_up,
+                                              current['totalDownload'], current['totalUpload'])
+            
+            # Notifica os clientes conectados em /api/stream
+            publish_status()
             
-            time.sleep(interval)
+            # Envia a amostra para a etapa de gravação (nunca bloqueia)
+            pipeline.put(current_time, download_speed, upload_speed, ping,
+                         total_download, total_upload, interface_sample)
         except Exception as e:
             logger.error(f"Erro durante o monitoramento: {e}")
-            time.sleep(interval)
     
+    if sampler is not None:
+        sampler.close()
+    prober.stop()
+    state['prober'] = None
+    traffic.stop()
+    if flows is not None:
+        flows.stop()
+        state['flows'] = None
+    
+    # A etapa de gravação esvazia a fila e grava os registros pendentes
+    pipeline.close()
+    state['writer_thread'].join(timeout=10)
     logger.info("Monitoramento de rede finalizado")
 
+# Publica o status atual para os assinantes de /api/stream
+def publish_status():
+    with state['data_lock']:
+        snapshot = dict(state['current'], monitoring=state['monitoring'])
+    state['broadcaster'].publish(snapshot)
+    
+    # No processo coletor o status também vai para a memória compartilhada
+    if state['role'] == ROLE_COLLECTOR:
+        state['shared'].publish(snapshot, snapshot['monitoring'])
+
+# Etapa de gravação: consome as amostras em lotes e grava no histórico
+def history_writer(pipeline):
+    accumulator = MinuteAccumulator()
+    interface_accumulators = {}
+    last_cleanup = time.monotonic()
+    
+    while not pipeline.closed or not pipeline.queue.empty():
+        try:
+            samples = pipeline.drain(timeout=1.0)
+            
+            # Registros por minuto com as médias das amostras do período
+            records = []
+            for sample in samples:
+                record = accumulator.add(sample)
+                if record is not None:
+                    records.append(record)
+            
+            # Séries por interface gravadas antes do histórico principal, que avisa os leitores
+            append_interface_history(interface_records(interface_accumulators, samples))
+            append_history_batch(records)
+            
+            # Limpa histórico antigo periodicamente
+            cleanup_interval = state['config'].get('historyCleanupInterval', 3600)
+            if records and time.monotonic() - last_cleanup >= cleanup_interval:
+                clean_old_history()
+                last_cleanup = time.monotonic()
+        except Exception as e:
+            logger.error(f"Erro ao gravar histórico: {e}")
+    
+    # Fecha o minuto em andamento e grava registros pendentes (inserções em lote)
+    append_interface_history([
+        dict(record, interface=name)
+        for name, interface_accumulator in interface_accumulators.items()
+        for record in [interface_accumulator.flush()] if record is not None
+    ])
+    append_history_batch([record for record in [accumulator.flush()] if record is not None])
+    save_history()
+    
+    stats = pipeline.stats()
+    if stats['dropped'] or stats['delayed']:
+        logger.warning(
+            f"Pipeline de amostras: {stats['dropped']} descartadas, "
+            f"{stats['delayed']} atrasadas de {stats['enqueued']} enfileiradas"
+        )
+
+# Registros por minuto de cada interface a partir das amostras do lote
+def interface_records(accumulators, samples):
+    records = []
+    for sample in samples:
+        for name, (download, upload, total_download, total_upload) in (sample.interfaces or {}).items():
+            accumulator = accumulators.get(name)
+            if accumulator is None:
+                accumulator = accumulators[name] = MinuteAccumulator()
+            record = accumulator.add(Sample(sample.time, download, upload, 0,
+                                            total_download, total_upload, sample.enqueued))
+            if record is not None:
+                record['interface'] = name
+                records.append(record)
+    return records
+
+# Grava registros por interface (uma transação por lote)
+def append_interface_history(records):
+    if not records or state['interface_series'] is None:
+        return
+    try:
+        state['interface_series'].append_many(records)
+    except Exception as e:
+        logger.error(f"Erro ao gravar o histórico por interface: {e}")
+
+# Período de um relatório: range (day/week/month) ou start/end (None: últimas entradas)
+def report_period(range_param=None, start_param=None, end_param=None, now=None):
+    now = now or datetime.datetime.now()
+    if range_param == 'custom' or start_param or end_param:
+        if not start_param:
+            raise ValueError("Informe o início do período (start)")
+        start = parse_report_time(start_param)
+        end = parse_report_time(end_param) if end_param else now
+        if end <= start:
+            raise ValueError("O fim do período deve ser posterior ao início")
+        return 'custom', start, end
+    if not range_param:
+        return None
+    label, start = history_range(range_param, now)
+    return label, start, now
+
+# Data de um relatório: timestamp em ms ou data ISO (AAAA-MM-DD ou AAAA-MM-DDTHH:MM)
+def parse_report_time(value):
+    if str(value).isdigit():
+        return datetime.datetime.fromtimestamp(int(value) / 1000)
+    return datetime.datetime.fromisoformat(value)
+
+# Dados de um relatório lidos de forma consistente: (atuais, estatísticas, registros)
+@contextmanager
+def report_snapshot(period):
+    snapshot = None
+    with state['data_lock']:
+        current = dict(state['current'])
+        if not history_indexed():
+            if period is None:
+                history = state['history'].tail(REPORT_RECENT_ENTRIES)
+            else:
+                # Cópia das colunas sob o lock; os registros são gerados fora dele
+                history = state['history'].copy_range(period[1].timestamp() * 1000,
+                                                      period[2].timestamp() * 1000)
+    if history_indexed():
+        if period is None:
+            history = state['history_store'].tail(REPORT_RECENT_ENTRIES)
+        else:
+            history = snapshot = state['history_store'].snapshot(period[1].timestamp() * 1000,
+                                                                 period[2].timestamp() * 1000)
+    try:
+        yield current, history.stats() if period is not None else None, history
+    finally:
+        if snapshot is not None:
+            snapshot.close()
+
 # Gerar relatório
-def generate_report(report_type='txt'):
+def generate_report(report_type='txt', period=None):
     now = datetime.datetime.now()
     date_str = now.strftime('%Y%m%d_%H%M%S')
     filename = f"network_report_{date_str}"
+    if period is not None:
+        filename += f"_{period[0]}"
     
     if report_type == 'pdf' and REPORTLAB_AVAILABLE:
-        return generate_pdf_report(filename)
+        return generate_pdf_report(filename, period)
+    elif report_type == 'csv':
+        return generate_csv_report(filename, period)
     else:
-        return generate_text_report(filename)
+        return generate_text_report(filename, period)
+
+# Formatar data/hora de um registro do histórico
+def format_entry_time(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp / 1000).strftime('%d/%m/%Y %H:%M:%S')
 
 # Gerar relatório em texto
-def generate_text_report(filename):
+def generate_text_report(filename, period=None):
     try:
         full_path = os.path.join(REPORTS_DIR, f"{filename}.txt")
         
-        with open(full_path, 'w') as f:
+        with report_snapshot(period) as (current, stats, history), open(full_path, 'w') as f:
             f.write("RELATÓRIO DE DESEMPENHO DE REDE\n")
             f.write("==============================\n\n")
             
@@ -370,25 +962,41 @@ def generate_text_report(filename):
             # Estatísticas atuais
             f.write("\nESTATÍSTICAS ATUAIS\n")
             f.write("------------------\n")
-            f.write(f"Download: {state['current']['download']:.2f} Mbps\n")
-            f.write(f"Upload: {state['current']['upload']:.2f} Mbps\n")
-            f.write(f"Ping: {state['current']['ping']:.0f} ms\n")
-            f.write(f"Total Downloaded: {format_bytes(state['current']['totalDownload'])}\n")
-            f.write(f"Total Uploaded: {format_bytes(state['current']['totalUpload'])}\n")
+            f.write(f"Download: {current['download']:.2f} Mbps\n")
+            f.write(f"Upload: {current['upload']:.2f} Mbps\n")
+            f.write(f"Ping: {current['ping']:.0f} ms\n")
+            f.write(f"Total Downloaded: {format_bytes(current['totalDownload'])}\n")
+            f.write(f"Total Uploaded: {format_bytes(current['totalUpload'])}\n")
             
-            # Histórico recente
-            f.write("\nHISTÓRICO RECENTE (últimas 10 entradas)\n")
-            f.write("-------------------------------------\n")
+            if stats is not None:
+                # Resumo do período
+                f.write("\nRESUMO DO PERÍODO\n")
+                f.write("-----------------\n")
+                f.write(f"Período: {period[1].strftime('%d/%m/%Y %H:%M:%S')} a "
+                        f"{period[2].strftime('%d/%m/%Y %H:%M:%S')}\n")
+                f.write(f"Registros: {stats['count']}\n")
+                f.write(f"Download (Mbps): média {stats['avgDownload']:.2f} | "
+                        f"mín {stats['minDownload']:.2f} | máx {stats['maxDownload']:.2f}\n")
+                f.write(f"Upload (Mbps): média {stats['avgUpload']:.2f} | "
+                        f"mín {stats['minUpload']:.2f} | máx {stats['maxUpload']:.2f}\n")
+                f.write(f"Ping (ms): média {stats['avgPing']:.0f} | "
+                        f"mín {stats['minPing']:.0f} | máx {stats['maxPing']:.0f}\n")
+                
+                f.write(f"\nHISTÓRICO DO PERÍODO ({stats['count']} entradas)\n")
+                f.write("------------------------------------\n")
+            else:
+                # Histórico recente
+                f.write(f"\nHISTÓRICO RECENTE (últimas {REPORT_RECENT_ENTRIES} entradas)\n")
+                f.write("-------------------------------------\n")
             f.write("Data/Hora            | Download | Upload  | Ping\n")
             f.write("-" * 60 + "\n")
             
-            recent_history = sorted(state['history'], key=lambda x: x['timestamp'], reverse=True)[:10]
-            for entry in reversed(recent_history):
-                entry_time = datetime.datetime.fromtimestamp(entry['timestamp'] / 1000)
-                f.write(f"{entry_time.strftime('%d/%m/%Y %H:%M:%S')} | ")
-                f.write(f"{entry['download']:7.2f} | ")
-                f.write(f"{entry['upload']:7.2f} | ")
-                f.write(f"{entry['ping']:4.0f}\n")
+            # Uma linha por registro, à medida que o histórico é percorrido
+            for entry in history:
+                f.write(f"{format_entry_time(entry['timestamp'])} | "
+                        f"{entry['download']:7.2f} | "
+                        f"{entry['upload']:7.2f} | "
+                        f"{entry['ping']:4.0f}\n")
         
         # URL relativa para o arquivo
         relative_url = f"/api/reports/download/{filename}.txt"
@@ -406,8 +1014,77 @@ def generate_text_report(filename):
             'error': str(e)
         }
 
+# Gerar relatório em CSV (um registro do histórico por linha)
+def generate_csv_report(filename, period=None):
+    try:
+        full_path = os.path.join(REPORTS_DIR, f"{filename}.csv")
+        
+        with report_snapshot(period) as (current, stats, history), \
+                open(full_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['dataHora', 'timestamp', 'download', 'upload', 'ping',
+                             'totalDownload', 'totalUpload'])
+            for entry in history:
+                writer.writerow([
+                    datetime.datetime.fromtimestamp(entry['timestamp'] / 1000).isoformat(timespec='seconds'),
+                    entry['timestamp'],
+                    entry['download'],
+                    entry['upload'],
+                    entry['ping'],
+                    entry['totalDownload'],
+                    entry['totalUpload']
+                ])
+        
+        # URL relativa para o arquivo
+        relative_url = f"/api/reports/download/{filename}.csv"
+        
+        return {
+            'success': True,
+            'path': full_path,
+            'url': relative_url,
+            'filename': f"{filename}.csv"
+        }
+    except Exception as e:
+        logger.error(f"Erro ao gerar relatório CSV: {e}")
+        return {
+            'success': False, 
+            'error': str(e)
+        }
+
+# Tabelas do histórico para o PDF, uma por página, montadas à medida que são desenhadas
+def pdf_history_tables(history):
+    table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ALIGN', (1, 1), (-1, -1), 'RIGHT')
+    ])
+    header = ["Data/Hora", "Download (Mbps)", "Upload (Mbps)", "Ping (ms)"]
+    
+    for index, chunk in enumerate(chunked(history, REPORT_PDF_ROWS, REPORT_PDF_FIRST_ROWS)):
+        if index:
+            yield PageBreak()
+        history_data = [header]
+        for entry in chunk:
+            history_data.append([
+                format_entry_time(entry['timestamp']),
+                f"{entry['download']:.2f}",
+                f"{entry['upload']:.2f}",
+                f"{entry['ping']:.0f}"
+            ])
+        
+        # repeatRows mantém o cabeçalho se o bloco for dividido entre páginas
+        history_table = Table(history_data, colWidths=[150, 115, 115, 115], repeatRows=1)
+        history_table.setStyle(table_style)
+        yield history_table
+
 # Gerar relatório em PDF
-def generate_pdf_report(filename):
+def generate_pdf_report(filename, period=None):
     if not REPORTLAB_AVAILABLE:
         logger.warning("Tentativa de gerar PDF sem o ReportLab disponível")
         return {
@@ -418,116 +1095,127 @@ def generate_pdf_report(filename):
     try:
         full_path = os.path.join(REPORTS_DIR, f"{filename}.pdf")
         
-        # Configuração do documento
-        doc = SimpleDocTemplate(full_path, pagesize=A4)
-        styles = getSampleStyleSheet()
-        elements = []
-        
-        # Título
-        title_style = styles["Title"]
-        elements.append(Paragraph("Relatório de Desempenho de Rede", title_style))
-        elements.append(Spacer(1, 12))
-        
-        # Data e Hora
-        date_style = styles["Normal"]
-        date_style.alignment = 1  # Centralizado
-        elements.append(Paragraph(
-            f"Gerado em: {datetime.datetime.now().strftime('%d/%m/%Y %H:%M:%S')}",
-            date_style
-        ))
-        elements.append(Spacer(1, 20))
-        
-        # Informações do Sistema
-        section_style = styles["Heading2"]
-        elements.append(Paragraph("Informações do Sistema", section_style))
-        
-        system_data = [
-            ["Sistema Operacional", f"{platform.system()} {platform.version()}"],
-            ["Nome do Host", socket.gethostname()]
-        ]
-        
-        system_table = Table(system_data, colWidths=[200, 300])
-        system_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(system_table)
-        elements.append(Spacer(1, 20))
-        
-        # Estatísticas Atuais
-        elements.append(Paragraph("Estatísticas Atuais", section_style))
-        
-        current_data = [
-            ["Métrica", "Valor"],
-            ["Download", f"{state['current']['download']:.2f} Mbps"],
-            ["Upload", f"{state['current']['upload']:.2f} Mbps"],
-            ["Ping", f"{state['current']['ping']:.0f} ms"],
-            ["Total Downloaded", format_bytes(state['current']['totalDownload'])],
-            ["Total Uploaded", format_bytes(state['current']['totalUpload'])]
-        ]
-        
-        current_table = Table(current_data, colWidths=[200, 300])
-        current_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(current_table)
-        elements.append(Spacer(1, 20))
-        
-        # Histórico Recente
-        elements.append(Paragraph("Histórico Recente", section_style))
-        
-        history_data = [["Data/Hora", "Download (Mbps)", "Upload (Mbps)", "Ping (ms)"]]
-        
-        recent_history = sorted(state['history'], key=lambda x: x['timestamp'], reverse=True)[:10]
-        for entry in reversed(recent_history):
-            entry_time = datetime.datetime.fromtimestamp(entry['timestamp'] / 1000)
-            history_data.append([
-                entry_time.strftime('%d/%m/%Y %H:%M:%S'),
-                f"{entry['download']:.2f}",
-                f"{entry['upload']:.2f}",
-                f"{entry['ping']:.0f}"
-            ])
-        
-        history_table = Table(history_data, colWidths=[150, 115, 115, 115])
-        history_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (1, 1), (-1, -1), 'RIGHT')
-        ]))
-        
-        elements.append(history_table)
-        
-        # Rodapé
-        elements.append(Spacer(1, 30))
-        footer_style = styles["Normal"]
-        footer_style.alignment = 1  # Centralizado
-        elements.append(Paragraph(
-            "Monitor de Rede - Relatório gerado automaticamente",
-            footer_style
-        ))
-        
-        # Gera o PDF
-        doc.build(elements)
+        with report_snapshot(period) as (current, stats, history):
+            # Configuração do documento
+            doc = SimpleDocTemplate(full_path, pagesize=A4)
+            styles = getSampleStyleSheet()
+            elements = []
+            
+            # Título
+            title_style = styles["Title"]
+            elements.append(Paragraph("Relatório de Desempenho de Rede", title_style))
+            elements.append(Spacer(1, 12))
+            
+            # Data e Hora
+            date_style = styles["Normal"]
+            date_style.alignment = 1  # Centralizado
+            elements.append(Paragraph(
+                f"Gerado em: {datetime.datetime.now().strftime('%d/%m/%Y %H:%M:%S')}",
+                date_style
+            ))
+            elements.append(Spacer(1, 20))
+            
+            # Informações do Sistema
+            section_style = styles["Heading2"]
+            elements.append(Paragraph("Informações do Sistema", section_style))
+            
+            system_data = [
+                ["Sistema Operacional", f"{platform.system()} {platform.version()}"],
+                ["Nome do Host", socket.gethostname()]
+            ]
+            
+            system_table = Table(system_data, colWidths=[200, 300])
+            system_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+                ('TEXTCOLOR', (0, 0), (0, -1), colors.black),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 0), (-1, -1), 10),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ]))
+            
+            elements.append(system_table)
+            elements.append(Spacer(1, 20))
+            
+            # Estatísticas Atuais
+            elements.append(Paragraph("Estatísticas Atuais", section_style))
+            
+            current_data = [
+                ["Métrica", "Valor"],
+                ["Download", f"{current['download']:.2f} Mbps"],
+                ["Upload", f"{current['upload']:.2f} Mbps"],
+                ["Ping", f"{current['ping']:.0f} ms"],
+                ["Total Downloaded", format_bytes(current['totalDownload'])],
+                ["Total Uploaded", format_bytes(current['totalUpload'])]
+            ]
+            
+            current_table = Table(current_data, colWidths=[200, 300])
+            current_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 12),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ]))
+            
+            elements.append(current_table)
+            elements.append(Spacer(1, 20))
+            
+            if stats is not None:
+                # Resumo do Período
+                elements.append(Paragraph("Resumo do Período", section_style))
+                elements.append(Paragraph(
+                    f"{period[1].strftime('%d/%m/%Y %H:%M:%S')} a "
+                    f"{period[2].strftime('%d/%m/%Y %H:%M:%S')} - {stats['count']} registros",
+                    styles["Normal"]
+                ))
+                elements.append(Spacer(1, 8))
+                
+                summary_data = [
+                    ["Métrica", "Média", "Mínimo", "Máximo"],
+                    ["Download (Mbps)", f"{stats['avgDownload']:.2f}",
+                     f"{stats['minDownload']:.2f}", f"{stats['maxDownload']:.2f}"],
+                    ["Upload (Mbps)", f"{stats['avgUpload']:.2f}",
+                     f"{stats['minUpload']:.2f}", f"{stats['maxUpload']:.2f}"],
+                    ["Ping (ms)", f"{stats['avgPing']:.0f}",
+                     f"{stats['minPing']:.0f}", f"{stats['maxPing']:.0f}"]
+                ]
+                
+                summary_table = Table(summary_data, colWidths=[150, 115, 115, 115])
+                summary_table.setStyle(TableStyle([
+                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                    ('FONTSIZE', (0, 0), (-1, 0), 12),
+                    ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                    ('ALIGN', (1, 1), (-1, -1), 'RIGHT')
+                ]))
+                
+                elements.append(summary_table)
+                # O histórico começa em uma nova página para alinhar as tabelas às páginas
+                elements.append(PageBreak())
+                elements.append(Paragraph("Histórico do Período", section_style))
+            else:
+                # Histórico Recente
+                elements.append(Paragraph("Histórico Recente", section_style))
+            
+            # Rodapé
+            footer_style = styles["Normal"]
+            footer_style.alignment = 1  # Centralizado
+            footer = [
+                Spacer(1, 30),
+                Paragraph("Monitor de Rede - Relatório gerado automaticamente", footer_style)
+            ]
+            
+            # Gera o PDF: as tabelas do histórico são criadas conforme as páginas são desenhadas
+            doc.build(FlowableStream(chain(elements, pdf_history_tables(history), footer)))
         
         # URL relativa para o arquivo
         relative_url = f"/api/reports/download/{filename}.pdf"
@@ -562,10 +1250,236 @@ def format_bytes(size_bytes):
 def init_app_data():
     load_config()
     load_history()
+    load_speedtest_series()
+    load_latency_series()
+    load_interface_series()
+    load_flow_series()
+    start_interface_inventory()
+    publish_status()
+    
+    # Testes de velocidade periódicos (ativados por 'speedtestSchedule')
+    state['speedtest_schedule'].start()
+    
+    # Servidor de vazão para testes locais feitos por outras máquinas da rede
+    if state['config'].get('throughputServer'):
+        start_throughput_server()
+    
+    # Servidor de eco para testar as sondas de latência sem alvos externos
+    if state['config'].get('echoServer') and state['echo_server'] is None:
+        state['echo_server'] = EchoServer(host=state['config'].get('echoBind', DEFAULT_ECHO_BIND),
+                                          port=int(state['config'].get('echoPort', DEFAULT_ECHO_PORT)))
+        state['echo_server'].start()
+    
+    # Garante a gravação de registros pendentes ao encerrar o processo
+    atexit.register(save_history)
     
     # Inicia monitoramento automaticamente se configurado
     if state['config']['startWithMonitoring']:
-        start_monitoring()
+        # Sem interface explícita: monitor_network aplica monitoredInterfaces/selectedInterface
+        start_monitor_thread()
+
+# Inicia a thread de monitoramento (no máximo uma por processo)
+def start_monitor_thread(interface=None):
+    if state['role'] == ROLE_READER:
+        return send_command('start', interface)
+    
+    with state['control_lock']:
+        if state['monitoring']:
+            return False
+        
+        # Aguarda o fim de uma thread anterior que ainda esteja encerrando
+        previous = state['monitor_thread']
+        if previous is not None and previous.is_alive():
+            previous.join(timeout=max(state['config']['updateInterval'], 1) + 10)
+        
+        state['stop_flag'] = False
+        state['monitor_thread'] = Thread(
+            target=monitor_network,
+            args=(interface,),
+            daemon=True
+        )
+        state['monitor_thread'].start()
+        state['monitoring'] = True
+    
+    publish_status()
+    return True
+
+# Para a thread de monitoramento
+def stop_monitor_thread():
+    if state['role'] == ROLE_READER:
+        return send_command('stop')
+    
+    with state['control_lock']:
+        state['stop_flag'] = True
+        state['monitoring'] = False
+    publish_status()
+    return True
+
+# Zera as estatísticas atuais
+def reset_current():
+    if state['role'] == ROLE_READER:
+        return send_command('reset')
+    
+    with state['data_lock']:
+        state['current']['download'] = 0.0
+        state['current']['upload'] = 0.0
+        state['current']['ping'] = 0.0
+        state['current']['totalDownload'] = 0
+        state['current']['totalUpload'] = 0
+        state['current']['lastUpdate'] = time.time()
+        state['interfaces'].clear()
+    publish_status()
+    return True
+
+#
+# Execução em vários processos: um coletor e vários workers da API
+#
+
+# Encaminha um comando de controle ao processo coletor
+def send_command(name, *args):
+    state['commands'].put((name, args))
+    return True
+
+# Processo coletor: amostra a rede, grava o histórico e publica o status
+def run_collector(shared, commands):
+    state['role'] = ROLE_COLLECTOR
+    state['shared'] = shared
+    parent = os.getppid()
+    
+    # SIGTERM (ex.: término do processo principal) encerra o laço normalmente
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    
+    try:
+        init_app_data()
+    finally:
+        # Libera os workers mesmo se o carregamento falhar
+        shared.set_ready()
+    logger.info(f"Processo coletor iniciado (pid {os.getpid()})")
+    
+    handlers = {
+        'start': start_monitor_thread,
+        'stop': stop_monitor_thread,
+        'reset': reset_current,
+        'config': load_config
+    }
+    while not stopping:
+        try:
+            name, args = commands.get(timeout=1.0)
+        except queue.Empty:
+            # Encerra junto com o processo principal
+            if os.getppid() != parent:
+                break
+            continue
+        except (EOFError, OSError):
+            break
+        if name == 'shutdown':
+            break
+        try:
+            handlers[name](*args)
+        except Exception as e:
+            logger.error(f"Erro ao executar comando '{name}' no coletor: {e}")
+    
+    # Processos filhos não executam atexit: grava o histórico pendente aqui
+    stop_monitor_thread()
+    if state['monitor_thread'] is not None:
+        state['monitor_thread'].join(timeout=max(state['config']['updateInterval'], 1) + 10)
+    save_history()
+    logger.info("Processo coletor finalizado")
+
+# Inicia o processo coletor (antes de criar os workers)
+def start_collector():
+    shared = SharedStatus.create()
+    context = multiprocessing.get_context('fork')
+    commands = context.Queue()
+    collector = context.Process(target=run_collector, args=(shared, commands),
+                                name='network-monitor-collector', daemon=True)
+    collector.start()
+    if not shared.wait_ready():
+        logger.warning("Coletor demorou para carregar o histórico; iniciando os workers assim mesmo")
+    return shared, commands, collector
+
+# Encerra o processo coletor e libera a memória compartilhada
+def stop_collector(shared, commands, collector):
+    commands.put(('shutdown', ()))
+    collector.join(timeout=30)
+    if collector.is_alive():
+        logger.warning("Coletor não respondeu ao pedido de encerramento")
+        collector.terminate()
+    shared.close()
+
+# Worker da API: lê o status da memória compartilhada e o histórico do SQLite
+def init_reader(shared, commands):
+    state['role'] = ROLE_READER
+    state['shared'] = shared
+    state['commands'] = commands
+    
+    load_config()
+    load_history()
+    load_speedtest_series()
+    load_latency_series()
+    load_interface_series()
+    load_flow_series()
+    start_interface_inventory()
+    state['history_version'] = shared.read()['historyVersion']
+    Thread(target=follow_shared_status, daemon=True).start()
+
+# Acompanha o status publicado pelo coletor e repassa aos assinantes deste worker
+def follow_shared_status(interval=0.25):
+    version = None
+    config_mtime = None
+    while True:
+        try:
+            snapshot = state['shared'].read()
+            if snapshot['version'] != version:
+                version = snapshot['version']
+                with state['data_lock']:
+                    state['current'].update(snapshot['current'])
+                    state['monitoring'] = snapshot['monitoring']
+                publish_status()
+            
+            if snapshot['historyVersion'] != state['history_version']:
+                sync_history(snapshot['historyVersion'])
+            
+            # Configuração alterada por outro worker
+            mtime = os.path.getmtime(CONFIG_FILE) if os.path.exists(CONFIG_FILE) else None
+            if config_mtime is not None and mtime != config_mtime:
+                load_config()
+            config_mtime = mtime
+        except Exception as e:
+            logger.error(f"Erro ao ler o estado compartilhado: {e}")
+        time.sleep(interval)
+
+# Incorpora às agregações deste worker os registros gravados pelo coletor
+def sync_history(history_version):
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=state['config']['maxHistoryDays'])
+    cutoff_timestamp = cutoff.timestamp() * 1000
+    start = cutoff_timestamp
+    if state['history_cursor'] is not None:
+        start = max(start, state['history_cursor'] + 1)
+    
+    records = list(state['history_store'].iter_range(start))
+    
+    latency_start = cutoff_timestamp
+    if state['latency_cursor'] is not None:
+        latency_start = max(latency_start, state['latency_cursor'] + 1)
+    histograms = []
+    if state['latency_series'] is not None:
+        histograms = list(state['latency_series'].iter_histograms(latency_start))
+    
+    with state['data_lock']:
+        for record in records:
+            state['rollups'].add(record)
+            state['aggregates'].add(record)
+            state['history_cursor'] = record['timestamp']
+        for timestamp, histogram in histograms:
+            state['latency_windows'].add(timestamp, histogram)
+            state['latency_cursor'] = timestamp
+        state['rollups'].trim(cutoff_timestamp)
+        state['aggregates'].trim(cutoff_timestamp)
+        state['latency_windows'].trim(cutoff_timestamp)
+        state['history_version'] = history_version
+        state['response_cache'].invalidate('history')
 
 #
 # Rotas da API
@@ -576,15 +1490,107 @@ def index():
     """Renderiza a página principal"""
     return render_template('index.html')
 
+# Resposta em cache com ETag forte, If-None-Match (304) e compressão negociada
+def cached_response(entry):
+    encoding = request.accept_encodings.best_match(supported_encodings())
+    body, encoding = entry_variant(entry, encoding)
+    
+    response = Response(body, mimetype=entry.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+        # ETag forte distinto para cada representação
+        response.set_etag(f"{entry.etag}-{encoding}")
+    else:
+        response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    response.vary.add('Accept')
+    return response.make_conditional(request)
+
+# Formato de resposta pedido pelo cliente: MessagePack via Accept, se disponível
+def wants_msgpack():
+    if not MSGPACK_AVAILABLE:
+        return False
+    best = request.accept_mimetypes.best_match(['application/json', 'application/msgpack'])
+    return best == 'application/msgpack'
+
+# Codifica o payload em JSON ou MessagePack; retorna (corpo, mimetype)
+def encode_payload(payload, use_msgpack=False):
+    if use_msgpack:
+        return msgpack.packb(payload, use_bin_type=True), 'application/msgpack'
+    return app.json.dumps(payload), 'application/json'
+
 @app.route('/api/status')
 def get_status():
-    """Retorna o status atual do monitoramento"""
-    with state['data_lock']:
-        return jsonify({
+    """Retorna o status atual do monitoramento (opcionalmente de uma interface)"""
+    pipeline = state['pipeline']
+    scheduler = state['scheduler']
+    interface = request.args.get('interface') or None
+    
+    # O status só muda quando uma nova versão é publicada para /api/stream
+    cache_key = (
+        state['broadcaster'].version,
+        state['monitoring'],
+        pipeline.stats()['processed'] if pipeline is not None else None
+    )
+    cache_name = ('status', interface)
+    cached = state['response_cache'].get(cache_name, cache_key)
+    if cached is None:
+        with state['data_lock']:
+            interfaces = {name: dict(values) for name, values in state['interfaces'].items()}
+            current = dict(state['current'])
+        if not interfaces and state['role'] == ROLE_READER and state['interface_series'] is not None:
+            # Leitores não recebem as amostras por interface: usa o último minuto gravado
+            interfaces = state['interface_series'].latest()
+        if interface is not None:
+            current = dict(interfaces.get(interface) or {
+                'download': 0, 'upload': 0, 'totalDownload': 0, 'totalUpload': 0, 'lastUpdate': None
+            })
+            current['ping'] = state['current']['ping']
+        payload = {
             'success': True,
             'monitoring': state['monitoring'],
-            'current': state['current']
+            'interface': interface,
+            'interfaces': sorted(interfaces),
+            'current': current,
+            'pipeline': pipeline.stats() if pipeline is not None else None,
+            'scheduler': scheduler.stats() if scheduler is not None else None
+        }
+        cached = state['response_cache'].put(cache_name, cache_key, app.json.dumps(payload))
+    
+    return cached_response(cached)
+
+# Resposta SSE que ocupa uma vaga de stream até a conexão ser fechada
+def event_stream_response(events):
+    slots = state['stream_slots']
+    if not slots.acquire():
+        # Sem vaga: o cliente volta ao polling em vez de prender mais uma thread
+        events.close()
+        response = jsonify({
+            'success': False,
+            'error': 'Limite de streams simultâneos atingido'
         })
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    
+    response = Response(events, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(slots.release)
+    return response
+
+# Limite de streams: deixa ao menos duas threads livres para as demais requisições
+def stream_limit(threads=None):
+    limit = int(state['config'].get('maxStreams', 4))
+    if threads is not None:
+        limit = min(limit, threads - 2)
+    return max(1, limit)
+
+@app.route('/api/stream')
+def stream_status():
+    """Envia atualizações do status via Server-Sent Events"""
+    return event_stream_response(state['broadcaster'].stream())
 
 @app.route('/api/start', methods=['POST'])
 def start_monitoring():
@@ -596,17 +1602,16 @@ def start_monitoring():
         })
     
     try:
-        data = request.get_json() or {}
-        selected_interface = data.get('interface', state['config']['selectedInterface'])
+        data = request.get_json(silent=True) or {}
+        # Sem interface no corpo, vale a configuração (monitoredInterfaces/selectedInterface)
+        selected_interface = data.get('interface') or None
         
         # Inicia a thread de monitoramento
-        state['monitor_thread'] = Thread(
-            target=monitor_network,
-            args=(selected_interface,),
-            daemon=True
-        )
-        state['monitor_thread'].start()
-        state['monitoring'] = True
+        if not start_monitor_thread(selected_interface):
+            return jsonify({
+                'success': False,
+                'error': 'Monitoramento já está em andamento'
+            })
         
         return jsonify({
             'success': True,
@@ -629,8 +1634,7 @@ def stop_monitoring():
         })
     
     try:
-        state['stop_flag'] = True
-        state['monitoring'] = False
+        stop_monitor_thread()
         
         return jsonify({
             'success': True,
@@ -647,13 +1651,7 @@ def stop_monitoring():
 def reset_stats():
     """Reseta as estatísticas de rede"""
     try:
-        with state['data_lock']:
-            state['current']['download'] = 0.0
-            state['current']['upload'] = 0.0
-            state['current']['ping'] = 0.0
-            state['current']['totalDownload'] = 0
-            state['current']['totalUpload'] = 0
-            state['current']['lastUpdate'] = time.time()
+        reset_current()
         
         return jsonify({
             'success': True,
@@ -666,71 +1664,257 @@ def reset_stats():
             'error': str(e)
         })
 
+# Define o período com base no parâmetro 'range'; retorna (range, início)
+def history_range(range_param, now):
+    if range_param == 'week':
+        return range_param, now - datetime.timedelta(days=7)
+    elif range_param == 'month':
+        return range_param, now - datetime.timedelta(days=30)
+    else:  # day (default)
+        return 'day', now - datetime.timedelta(days=1)
+
 @app.route('/api/history')
 def get_history():
     """Obtém o histórico de desempenho da rede"""
     try:
-        range_param = request.args.get('range', 'day')
         now = datetime.datetime.now()
+        range_param, cutoff = history_range(request.args.get('range', 'day'), now)
+        cutoff_timestamp = cutoff.timestamp() * 1000
         
-        # Define o período com base no parâmetro
-        if range_param == 'week':
-            cutoff = now - datetime.timedelta(days=7)
-        elif range_param == 'month':
-            cutoff = now - datetime.timedelta(days=30)
-        else:  # day (default)
-            cutoff = now - datetime.timedelta(days=1)
+        # Busca incremental: apenas registros a partir do cursor informado pelo cliente
+        since = request.args.get('since', type=int)
+        start_timestamp = max(cutoff_timestamp, since) if since is not None else cutoff_timestamp
         
-        cutoff_timestamp = cutoff.timestamp() * 1000
+        # Escolhe a resolução: registros brutos ou uma camada de agregação
+        resolution = request.args.get('resolution')
+        if resolution not in state['rollups'].tiers and resolution != RAW_RESOLUTION:
+            resolution = state['rollups'].resolution_for(
+                now.timestamp() * 1000 - cutoff_timestamp,
+                state['config'].get('historyMaxPoints', 3000)
+            )
+        
+        # Codificação compacta opcional: colunas com casas decimais fixas e/ou MessagePack
+        columnar = request.args.get('format') == 'columnar'
+        precision = request.args.get('precision', default=2 if columnar else None, type=int)
+        use_msgpack = wants_msgpack()
         
-        # Filtra o histórico com base no período
-        filtered_history = [record for record in state['history'] 
-                            if record['timestamp'] >= cutoff_timestamp]
+        # Resposta em cache enquanto o histórico não muda (e no máximo por um minuto,
+        # já que as janelas deslizam com o tempo)
+        interface = request.args.get('interface') or None
+        cache_name = ('history', range_param, resolution, since, columnar, precision, use_msgpack, interface)
+        cache_key = (state['history_version'], int(now.timestamp() // 60))
+        cached = state['response_cache'].get(cache_name, cache_key)
+        if cached is not None:
+            return cached_response(cached)
         
-        # Calcula as métricas resumidas
+        # Resumo obtido das somas correntes da janela, sem percorrer o histórico
+        with state['data_lock']:
+            summary = state['aggregates'].summary(range_param, now.timestamp() * 1000)
+            # Percentis de latência (p50/p95/p99) das sondas ativas no período
+            summary.update(state['latency_windows'].summary(range_param, now.timestamp() * 1000))
+        
+        if interface is not None:
+            # Histórico de uma interface: consultas na série por interface
+            series = state['interface_series']
+            if series is None:
+                raise RuntimeError('Histórico por interface indisponível')
+            summary.update(series.summary(interface, cutoff_timestamp))
+            if resolution != RAW_RESOLUTION:
+                filtered_history = series.aggregate(
+                    interface, state['rollups'].tiers[resolution].width, start_timestamp)
+            else:
+                filtered_history = series.query_range(interface, start_timestamp)
+        elif resolution != RAW_RESOLUTION:
+            with state['data_lock']:
+                filtered_history = state['rollups'].query(resolution, start_timestamp)
+        elif history_indexed():
+            # Consulta por período executada no banco, via índice
+            filtered_history = state['history_store'].query_range(start_timestamp)
+        else:
+            # Janela do período localizada por busca binária no timestamp
+            with state['data_lock']:
+                filtered_history = state['history'].range(start_timestamp)
+        
+        # O cursor é o timestamp do último registro enviado. A busca seguinte o
+        # inclui novamente, pois o último bucket de uma agregação ainda pode mudar;
+        # o cliente substitui registros com o mesmo timestamp.
         if filtered_history:
-            avg_download = sum(item['download'] for item in filtered_history) / len(filtered_history)
-            avg_upload = sum(item['upload'] for item in filtered_history) / len(filtered_history)
-            
-            # Pega o último registro para os totais
-            last_record = max(filtered_history, key=lambda x: x['timestamp'])
-            total_download = last_record['totalDownload']
-            total_upload = last_record['totalUpload']
+            cursor = filtered_history[-1]['timestamp']
         else:
-            avg_download = 0
-            avg_upload = 0
-            total_download = 0
-            total_upload = 0
-        
-        summary = {
-            'avgDownload': avg_download,
-            'avgUpload': avg_upload,
-            'totalDownload': total_download,
-            'totalUpload': total_upload
+            cursor = since
+        
+        if columnar:
+            filtered_history = records_to_columns(filtered_history, precision)
+        
+        payload = {
+            'success': True,
+            'history': filtered_history,
+            'format': 'columnar' if columnar else 'records',
+            'resolution': resolution,
+            'interface': interface,
+            'summary': summary,
+            'cursor': cursor,
+            'cutoff': int(cutoff_timestamp),
+            'incremental': since is not None
         }
+        body, mimetype = encode_payload(payload, use_msgpack)
+        cached = state['response_cache'].put(cache_name, cache_key, body, mimetype)
+        return cached_response(cached)
+    except Exception as e:
+        logger.error(f"Erro ao obter histórico: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@app.route('/api/latency')
+def latency():
+    """Obtém a última medição de latência de cada alvo"""
+    try:
+        prober = state['prober']
+        if prober is not None and prober.latest:
+            targets = list(prober.latest.values())
+        elif state['latency_series'] is not None:
+            # Sem sondas neste processo: último minuto gravado
+            targets = [row for row in state['latency_series'].latest() if row['target'] != ALL_TARGETS]
+        else:
+            targets = []
         
         return jsonify({
             'success': True,
-            'history': filtered_history,
-            'summary': summary
+            'ping': prober.ping if prober is not None else None,
+            'targets': targets
         })
     except Exception as e:
-        logger.error(f"Erro ao obter histórico: {e}")
+        logger.error(f"Erro ao obter latência: {e}")
         return jsonify({
             'success': False,
             'error': str(e)
         })
 
-@app.route('/api/speedtest', methods=['POST'])
-def speed_test():
-    """Executa um teste de velocidade"""
+@app.route('/api/traffic/top')
+def traffic_top_talkers():
+    """Obtém os processos (ou conexões) que mais consomem banda"""
     try:
-        result = run_speed_test()
+        count = request.args.get('n', default=state['config'].get('trafficTopN', 10), type=int)
+        by = request.args.get('by', BY_PROCESS)
+        if by not in (BY_PROCESS, BY_CONNECTION):
+            raise ValueError(f"Agrupamento inválido: {by}")
+        
+        attribution = state['traffic']
+        if attribution is not None and attribution.samples:
+            result = traffic_top(attribution, count, by)
+        elif state['role'] == ROLE_READER and os.path.exists(TRAFFIC_FILE):
+            # Amostras feitas pelo processo coletor
+            with open(TRAFFIC_FILE, 'r') as f:
+                snapshot = json.load(f)
+            result = {'stats': snapshot['stats'], 'talkers': snapshot[by][:count]}
+        else:
+            result = {'stats': None, 'talkers': []}
         
         return jsonify({
             'success': True,
-            'result': result
+            'enabled': bool(state['config'].get('trafficAttribution')),
+            'by': by,
+            **result
         })
+    except Exception as e:
+        logger.error(f"Erro ao obter o tráfego por processo: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@app.route('/api/flows')
+def get_flows():
+    """Obtém os maiores fluxos do período e os totais por protocolo"""
+    try:
+        if state['flow_series'] is None:
+            raise RuntimeError('Histórico de fluxos indisponível')
+        
+        now = datetime.datetime.now()
+        range_param, cutoff = history_range(request.args.get('range', 'day'), now)
+        cutoff_timestamp = int(cutoff.timestamp() * 1000)
+        limit = min(request.args.get('limit', default=20, type=int), 1000)
+        
+        return jsonify({
+            'success': True,
+            'range': range_param,
+            'enabled': bool(state['config'].get('flowAccounting')),
+            'capture': state['flows'].stats() if state['flows'] is not None else None,
+            'summary': state['flow_series'].summary(cutoff_timestamp),
+            'flows': state['flow_series'].top(cutoff_timestamp, limit=limit)
+        })
+    except Exception as e:
+        logger.error(f"Erro ao obter fluxos: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@app.route('/api/latency/history')
+def latency_history():
+    """Obtém a série por minuto de um alvo (ou de todos, com target=*)"""
+    try:
+        if state['latency_series'] is None:
+            raise RuntimeError('Série de latência indisponível')
+        
+        now = datetime.datetime.now()
+        range_param, cutoff = history_range(request.args.get('range', 'day'), now)
+        cutoff_timestamp = int(cutoff.timestamp() * 1000)
+        target = request.args.get('target', ALL_TARGETS)
+        
+        return jsonify({
+            'success': True,
+            'target': target,
+            'targets': state['latency_series'].targets(cutoff_timestamp),
+            'history': state['latency_series'].query_range(target, cutoff_timestamp),
+            'cutoff': cutoff_timestamp
+        })
+    except Exception as e:
+        logger.error(f"Erro ao obter histórico de latência: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@app.route('/api/speedtest', methods=['GET', 'POST'])
+def speed_test():
+    """Inicia um teste de velocidade em segundo plano ou retorna o mais recente"""
+    try:
+        if request.method == 'GET':
+            job = state['speedtests'].latest()
+            return jsonify({
+                'success': True,
+                'job': state['speedtests'].snapshot(job) if job is not None else None
+            })
+        
+        # Modo rápido: fases de download e upload com duração limitada
+        data = request.get_json(silent=True) or {}
+        quick = bool(data.get('quick', request.args.get('quick') == '1'))
+        
+        # Modo 'local': servidor de vazão embutido (host opcional) em vez da internet
+        mode = data.get('mode', request.args.get('mode'))
+        if mode not in (None, 'internet', 'local'):
+            raise ValueError(f"Modo de teste inválido: {mode}")
+        options = {'quick': quick, 'mode': mode}
+        if data.get('host'):
+            # Só hosts configurados: o servidor não abre conexões para destinos do cliente
+            host = str(data['host'])
+            if host not in allowed_speedtest_hosts():
+                return jsonify({
+                    'success': False,
+                    'error': f"Host não permitido para o teste local: {host}"
+                }), 400
+            options['host'] = host
+        
+        # Pedidos simultâneos compartilham o teste em andamento
+        job, created = state['speedtests'].submit(**options)
+        return jsonify({
+            'success': True,
+            'created': created,
+            'job': state['speedtests'].snapshot(job)
+        }), 202
     except Exception as e:
         logger.error(f"Erro ao executar teste de velocidade: {e}")
         return jsonify({
@@ -738,6 +1922,71 @@ def speed_test():
             'error': str(e)
         })
 
+@app.route('/api/speedtest/history')
+def speed_test_history():
+    """Obtém os resultados dos testes de velocidade do período, brutos ou agregados"""
+    try:
+        series = state['speedtest_series']
+        if series is None:
+            raise RuntimeError('Série de testes de velocidade indisponível')
+        
+        now = datetime.datetime.now()
+        range_param, cutoff = history_range(request.args.get('range', 'day'), now)
+        cutoff_timestamp = int(cutoff.timestamp() * 1000)
+        since = request.args.get('since', type=int)
+        start_timestamp = max(cutoff_timestamp, since) if since is not None else cutoff_timestamp
+        
+        # Agregação feita no banco, nas mesmas resoluções das camadas do histórico
+        resolution = request.args.get('resolution', RAW_RESOLUTION)
+        if resolution in state['rollups'].tiers:
+            results = series.aggregate(state['rollups'].tiers[resolution].width, start_timestamp)
+        else:
+            resolution = RAW_RESOLUTION
+            results = series.query_range(start_timestamp, limit=request.args.get('limit', type=int))
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'resolution': resolution,
+            'summary': series.summary(cutoff_timestamp),
+            'schedule': state['speedtest_schedule'].stats(),
+            'cursor': results[-1]['timestamp'] if results else since,
+            'cutoff': cutoff_timestamp
+        })
+    except Exception as e:
+        logger.error(f"Erro ao obter histórico de testes de velocidade: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@app.route('/api/speedtest/<job_id>')
+def speed_test_job(job_id):
+    """Obtém o andamento e o resultado de um teste de velocidade"""
+    job = state['speedtests'].get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Teste de velocidade não encontrado'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'job': state['speedtests'].snapshot(job)
+    })
+
+@app.route('/api/speedtest/<job_id>/stream')
+def speed_test_stream(job_id):
+    """Envia o andamento de um teste de velocidade via Server-Sent Events"""
+    job = state['speedtests'].get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Teste de velocidade não encontrado'
+        }), 404
+    
+    return event_stream_response(state['speedtests'].stream(job))
+
 @app.route('/api/config', methods=['GET', 'POST'])
 def config():
     """Obtém ou atualiza a configuração"""
@@ -751,6 +2000,8 @@ def config():
             new_config = request.get_json()
             state['config'].update(new_config)
             save_config()
+            if state['role'] == ROLE_READER:
+                send_command('config')
             
             return jsonify({
                 'success': True,
@@ -767,11 +2018,13 @@ def config():
 def interfaces():
     """Obtém as interfaces de rede disponíveis"""
     try:
-        ifaces = get_network_interfaces()
+        # Lista mantida em memória; refeita apenas quando as interfaces mudam
+        inventory = state['interface_inventory']
         
         return jsonify({
             'success': True,
-            'interfaces': ifaces
+            'interfaces': inventory.interfaces(),
+            'inventory': inventory.stats()
         })
     except Exception as e:
         logger.error(f"Erro ao obter interfaces de rede: {e}")
@@ -825,10 +2078,11 @@ def reports():
             # Ordena por data, mais recente primeiro
             reports_list.sort(key=lambda x: x['date'], reverse=True)
             
-            return jsonify({
+            body, mimetype = encode_payload({
                 'success': True,
                 'reports': reports_list
-            })
+            }, wants_msgpack())
+            return cached_response(make_entry(None, body, mimetype))
         except Exception as e:
             logger.error(f"Erro ao listar relatórios: {e}")
             return jsonify({
@@ -839,7 +2093,12 @@ def reports():
         try:
             # Gera um novo relatório
             report_type = request.args.get('type', 'txt')
-            report = generate_report(report_type)
+            try:
+                period = report_period(request.args.get('range'),
+                                       request.args.get('start'), request.args.get('end'))
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            report = generate_report(report_type, period)
             
             return jsonify({
                 'success': report['success'],
@@ -870,23 +2129,136 @@ def download_report(filename):
 def favicon():
     return send_from_directory(os.path.join(STATIC_DIR, 'icons'), 'favicon.ico')
 
+# Servidor de desenvolvimento do Flask (Werkzeug)
+def serve_development(port, threads):
+    logger.warning("Usando o servidor de desenvolvimento do Flask. Para produção, use --server waitress ou gunicorn")
+    init_app_data()
+    app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
+
+# Servidor de produção waitress (processo único, várias threads; funciona no Windows)
+def serve_waitress(port, threads):
+    import waitress
+    
+    init_app_data()
+    logger.info(f"Servidor waitress com {threads} threads")
+    waitress.serve(app, host='0.0.0.0', port=port, threads=threads)
+
+# Servidor de produção gunicorn (Linux/macOS)
+def serve_gunicorn(port, workers, threads):
+    from gunicorn.app.base import BaseApplication
+    
+    collector = None
+    if workers > 1 and not SHARED_MEMORY_AVAILABLE:
+        logger.warning(f"Memória compartilhada indisponível (requer Python 3.8+): usando 1 worker "
+                       f"com {threads} threads em vez de {workers} workers")
+        workers = 1
+    
+    if workers > 1:
+        # Um único coletor amostra a rede; os workers apenas leem o estado publicado
+        if state['config'].get('historyEngine', DEFAULT_ENGINE) != 'sqlite':
+            logger.info("Vários workers: o histórico será mantido no SQLite")
+        collector = start_collector()
+        
+        def post_worker_init(worker):
+            init_reader(collector[0], collector[1])
+    else:
+        def post_worker_init(worker):
+            # Dados e monitor são iniciados no worker, nunca no processo mestre:
+            # threads não sobrevivem ao fork
+            init_app_data()
+    
+    def on_exit(server):
+        if collector is not None:
+            stop_collector(*collector)
+    
+    class MonitorApplication(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            return self.application
+    
+    logger.info(f"Servidor gunicorn com {workers} worker(s) e {threads} threads")
+    MonitorApplication(app, {
+        'bind': f'0.0.0.0:{port}',
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread',
+        # Conexões SSE (/api/stream) ficam abertas: sem timeout de worker ocioso
+        # (o número delas por worker é limitado por maxStreams)
+        'timeout': 0,
+        'post_worker_init': post_worker_init,
+        'on_exit': on_exit
+    }).run()
+
+SERVERS = ('auto', 'development', 'waitress', 'gunicorn')
+
+# Escolhe o servidor: 'auto' usa waitress se instalado, senão o de desenvolvimento
+def resolve_server(name):
+    if name == 'auto':
+        try:
+            import waitress  # noqa: F401
+            return 'waitress'
+        except ImportError:
+            return 'development'
+    
+    module = {'waitress': 'waitress', 'gunicorn': 'gunicorn'}.get(name)
+    if module:
+        try:
+            __import__(module)
+        except ImportError:
+            logger.warning(f"Módulo '{module}' não encontrado. Usando o servidor de desenvolvimento.")
+            return 'development'
+    return name
+
+# Argumentos de linha de comando
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Monitor de Rede - servidor')
+    parser.add_argument('port', nargs='?', default='5000', help='Porta HTTP (padrão 5000)')
+    parser.add_argument('--server', choices=SERVERS, help='Servidor HTTP (padrão: config "server")')
+    parser.add_argument('--workers', type=int, help='Processos do gunicorn (padrão: config "serverWorkers")')
+    parser.add_argument('--threads', type=int, help='Threads por processo (padrão: config "serverThreads")')
+    parser.add_argument('--pcap', metavar='ARQUIVO', help='Reproduz um arquivo .pcap no histórico de fluxos e encerra')
+    return parser.parse_args(argv)
+
 # Inicialização
 def main():
     try:
-        init_app_data()
+        args = parse_args(sys.argv[1:])
+        load_config()
+        
+        if args.pcap:
+            replay_pcap(args.pcap)
+            return
+        
         port = 5000
-        if len(sys.argv) > 1:
-            try:
-                port = int(sys.argv[1])
-            except ValueError:
-                logger.warning(f"Porta inválida: {sys.argv[1]}. Usando a porta padrão 5000.")
+        try:
+            port = int(args.port)
+        except ValueError:
+            logger.warning(f"Porta inválida: {args.port}. Usando a porta padrão 5000.")
         
-        # Em produção, usar waitress ou gunicorn em vez de app.run()
-        logger.info(f"Iniciando servidor na porta {port}")
-        app.run(host='0.0.0.0', port=port, debug=False)
+        server = resolve_server(args.server or state['config'].get('server', 'auto'))
+        workers = max(1, args.workers or int(state['config'].get('serverWorkers', 1)))
+        threads = max(1, args.threads or int(state['config'].get('serverThreads', 8)))
+        # O servidor de desenvolvimento cria uma thread por conexão
+        state['stream_slots'] = StreamSlots(stream_limit(None if server == 'development' else threads))
+        
+        logger.info(f"Iniciando servidor '{server}' na porta {port}")
+        if server == 'waitress':
+            serve_waitress(port, threads)
+        elif server == 'gunicorn':
+            serve_gunicorn(port, workers, threads)
+        else:
+            serve_development(port, threads)
     except Exception as e:
         logger.error(f"Erro ao iniciar aplicação: {e}")
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
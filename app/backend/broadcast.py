@@ -0,0 +1,109 @@
+"""
+Monitor de Rede - Difusão do status ao vivo para clientes SSE
+Cada atualização de state['current'] é codificada uma única vez (delta com os
+campos alterados e um snapshot completo) e compartilhada por todos os
+assinantes de /api/stream. Assinantes lentos não acumulam fila: recebem o
+snapshot mais recente quando perdem alguma versão.
+"""
+
+import json
+import time
+from threading import Condition, Lock
+
+HEARTBEAT_INTERVAL = 15  # segundos
+
+
+def encode_event(payload, event=None):
+    """Formata uma mensagem no protocolo Server-Sent Events"""
+    data = json.dumps(payload, separators=(',', ':'))
+    prefix = f"event: {event}\n" if event else ''
+    return f"{prefix}id: {payload.get('version', 0)}\ndata: {data}\n\n".encode('utf-8')
+
+
+class StatusBroadcaster:
+    """Fan-out único do status atual para todos os assinantes"""
+
+    def __init__(self):
+        self._condition = Condition()
+        self.version = 0
+        self.subscribers = 0
+        self._snapshot = {}
+        self._full_event = encode_event({'version': 0, 'full': True})
+        self._delta_event = self._full_event
+
+    def publish(self, snapshot):
+        """Publica um novo estado; envia apenas os campos que mudaram"""
+        with self._condition:
+            changed = {key: value for key, value in snapshot.items()
+                       if self._snapshot.get(key) != value}
+            if not changed and self.version:
+                return
+            self.version += 1
+            self._snapshot = dict(snapshot)
+            self._delta_event = encode_event(dict(changed, version=self.version))
+            self._full_event = encode_event(dict(snapshot, version=self.version, full=True))
+            self._condition.notify_all()
+
+    def stream(self, should_stop=None):
+        """Gerador de eventos SSE para um assinante"""
+        with self._condition:
+            self.subscribers += 1
+            seen = self.version
+            first = self._full_event
+        try:
+            # Estado completo na conexão, deltas a seguir
+            yield b'retry: 3000\n' + first
+            last_sent = time.monotonic()
+            while should_stop is None or not should_stop():
+                with self._condition:
+                    if self.version == seen:
+                        self._condition.wait(timeout=HEARTBEAT_INTERVAL)
+                    version = self.version
+                    if version == seen:
+                        event = None
+                    elif version == seen + 1:
+                        event = self._delta_event
+                    else:
+                        # Perdeu versões intermediárias: reenvia o snapshot
+                        event = self._full_event
+                    seen = version
+                if event is not None:
+                    yield event
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= HEARTBEAT_INTERVAL:
+                    # Comentário SSE para manter a conexão aberta em proxies
+                    yield b': keep-alive\n\n'
+                    last_sent = time.monotonic()
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+
+class StreamSlots:
+    """Limite de conexões SSE simultâneas no processo
+
+    Cada stream aberto ocupa uma thread do servidor; acima do limite as rotas
+    de stream respondem 503 e o cliente passa a usar polling.
+    """
+
+    def __init__(self, limit):
+        self.limit = max(1, int(limit))
+        self.active = 0
+        self.rejected = 0
+        self._lock = Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.active >= self.limit:
+                self.rejected += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active = max(0, self.active - 1)
+
+    def stats(self):
+        with self._lock:
+            return {'limit': self.limit, 'active': self.active, 'rejected': self.rejected}
@@ -0,0 +1,513 @@
+"""
+Monitor de Rede - Contabilização passiva de fluxos
+Pacotes capturados de um socket AF_PACKET (anel TPACKET_V3 mapeado em
+memória, lido bloco a bloco) ou reproduzidos de um arquivo .pcap são
+agregados em fluxos unidirecionais pela 5-tupla (protocolo, origem, destino e
+portas). Cada fluxo guarda pacotes, bytes (camada IP), primeiro e último
+pacote; ao ficar ocioso por idle_timeout segundos, ou a cada active_timeout
+segundos de atividade, o fluxo é exportado.
+
+O laço por pacote cria apenas a chave do fluxo e a tupla do cabeçalho:
+cabeçalhos são lidos por índice e struct.unpack_from direto do buffer (bloco
+do anel ou trecho do arquivo) e os contadores ficam em arrays indexados pela
+posição do fluxo na tabela. Acima de algumas centenas de milhares de pacotes
+por segundo, a amostragem 1 a cada N (filtro BPF no kernel, na captura ao
+vivo) reduz o trabalho por pacote na mesma proporção.
+
+Fragmentos IP não iniciais e pacotes sem portas (ICMP, etc.) são contados com
+portas 0; cabeçalhos de extensão IPv6 não são percorridos.
+"""
+
+import os
+import mmap
+import ctypes
+import time
+import select
+import socket
+import struct
+import logging
+from array import array
+from threading import Event, Thread
+
+logger = logging.getLogger(__name__)
+
+# Tipos de enlace (pcap LINKTYPE_*)
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+ETH_P_8021Q = 0x8100
+ETH_P_8021AD = 0x88A8
+
+PROTO_ICMP = 1
+PROTO_TCP = 6
+PROTO_UDP = 17
+PROTO_SCTP = 132
+NO_PORTS = b'\x00\x00\x00\x00'
+
+PROTOCOLS = {PROTO_ICMP: 'icmp', PROTO_TCP: 'tcp', PROTO_UDP: 'udp', 58: 'icmpv6', PROTO_SCTP: 'sctp'}
+
+EXPORT_IDLE = 'idle'
+EXPORT_ACTIVE = 'active'
+EXPORT_END = 'end'
+
+# Intervalo (s, no relógio dos pacotes) entre verificações de expiração
+EXPIRY_INTERVAL = 2
+
+# pcap: cabeçalho global e de cada registro
+PCAP_MAGIC = 0xa1b2c3d4
+PCAP_MAGIC_NS = 0xa1b23c4d
+PCAP_CHUNK = 4 * 1024 * 1024
+
+# AF_PACKET / TPACKET_V3 (linux/if_packet.h)
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+TPACKET_V3 = 2
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+PACKET_OUTGOING = 4
+ARPHRD_NONE = 0xFFFE
+RING_BLOCK_SIZE = 1 << 20
+RING_FRAME_SIZE = 2048
+RING_BLOCK_TIMEOUT_MS = 100
+
+TPACKET_REQ3 = struct.Struct('=7I')
+BLOCK_HEADER = struct.Struct('=III')                # block_status, num_pkts, offset_to_first_pkt
+BLOCK_STATUS = struct.Struct('=I')
+BLOCK_STATUS_OFFSET = 8
+# tpacket3_hdr (next_offset, sec, nsec, snaplen, len, status, mac, net) seguido
+# de sockaddr_ll alinhado em 48 bytes (family, protocol, ifindex, hatype, pkttype)
+PACKET_HEADER = struct.Struct('=6IHH20xHHiHB')
+
+# BPF clássico (linux/filter.h) para amostragem no kernel
+SO_ATTACH_FILTER = 26
+SKF_AD_OFF = -0x1000
+SKF_AD_RANDOM = 56
+BPF_LD_W_ABS = 0x20
+BPF_ALU_MOD_K = 0x94
+BPF_JEQ_K = 0x15
+BPF_RET_K = 0x06
+BPF_INSTRUCTION = struct.Struct('=HBBI')
+
+
+def decode_key(key):
+    """Converte a chave (protocolo, endereços + portas) em (protocolo, origem, porta, destino, porta)"""
+    protocol, addresses = key
+    if len(addresses) == 12:
+        family, size = socket.AF_INET, 4
+    else:
+        family, size = socket.AF_INET6, 16
+    src = socket.inet_ntop(family, addresses[:size])
+    dst = socket.inet_ntop(family, addresses[size:2 * size])
+    ports = 2 * size
+    return (protocol, src, addresses[ports] << 8 | addresses[ports + 1],
+            dst, addresses[ports + 2] << 8 | addresses[ports + 3])
+
+
+class FlowTable:
+    """Tabela de fluxos: dicionário chave -> posição, contadores em arrays compactos"""
+
+    def __init__(self, idle_timeout=15, active_timeout=60, max_flows=262144):
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.max_flows = max_flows
+        self.slots = {}
+        self.keys = []
+        self.packets = array('Q')
+        self.bytes = array('Q')
+        self.first = array('q')
+        self.last = array('q')
+        self.free = []
+        self.overflow = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def allocate(self, key, now):
+        """Posição de um fluxo novo, ou None se a tabela estiver cheia"""
+        if len(self.slots) >= self.max_flows:
+            self.overflow += 1
+            return None
+        if self.free:
+            slot = self.free.pop()
+            self.keys[slot] = key
+            self.packets[slot] = 0
+            self.bytes[slot] = 0
+            self.first[slot] = now
+            self.last[slot] = now
+        else:
+            slot = len(self.keys)
+            self.keys.append(key)
+            self.packets.append(0)
+            self.bytes.append(0)
+            self.first.append(now)
+            self.last.append(now)
+        self.slots[key] = slot
+        return slot
+
+    def _record(self, key, slot, reason):
+        protocol, src, sport, dst, dport = decode_key(key)
+        return {
+            'start': self.first[slot] * 1000,
+            'end': self.last[slot] * 1000,
+            'protocol': PROTOCOLS.get(protocol, str(protocol)),
+            'src': src,
+            'sport': sport,
+            'dst': dst,
+            'dport': dport,
+            'packets': self.packets[slot],
+            'bytes': self.bytes[slot],
+            'reason': reason
+        }
+
+    def _release(self, key, slot):
+        del self.slots[key]
+        self.keys[slot] = None
+        self.free.append(slot)
+
+    def expire(self, now, flush=False):
+        """Exporta fluxos ociosos (removidos) e ativos há muito tempo (contadores zerados)"""
+        records = []
+        idle_limit = now - self.idle_timeout
+        active_limit = now - self.active_timeout
+        for key, slot in list(self.slots.items()):
+            if flush:
+                records.append(self._record(key, slot, EXPORT_END))
+                self._release(key, slot)
+            elif self.last[slot] <= idle_limit:
+                records.append(self._record(key, slot, EXPORT_IDLE))
+                self._release(key, slot)
+            elif self.first[slot] <= active_limit:
+                # Fluxo longo: exporta o trecho e continua contando a partir de agora
+                records.append(self._record(key, slot, EXPORT_ACTIVE))
+                self.packets[slot] = 0
+                self.bytes[slot] = 0
+                self.first[slot] = now
+        return records
+
+
+class FlowAccounting:
+    """Agrega pacotes em fluxos e exporta os fluxos expirados
+
+    on_export(records) recebe as listas de fluxos exportados. Com sampling=N
+    apenas 1 a cada N pacotes é processado (no kernel, na captura ao vivo) e
+    os contadores são multiplicados por N.
+    """
+
+    def __init__(self, idle_timeout=15, active_timeout=60, max_flows=262144,
+                 sampling=1, on_export=None):
+        self.table = FlowTable(idle_timeout, active_timeout, max_flows)
+        self.sampling = max(int(sampling), 1)
+        self.on_export = on_export
+        self.packets = 0
+        self.bytes = 0
+        self.skipped = 0
+        self.exported = 0
+        self.source = None
+        self.started = None
+        self._next_expiry = None
+        self._stop = Event()
+        self._thread = None
+        try:
+            self.loopback = socket.if_nametoindex('lo')
+        except OSError:
+            self.loopback = None
+        self.process = self._processor()
+
+    def _processor(self):
+        """Laço por pacote sobre um buffer (trecho de pcap ou bloco do anel)
+
+        process(data, offset, end, count, linktype) lê registros pcap até end
+        (count=None) ou count pacotes TPACKET_V3 a partir de offset, e retorna
+        (offset, relógio, pacotes, bytes, ignorados). Tudo fica inline em uma
+        closure para que tabela e arrays sejam variáveis locais, sem chamada
+        de função nem busca de atributo por pacote.
+        """
+        table = self.table
+        get_slot = table.slots.get
+        allocate = table.allocate
+        packets = table.packets
+        counted = table.bytes
+        last = table.last
+        weight = self.sampling
+        loopback = self.loopback
+        unpack_ring = PACKET_HEADER.unpack_from
+
+        def process(data, offset, end, count, linktype, unpack_record=None):
+            captured = total = skipped = 0
+            now = None
+            index = 0
+            while True:
+                if count is None:
+                    # Registro pcap: cabeçalho de 16 bytes seguido do quadro
+                    if offset + 16 > end:
+                        break
+                    now, _, caplen, wirelen = unpack_record(data, offset)
+                    frame = offset + 16
+                    if frame + caplen > end:
+                        break
+                    offset = frame + caplen
+                    if weight > 1:
+                        # Amostragem 1 a cada N na reprodução
+                        index += 1
+                        if index % weight:
+                            continue
+                    frame_type = linktype
+                else:
+                    if not count:
+                        break
+                    count -= 1
+                    (next_offset, now, _, caplen, wirelen, _, mac, _,
+                     _, _, ifindex, hatype, pkttype) = unpack_ring(data, offset)
+                    frame = offset + mac
+                    offset += next_offset
+                    if pkttype == PACKET_OUTGOING and ifindex == loopback:
+                        # Em loopback cada pacote aparece na saída e na entrada
+                        skipped += 1
+                        continue
+                    frame_type = LINKTYPE_RAW if hatype == ARPHRD_NONE else LINKTYPE_ETHERNET
+
+                frame_end = frame + caplen
+                if frame_type == LINKTYPE_ETHERNET:
+                    if caplen < 14:
+                        skipped += 1
+                        continue
+                    ethertype = data[frame + 12] << 8 | data[frame + 13]
+                    ip = frame + 14
+                    while (ethertype == ETH_P_8021Q or ethertype == ETH_P_8021AD) and ip + 4 <= frame_end:
+                        ethertype = data[ip + 2] << 8 | data[ip + 3]
+                        ip += 4
+                elif frame_type == LINKTYPE_LINUX_SLL:
+                    if caplen < 16:
+                        skipped += 1
+                        continue
+                    ethertype = data[frame + 14] << 8 | data[frame + 15]
+                    ip = frame + 16
+                else:
+                    ip = frame
+                    version = data[ip] >> 4 if caplen else 0
+                    ethertype = ETH_P_IP if version == 4 else ETH_P_IPV6 if version == 6 else 0
+
+                if ethertype == ETH_P_IP:
+                    if ip + 20 > frame_end:
+                        skipped += 1
+                        continue
+                    ihl = (data[ip] & 0x0F) << 2
+                    protocol = data[ip + 9]
+                    l4 = ip + ihl
+                    if ((protocol == PROTO_TCP or protocol == PROTO_UDP or protocol == PROTO_SCTP)
+                            and l4 + 4 <= frame_end and not (data[ip + 6] & 0x1F or data[ip + 7])):
+                        if ihl == 20:
+                            # Sem opções IP: endereços e portas são contíguos
+                            key = (protocol, data[ip + 12:ip + 24])
+                        else:
+                            key = (protocol, data[ip + 12:ip + 20] + data[l4:l4 + 4])
+                    else:
+                        key = (protocol, data[ip + 12:ip + 20] + NO_PORTS)
+                elif ethertype == ETH_P_IPV6:
+                    if ip + 40 > frame_end:
+                        skipped += 1
+                        continue
+                    protocol = data[ip + 6]
+                    if ((protocol == PROTO_TCP or protocol == PROTO_UDP or protocol == PROTO_SCTP)
+                            and ip + 44 <= frame_end):
+                        key = (protocol, data[ip + 8:ip + 44])
+                    else:
+                        key = (protocol, data[ip + 8:ip + 40] + NO_PORTS)
+                else:
+                    skipped += 1
+                    continue
+
+                slot = get_slot(key)
+                if slot is None:
+                    slot = allocate(key, now)
+                    if slot is None:
+                        skipped += 1
+                        continue
+                size = (wirelen - ip + frame) * weight
+                packets[slot] += weight
+                counted[slot] += size
+                last[slot] = now
+                captured += 1
+                total += size
+            return offset, now, captured, total, skipped
+
+        return process
+
+    def tick(self, now, flush=False):
+        """Verifica expirações no máximo a cada EXPIRY_INTERVAL segundos"""
+        if not flush:
+            if self._next_expiry is None:
+                self._next_expiry = now + EXPIRY_INTERVAL
+                return
+            if now < self._next_expiry:
+                return
+        self._next_expiry = now + EXPIRY_INTERVAL
+        records = self.table.expire(now, flush)
+        if records:
+            self.exported += len(records)
+            if self.on_export is not None:
+                try:
+                    self.on_export(records)
+                except Exception as e:
+                    logger.error(f"Erro ao exportar fluxos: {e}")
+
+    def flush(self, now=None):
+        """Exporta todos os fluxos em andamento"""
+        self.tick(int(now if now is not None else time.time()), flush=True)
+
+    def replay(self, path):
+        """Reproduz um arquivo .pcap (relógio dos pacotes) e exporta todos os fluxos ao final"""
+        self.source = f'pcap:{os.path.basename(path)}'
+        self.started = time.time()
+        now = None
+        with open(path, 'rb') as f:
+            header = f.read(24)
+            if len(header) < 24:
+                raise ValueError('Arquivo pcap truncado')
+            for endian in ('<', '>'):
+                magic = struct.unpack(endian + 'I', header[:4])[0]
+                if magic in (PCAP_MAGIC, PCAP_MAGIC_NS):
+                    break
+            else:
+                raise ValueError('Formato não suportado (esperado pcap; pcapng não é suportado)')
+            linktype = struct.unpack(endian + 'I', header[20:24])[0] & 0x0FFFFFFF
+            if linktype not in (LINKTYPE_ETHERNET, LINKTYPE_RAW, LINKTYPE_LINUX_SLL):
+                raise ValueError(f"Tipo de enlace não suportado: {linktype}")
+            unpack_record = struct.Struct(endian + 'IIII').unpack_from
+
+            # Leituras em trechos grandes; o registro incompleto no fim passa ao próximo
+            pending = b''
+            while True:
+                chunk = f.read(PCAP_CHUNK)
+                if not chunk:
+                    break
+                data = pending + chunk if pending else chunk
+                offset, chunk_now, packets, total, skipped = self.process(
+                    data, 0, len(data), None, linktype, unpack_record)
+                pending = data[offset:]
+                self.packets += packets
+                self.bytes += total
+                self.skipped += skipped
+                if chunk_now is not None:
+                    now = chunk_now
+                    self.tick(now)
+
+        self.flush(now)
+        return self.stats()
+
+    def start(self, interface=None, block_count=32):
+        """Captura ao vivo em uma thread própria (requer root ou CAP_NET_RAW)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        ring = PacketRing(interface, block_count=block_count, sampling=self.sampling)
+        self.source = f"af_packet:{interface or 'all'}"
+        self.started = time.time()
+        self._stop.clear()
+        self._thread = Thread(target=self._capture, args=(ring,), name='flow-capture', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def _capture(self, ring):
+        try:
+            while not self._stop.is_set():
+                for data, offset, count in ring.blocks(0.5):
+                    _, _, packets, total, skipped = self.process(data, offset, None, count, None)
+                    self.packets += packets
+                    self.bytes += total
+                    self.skipped += skipped
+                self.tick(int(time.time()))
+        except Exception as e:
+            logger.error(f"Erro na captura de pacotes: {e}")
+        finally:
+            ring.close()
+            self.flush()
+
+    def stats(self):
+        elapsed = time.time() - self.started if self.started else 0
+        return {
+            'source': self.source,
+            'packets': self.packets,
+            'bytes': self.bytes,
+            'skipped': self.skipped,
+            'activeFlows': len(self.table),
+            'exportedFlows': self.exported,
+            'overflow': self.table.overflow,
+            'packetsPerSecond': self.packets / elapsed if elapsed > 0 else 0.0
+        }
+
+
+def sampling_filter(rate):
+    """Programa BPF clássico que aceita, ao acaso, 1 a cada rate pacotes"""
+    return [
+        (BPF_LD_W_ABS, 0, 0, (SKF_AD_OFF + SKF_AD_RANDOM) & 0xFFFFFFFF),
+        (BPF_ALU_MOD_K, 0, 0, rate),
+        (BPF_JEQ_K, 0, 1, 0),
+        (BPF_RET_K, 0, 0, 0x40000),
+        (BPF_RET_K, 0, 0, 0)
+    ]
+
+
+class PacketRing:
+    """Socket AF_PACKET com anel de recepção TPACKET_V3 mapeado em memória
+
+    O kernel entrega blocos com vários pacotes; cada bloco é lido de uma vez
+    e devolvido ao kernel, sem uma chamada de sistema por pacote.
+    """
+
+    def __init__(self, interface=None, block_size=RING_BLOCK_SIZE, block_count=32, sampling=1):
+        self.block_size = block_size
+        self.block_count = block_count
+        self.block = 0
+        self._sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        try:
+            if sampling > 1:
+                self._attach_filter(sampling_filter(sampling))
+            self._sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            self._sock.setsockopt(SOL_PACKET, PACKET_RX_RING, TPACKET_REQ3.pack(
+                block_size, block_count, RING_FRAME_SIZE, block_size * block_count // RING_FRAME_SIZE,
+                RING_BLOCK_TIMEOUT_MS, 0, 0))
+            self.map = mmap.mmap(self._sock.fileno(), block_size * block_count,
+                                 mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            if interface:
+                self._sock.bind((interface, ETH_P_ALL))
+        except OSError:
+            self._sock.close()
+            raise
+
+    def _attach_filter(self, program):
+        instructions = b''.join(BPF_INSTRUCTION.pack(*instruction) for instruction in program)
+        buffer = ctypes.create_string_buffer(instructions)
+        # struct sock_fprog { unsigned short len; struct sock_filter *filter; }
+        fprog = struct.pack('HL', len(program), ctypes.addressof(buffer))
+        self._sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+    def _ready(self):
+        offset = self.block * self.block_size + BLOCK_STATUS_OFFSET
+        return BLOCK_STATUS.unpack_from(self.map, offset)[0] & TP_STATUS_USER
+
+    def blocks(self, timeout):
+        """Gera (mapa, início do primeiro pacote, pacotes) dos blocos prontos
+
+        Cada bloco é devolvido ao kernel quando o próximo é pedido.
+        """
+        if not self._ready():
+            select.select([self._sock], [], [], timeout)
+        while self._ready():
+            base = self.block * self.block_size
+            _, count, offset = BLOCK_HEADER.unpack_from(self.map, base + BLOCK_STATUS_OFFSET)
+            yield self.map, base + offset, count
+            BLOCK_STATUS.pack_into(self.map, base + BLOCK_STATUS_OFFSET, TP_STATUS_KERNEL)
+            self.block = (self.block + 1) % self.block_count
+
+    def close(self):
+        self.map.close()
+        self._sock.close()
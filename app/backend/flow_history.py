@@ -0,0 +1,87 @@
+"""
+Monitor de Rede - Série histórica dos fluxos exportados
+Cada fluxo exportado pela contabilização passiva (5-tupla, pacotes, bytes,
+início e fim) vira uma linha em SQLite, indexada pelo fim do fluxo. Os maiores
+fluxos e os totais por protocolo de um período são agregados no banco.
+"""
+
+import sqlite3
+import logging
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+
+class FlowSeries:
+    """Fluxos exportados em SQLite (modo WAL)"""
+
+    COLUMNS = ('start', 'end', 'protocol', 'src', 'sport', 'dst', 'dport', 'packets', 'bytes', 'reason')
+    FLOW_KEY = ('protocol', 'src', 'sport', 'dst', 'dport')
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS flows ('
+            'start INTEGER NOT NULL, "end" INTEGER NOT NULL, protocol TEXT, '
+            'src TEXT, sport INTEGER, dst TEXT, dport INTEGER, '
+            'packets INTEGER, bytes INTEGER, reason TEXT)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_flows_end ON flows ("end")')
+        self._conn.commit()
+
+    def append_many(self, records):
+        """Grava fluxos exportados (uma transação por lote)"""
+        if not records:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO flows VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [tuple(record[column] for column in self.COLUMNS) for record in records]
+            )
+
+    def top(self, start_timestamp, end_timestamp=None, limit=20):
+        """Maiores fluxos do período (trechos da mesma 5-tupla somados)"""
+        end_timestamp = end_timestamp if end_timestamp is not None else 2 ** 62
+        key = ', '.join(self.FLOW_KEY)
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT {key}, MIN(start), MAX("end"), SUM(packets), SUM(bytes) FROM flows '
+                'WHERE "end" >= ? AND "end" < ? '
+                f'GROUP BY {key} ORDER BY SUM(bytes) DESC LIMIT ?',
+                (start_timestamp, end_timestamp, int(limit))
+            ).fetchall()
+        return [dict(zip(self.FLOW_KEY + ('start', 'end', 'packets', 'bytes'), row)) for row in rows]
+
+    def summary(self, start_timestamp, end_timestamp=None):
+        """Fluxos, pacotes e bytes do período, no total e por protocolo"""
+        end_timestamp = end_timestamp if end_timestamp is not None else 2 ** 62
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT protocol, COUNT(*), SUM(packets), SUM(bytes) FROM flows '
+                'WHERE "end" >= ? AND "end" < ? GROUP BY protocol ORDER BY SUM(bytes) DESC',
+                (start_timestamp, end_timestamp)
+            ).fetchall()
+        protocols = [{'protocol': row[0], 'flows': row[1], 'packets': row[2], 'bytes': row[3]} for row in rows]
+        return {
+            'flows': sum(row['flows'] for row in protocols),
+            'packets': sum(row['packets'] for row in protocols),
+            'bytes': sum(row['bytes'] for row in protocols),
+            'protocols': protocols
+        }
+
+    def drop_expired(self, cutoff_timestamp):
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                'DELETE FROM flows WHERE "end" < ?', (cutoff_timestamp,)
+            ).rowcount
+        if removed:
+            logger.info(f"Fluxos: {removed} registros expirados removidos")
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,148 @@
+"""
+Monitor de Rede - Representação colunar do histórico em memória
+Cada campo do registro é guardado em um array tipado (array('q') para o
+timestamp, array('d') para as medições), o que reduz o custo por amostra de
+um dicionário com seis chaves para 48 bytes.
+
+Os chamadores continuam vendo registros no formato de dicionário: iteração,
+indexação e fatias constroem os dicionários sob demanda.
+
+A ordem por timestamp é garantida na inserção, o que permite obter janelas,
+as últimas entradas e o ponto de corte da retenção por busca binária.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+FIELDS = ('timestamp', 'download', 'upload', 'ping', 'totalDownload', 'totalUpload')
+VALUE_FIELDS = FIELDS[1:]
+STAT_FIELDS = ('download', 'upload', 'ping')
+
+
+class HistoryColumns:
+    """Histórico em colunas paralelas, ordenado pela coluna de timestamp"""
+
+    __slots__ = ('timestamps', 'columns')
+
+    def __init__(self, records=None):
+        self.timestamps = array('q')
+        self.columns = {field: array('d') for field in VALUE_FIELDS}
+        if records is not None:
+            self.extend(records)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __bool__(self):
+        return len(self.timestamps) > 0
+
+    def _record(self, index):
+        record = {'timestamp': self.timestamps[index]}
+        for field in VALUE_FIELDS:
+            record[field] = self.columns[field][index]
+        return record
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._record(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('índice fora do histórico')
+        return self._record(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._record(index)
+
+    def append(self, record):
+        timestamp = int(record['timestamp'])
+        if not self.timestamps or timestamp >= self.timestamps[-1]:
+            self.timestamps.append(timestamp)
+            for field in VALUE_FIELDS:
+                self.columns[field].append(record.get(field, 0))
+            return
+
+        # Registro fora de ordem (ex.: relógio ajustado): insere na posição correta
+        index = bisect_right(self.timestamps, timestamp)
+        self.timestamps.insert(index, timestamp)
+        for field in VALUE_FIELDS:
+            self.columns[field].insert(index, record.get(field, 0))
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def clear(self):
+        del self.timestamps[:]
+        for column in self.columns.values():
+            del column[:]
+
+    def index_of(self, timestamp):
+        """Posição do primeiro registro com timestamp >= timestamp (busca binária)"""
+        return bisect_left(self.timestamps, timestamp)
+
+    def range(self, start_timestamp, end_timestamp=None):
+        """Registros com start_timestamp <= timestamp < end_timestamp"""
+        start = self.index_of(start_timestamp)
+        end = len(self) if end_timestamp is None else self.index_of(end_timestamp)
+        return self[start:end]
+
+    def copy_range(self, start_timestamp, end_timestamp=None):
+        """Cópia independente do período, feita por fatias dos arrays (sem dicionários)"""
+        start = self.index_of(start_timestamp)
+        end = len(self) if end_timestamp is None else self.index_of(end_timestamp)
+        copy = HistoryColumns()
+        copy.timestamps = self.timestamps[start:end]
+        copy.columns = {field: column[start:end] for field, column in self.columns.items()}
+        return copy
+
+    def stats(self):
+        """Total de registros, primeiro/último timestamp, média/mín/máx e totais finais"""
+        count = len(self)
+        stats = {
+            'count': count,
+            'first': self.timestamps[0] if count else None,
+            'last': self.timestamps[-1] if count else None,
+            'totalDownload': self.columns['totalDownload'][-1] if count else 0,
+            'totalUpload': self.columns['totalUpload'][-1] if count else 0
+        }
+        for field in STAT_FIELDS:
+            column = self.columns[field]
+            name = field.capitalize()
+            stats[f'avg{name}'] = sum(column) / count if count else 0
+            stats[f'min{name}'] = min(column) if count else 0
+            stats[f'max{name}'] = max(column) if count else 0
+        return stats
+
+    def tail(self, limit):
+        """Últimos limit registros, em ordem cronológica"""
+        return self[max(0, len(self) - limit):]
+
+    def trim(self, cutoff_timestamp):
+        """Remove os registros anteriores a cutoff_timestamp. Retorna o total removido"""
+        index = self.index_of(cutoff_timestamp)
+        if index:
+            del self.timestamps[:index]
+            for column in self.columns.values():
+                del column[:index]
+        return index
+
+
+def records_to_columns(records, precision=None):
+    """Converte registros em colunas ({campo: [valores]}), com casas decimais fixas
+
+    Formato compacto opcional das respostas de histórico: os nomes dos campos
+    aparecem uma única vez e os floats são arredondados para precision casas.
+    """
+    if not records:
+        return {'fields': [], 'columns': {}}
+    fields = list(records[0].keys())
+    columns = {}
+    for field in fields:
+        values = [record.get(field) for record in records]
+        if precision is not None and field != 'timestamp':
+            values = [round(value, precision) if isinstance(value, float) else value
+                      for value in values]
+        columns[field] = values
+    return {'fields': fields, 'columns': columns}
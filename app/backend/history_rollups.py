@@ -0,0 +1,408 @@
+"""
+Monitor de Rede - Agregações do histórico em múltiplas resoluções
+Mantém camadas (tiers) de 5 minutos, 1 hora e 1 dia com min/média/máx/p95
+de download, upload e ping, atualizadas a cada registro anexado ao histórico.
+
+Consultas de períodos longos usam a camada mais grossa que ainda respeita o
+limite de pontos, mantendo o tamanho da resposta limitado. Os buckets fechados
+ficam em arrays tipados, uma coluna por campo; os dicionários são montados
+apenas para os buckets devolvidos por uma consulta.
+
+Também mantém somas parciais por minuto para as janelas deslizantes
+(dia/semana/mês), de forma que o resumo de /api/history custa O(1) amortizado.
+Os percentis de latência das janelas vêm de histogramas logarítmicos por
+minuto, somados e subtraídos da mesma forma.
+"""
+
+import math
+from array import array
+from bisect import bisect_left
+
+# Resolução dos registros brutos (um registro por minuto)
+RAW_RESOLUTION = 'raw'
+RAW_RESOLUTION_MS = 60 * 1000
+
+# (nome, largura do bucket em ms), da mais fina para a mais grossa
+ROLLUP_TIERS = (
+    ('5m', 5 * 60 * 1000),
+    ('1h', 60 * 60 * 1000),
+    ('1d', 24 * 60 * 60 * 1000),
+)
+
+METRICS = ('download', 'upload', 'ping')
+
+# Campos de um bucket fechado (além do timestamp), cada um em uma coluna 'd'
+BUCKET_FIELDS = ('samples', 'totalDownload', 'totalUpload') + tuple(
+    field for metric in METRICS
+    for field in (metric, f'{metric}Min', f'{metric}Max', f'{metric}P95'))
+
+# Histograma de latência: buckets logarítmicos de 0,1 ms a ~67 s (passo de 15%)
+LATENCY_MIN_MS = 0.1
+LATENCY_GROWTH = 1.15
+LATENCY_BUCKETS = 96
+
+# Janelas deslizantes do resumo de /api/history (nome, duração em ms)
+SUMMARY_WINDOWS = (
+    ('day', 24 * 60 * 60 * 1000),
+    ('week', 7 * 24 * 60 * 60 * 1000),
+    ('month', 30 * 24 * 60 * 60 * 1000),
+)
+
+
+def percentile(sorted_values, fraction):
+    """Percentil pelo método do posto mais próximo"""
+    if not sorted_values:
+        return 0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_bucket(rtt_ms):
+    """Índice do bucket do histograma de latência para um RTT em ms"""
+    if rtt_ms <= LATENCY_MIN_MS:
+        return 0
+    index = int(math.log(rtt_ms / LATENCY_MIN_MS, LATENCY_GROWTH)) + 1
+    return min(index, LATENCY_BUCKETS - 1)
+
+
+def latency_histogram(rtts):
+    counts = array('q', bytes(8 * LATENCY_BUCKETS))
+    for rtt in rtts:
+        counts[latency_bucket(rtt)] += 1
+    return counts
+
+
+def histogram_percentile(counts, fraction):
+    """Percentil aproximado (centro geométrico do bucket) de um histograma de latência"""
+    total = sum(counts)
+    if not total:
+        return 0
+    rank = max(1, math.ceil(fraction * total))
+    seen = 0
+    for index, count in enumerate(counts):
+        seen += count
+        if seen >= rank:
+            if index == 0:
+                return LATENCY_MIN_MS
+            low = LATENCY_MIN_MS * LATENCY_GROWTH ** (index - 1)
+            return low * math.sqrt(LATENCY_GROWTH)
+    return LATENCY_MIN_MS * LATENCY_GROWTH ** (LATENCY_BUCKETS - 1)
+
+
+class RollupBucket:
+    """Bucket aberto de uma camada; guarda as amostras até ser fechado"""
+
+    __slots__ = ('start', 'count', 'values', 'total_download', 'total_upload')
+
+    def __init__(self, start):
+        self.start = start
+        self.count = 0
+        self.values = {metric: [] for metric in METRICS}
+        self.total_download = 0
+        self.total_upload = 0
+
+    def add(self, record):
+        self.count += 1
+        for metric in METRICS:
+            self.values[metric].append(record[metric])
+        self.total_download = record['totalDownload']
+        self.total_upload = record['totalUpload']
+
+    def finalize(self):
+        """Converte o bucket no registro agregado da camada"""
+        result = {
+            'timestamp': self.start,
+            'samples': self.count,
+            'totalDownload': self.total_download,
+            'totalUpload': self.total_upload
+        }
+        for metric in METRICS:
+            values = sorted(self.values[metric])
+            result[metric] = sum(values) / len(values) if values else 0
+            result[f'{metric}Min'] = values[0] if values else 0
+            result[f'{metric}Max'] = values[-1] if values else 0
+            result[f'{metric}P95'] = percentile(values, 0.95)
+        return result
+
+
+class RollupTier:
+    """Sequência ordenada de buckets fechados de uma resolução, em colunas"""
+
+    def __init__(self, name, width):
+        self.name = name
+        self.width = width
+        self.clear()
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _append(self, bucket):
+        self.starts.append(bucket['timestamp'])
+        for field in BUCKET_FIELDS:
+            self.columns[field].append(bucket[field])
+
+    def _bucket(self, index):
+        bucket = {'timestamp': self.starts[index]}
+        for field in BUCKET_FIELDS:
+            bucket[field] = self.columns[field][index]
+        bucket['samples'] = int(bucket['samples'])
+        return bucket
+
+    def add(self, record):
+        start = record['timestamp'] - record['timestamp'] % self.width
+        if self.current is not None and start != self.current.start:
+            if start < self.current.start:
+                # Registro fora de ordem: ignorado pelas agregações
+                return
+            self._append(self.current.finalize())
+            self.current = None
+        if self.current is None:
+            self.current = RollupBucket(start)
+        self.current.add(record)
+
+    def query(self, start_timestamp):
+        """Buckets que terminam depois de start_timestamp, incluindo o aberto"""
+        index = bisect_left(self.starts, start_timestamp - self.width + 1)
+        result = [self._bucket(i) for i in range(index, len(self.starts))]
+        if self.current is not None and self.current.start + self.width > start_timestamp:
+            result.append(self.current.finalize())
+        return result
+
+    def trim(self, cutoff_timestamp):
+        index = bisect_left(self.starts, cutoff_timestamp - self.width + 1)
+        if index:
+            del self.starts[:index]
+            for column in self.columns.values():
+                del column[:index]
+        if self.current is not None and self.current.start + self.width <= cutoff_timestamp:
+            self.current = None
+
+    def clear(self):
+        self.starts = array('q')
+        self.columns = {field: array('d') for field in BUCKET_FIELDS}
+        self.current = None
+
+
+class HistoryRollups:
+    """Conjunto de camadas de agregação mantido ao lado do histórico bruto"""
+
+    def __init__(self, tiers=ROLLUP_TIERS):
+        self.tiers = {name: RollupTier(name, width) for name, width in tiers}
+
+    def add(self, record):
+        for tier in self.tiers.values():
+            tier.add(record)
+
+    def clear(self):
+        for tier in self.tiers.values():
+            tier.clear()
+
+    def rebuild(self, records):
+        self.clear()
+        for record in records:
+            self.add(record)
+
+    def trim(self, cutoff_timestamp):
+        for tier in self.tiers.values():
+            tier.trim(cutoff_timestamp)
+
+    def resolution_for(self, span_ms, max_points):
+        """Escolhe a resolução mais fina cujo número de pontos cabe em max_points"""
+        if span_ms / RAW_RESOLUTION_MS <= max_points:
+            return RAW_RESOLUTION
+        for name, tier in self.tiers.items():
+            if span_ms / tier.width <= max_points:
+                return name
+        return list(self.tiers)[-1]
+
+    def query(self, resolution, start_timestamp):
+        return self.tiers[resolution].query(start_timestamp)
+
+
+class WindowAggregates:
+    """Valores de cada registro em colunas com somas correntes por janela
+
+    Cada registro é somado uma vez em todas as janelas; quando o tempo avança,
+    os registros anteriores ao início de uma janela são subtraídos dela, pelo
+    mesmo critério das consultas ao histórico (timestamp >= início). Registros
+    que já saíram da maior janela são descartados em blocos.
+    """
+
+    COMPACT_THRESHOLD = 1024
+
+    def __init__(self, windows=SUMMARY_WINDOWS):
+        self.windows = dict(windows)
+        self.clear()
+
+    def clear(self):
+        self.timestamps = array('q')
+        self.downloads = array('d')
+        self.uploads = array('d')
+        # Por janela: [índice do primeiro registro, contagem, soma download, soma upload]
+        self.running = {name: [0, 0, 0.0, 0.0] for name in self.windows}
+        self.last_totals = (0, 0)
+        self.last_timestamp = None
+
+    def add(self, record):
+        timestamp = record['timestamp']
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            # Registro fora de ordem: ignorado pelas agregações
+            return
+        self.timestamps.append(int(timestamp))
+        self.downloads.append(record['download'])
+        self.uploads.append(record['upload'])
+
+        for window in self.running.values():
+            window[1] += 1
+            window[2] += record['download']
+            window[3] += record['upload']
+
+        self.last_totals = (record['totalDownload'], record['totalUpload'])
+        self.last_timestamp = timestamp
+
+    def rebuild(self, records):
+        self.clear()
+        for record in records:
+            self.add(record)
+
+    def _advance(self, name, cutoff_timestamp):
+        window = self.running[name]
+        index = window[0]
+        while index < len(self.timestamps) and self.timestamps[index] < cutoff_timestamp:
+            window[1] -= 1
+            window[2] -= self.downloads[index]
+            window[3] -= self.uploads[index]
+            index += 1
+        window[0] = index
+        if window[1] <= 0:
+            # Janela vazia: zera para não acumular erro de arredondamento
+            window[1:] = [0, 0.0, 0.0]
+
+    def _compact(self):
+        drop = min(window[0] for window in self.running.values())
+        if drop < self.COMPACT_THRESHOLD:
+            return
+        for column in (self.timestamps, self.downloads, self.uploads):
+            del column[:drop]
+        for window in self.running.values():
+            window[0] -= drop
+
+    def trim(self, cutoff_timestamp):
+        """Remove registros expirados pela retenção do histórico"""
+        for name in self.running:
+            self._advance(name, cutoff_timestamp)
+        self._compact()
+
+    def summary(self, name, now_timestamp):
+        """Resumo da janela que termina em now_timestamp, no formato de /api/history"""
+        self._advance(name, now_timestamp - self.windows[name])
+        self._compact()
+        _, count, sum_download, sum_upload = self.running[name]
+        if not count:
+            return {
+                'avgDownload': 0,
+                'avgUpload': 0,
+                'totalDownload': 0,
+                'totalUpload': 0
+            }
+        return {
+            'avgDownload': sum_download / count,
+            'avgUpload': sum_upload / count,
+            'totalDownload': self.last_totals[0],
+            'totalUpload': self.last_totals[1]
+        }
+
+
+class LatencyWindows:
+    """Histogramas de latência por minuto com histogramas correntes por janela
+
+    Mesmo esquema de WindowAggregates: cada minuto é somado a todas as janelas
+    ao chegar e subtraído de cada uma quando começa antes do início dela (a
+    resolução dos histogramas é de um minuto). Os minutos guardam só
+    os buckets não vazios, como pares (bucket, contagem) em arrays contínuos:
+    um minuto típico ocupa algumas dezenas de bytes em vez de um histograma
+    completo de LATENCY_BUCKETS contagens.
+    """
+
+    COMPACT_THRESHOLD = 1024
+
+    def __init__(self, windows=SUMMARY_WINDOWS, bucket_width=RAW_RESOLUTION_MS):
+        self.windows = dict(windows)
+        self.bucket_width = bucket_width
+        self.clear()
+
+    def clear(self):
+        self.starts = array('q')
+        # Quantidade de pares de cada minuto, seguidos em entry_buckets/entry_counts
+        self.lengths = array('B')
+        self.entry_buckets = array('B')
+        self.entry_counts = array('I')
+        # Por janela: [índice do primeiro minuto, posição do seu primeiro par, histograma corrente]
+        self.running = {name: [0, 0, array('q', bytes(8 * LATENCY_BUCKETS))] for name in self.windows}
+        self.last_timestamp = None
+
+    def add(self, timestamp, histogram):
+        """Soma o histograma de um minuto (array com LATENCY_BUCKETS contagens)"""
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            return
+        start = int(timestamp - timestamp % self.bucket_width)
+        if not self.starts or self.starts[-1] != start:
+            self.starts.append(start)
+            self.lengths.append(0)
+        first = len(self.entry_buckets) - self.lengths[-1]
+        for index, count in enumerate(histogram):
+            if not count:
+                continue
+            try:
+                # Mesmo minuto somado de novo: acumula no par existente
+                position = self.entry_buckets.index(index, first)
+                self.entry_counts[position] += count
+            except ValueError:
+                self.entry_buckets.append(index)
+                self.entry_counts.append(count)
+                self.lengths[-1] += 1
+            for window in self.running.values():
+                window[2][index] += count
+        self.last_timestamp = timestamp
+
+    def _advance(self, name, cutoff_timestamp):
+        window = self.running[name]
+        index, position, running = window
+        while index < len(self.starts) and self.starts[index] < cutoff_timestamp:
+            end = position + self.lengths[index]
+            for entry in range(position, end):
+                running[self.entry_buckets[entry]] -= self.entry_counts[entry]
+            position = end
+            index += 1
+        window[0] = index
+        window[1] = position
+
+    def _compact(self):
+        drop = min(window[0] for window in self.running.values())
+        if drop < self.COMPACT_THRESHOLD:
+            return
+        entries = sum(self.lengths[:drop])
+        del self.starts[:drop]
+        del self.lengths[:drop]
+        del self.entry_buckets[:entries]
+        del self.entry_counts[:entries]
+        for window in self.running.values():
+            window[0] -= drop
+            window[1] -= entries
+
+    def trim(self, cutoff_timestamp):
+        for name in self.running:
+            self._advance(name, cutoff_timestamp)
+        self._compact()
+
+    def summary(self, name, now_timestamp):
+        """Percentis de latência da janela que termina em now_timestamp"""
+        self._advance(name, now_timestamp - self.windows[name])
+        self._compact()
+        histogram = self.running[name][2]
+        return {
+            'latencySamples': sum(histogram),
+            'latencyP50': histogram_percentile(histogram, 0.50),
+            'latencyP95': histogram_percentile(histogram, 0.95),
+            'latencyP99': histogram_percentile(histogram, 0.99)
+        }
@@ -0,0 +1,565 @@
+"""
+Monitor de Rede - Armazenamento do histórico de medições
+Backends plugáveis usados por app.py para persistir o histórico.
+
+O backend padrão ('segments') grava cada registro como uma linha JSON
+em um segmento diário (log somente-anexação), de modo que cada amostra
+custa uma única escrita, independente do tamanho do período de retenção.
+
+O backend 'sqlite' mantém o histórico apenas em disco, com índice por
+timestamp, e responde às consultas por período diretamente via SQL.
+"""
+
+import os
+import time
+import json
+import sqlite3
+import logging
+import datetime
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = '.jsonl'
+SEGMENT_DATE_FORMAT = '%Y%m%d'
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+class HistoryStore:
+    """Interface comum para os backends de histórico"""
+
+    name = 'base'
+
+    # Backends indexados respondem às consultas sem cópia em memória
+    indexed = False
+
+    def load(self):
+        """Retorna todos os registros persistidos, em ordem cronológica"""
+        raise NotImplementedError
+
+    def append(self, record):
+        """Persiste um novo registro"""
+        raise NotImplementedError
+
+    def append_many(self, records):
+        """Persiste um lote de registros"""
+        for record in records:
+            self.append(record)
+
+    def drop_expired(self, cutoff_timestamp):
+        """Remove dados anteriores a cutoff_timestamp (ms). Retorna o total removido"""
+        return 0
+
+    def compact(self, cutoff_timestamp=None):
+        """Reorganiza o armazenamento em disco"""
+
+    def flush(self):
+        """Garante que os dados pendentes estejam em disco"""
+
+    def close(self):
+        self.flush()
+
+    # Consultas (apenas backends indexados)
+    def query_range(self, start_timestamp, end_timestamp=None):
+        raise NotImplementedError
+
+    def iter_range(self, start_timestamp, end_timestamp=None):
+        raise NotImplementedError
+
+    def summary(self, start_timestamp, end_timestamp=None):
+        raise NotImplementedError
+
+    def tail(self, limit):
+        raise NotImplementedError
+
+    def snapshot(self, start_timestamp, end_timestamp=None, chunk_size=1000):
+        raise NotImplementedError
+
+
+class SegmentLogStore(HistoryStore):
+    """Log somente-anexação em segmentos JSON-lines, um arquivo por dia (UTC)"""
+
+    name = 'segments'
+
+    def __init__(self, directory, legacy_file=None):
+        self.directory = directory
+        self.legacy_file = legacy_file
+        self._lock = Lock()
+        self._handle = None
+        self._handle_key = None
+        self._dirty_segments = set()
+        os.makedirs(self.directory, exist_ok=True)
+
+    # Utilitários de segmentos
+    @staticmethod
+    def segment_key(timestamp):
+        moment = datetime.datetime.fromtimestamp(timestamp / 1000, datetime.timezone.utc)
+        return moment.strftime(SEGMENT_DATE_FORMAT)
+
+    @staticmethod
+    def segment_start(key):
+        moment = datetime.datetime.strptime(key, SEGMENT_DATE_FORMAT)
+        return int(moment.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
+
+    def segment_path(self, key):
+        return os.path.join(self.directory, f"{key}{SEGMENT_SUFFIX}")
+
+    def segment_keys(self):
+        keys = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(SEGMENT_SUFFIX):
+                continue
+            key = filename[:-len(SEGMENT_SUFFIX)]
+            try:
+                self.segment_start(key)
+            except ValueError:
+                continue
+            keys.append(key)
+        return sorted(keys)
+
+    def _close_handle(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+            self._handle_key = None
+
+    def _read_segment(self, key):
+        records = []
+        corrupted = 0
+        with open(self.segment_path(key), 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Linha truncada (ex.: queda durante a escrita)
+                    corrupted += 1
+        if corrupted:
+            logger.warning(f"Segmento {key}: {corrupted} linhas inválidas ignoradas")
+            self._dirty_segments.add(key)
+        return records
+
+    def _first_timestamp(self, key):
+        """Timestamp do primeiro registro válido do segmento (None se vazio)"""
+        with open(self.segment_path(key), 'r') as f:
+            for line in f:
+                try:
+                    return json.loads(line)['timestamp']
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return None
+
+    def _remove_segment(self, key):
+        if key == self._handle_key:
+            self._close_handle()
+        os.remove(self.segment_path(key))
+        self._dirty_segments.discard(key)
+
+    def _write_segment(self, key, records):
+        path = self.segment_path(key)
+        if not records:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+        os.replace(tmp_path, path)
+
+    def _migrate_legacy(self):
+        """Converte o antigo history.json (lista única) para segmentos"""
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return
+        try:
+            with open(self.legacy_file, 'r') as f:
+                legacy_records = json.load(f)
+        except Exception as e:
+            logger.error(f"Erro ao ler histórico legado para migração: {e}")
+            return
+
+        segments = {}
+        for record in sorted(legacy_records, key=lambda x: x['timestamp']):
+            segments.setdefault(self.segment_key(record['timestamp']), []).append(record)
+        for key, records in segments.items():
+            self._write_segment(key, self._read_segment(key) + records
+                                if os.path.exists(self.segment_path(key)) else records)
+
+        os.replace(self.legacy_file, self.legacy_file + '.migrated')
+        logger.info(f"Histórico legado migrado para segmentos: {len(legacy_records)} registros")
+
+    # Interface HistoryStore
+    def load(self):
+        with self._lock:
+            self._close_handle()
+            self._migrate_legacy()
+            records = []
+            for key in self.segment_keys():
+                records.extend(self._read_segment(key))
+            records.sort(key=lambda x: x['timestamp'])
+            return records
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records):
+        # Agrupa as linhas por segmento para uma única escrita por arquivo
+        groups = []
+        for record in records:
+            key = self.segment_key(record['timestamp'])
+            line = json.dumps(record, separators=(',', ':')) + '\n'
+            if groups and groups[-1][0] == key:
+                groups[-1][1].append(line)
+            else:
+                groups.append((key, [line]))
+
+        with self._lock:
+            for key, lines in groups:
+                if self._handle_key != key:
+                    self._close_handle()
+                    self._handle = open(self.segment_path(key), 'a')
+                    self._handle_key = key
+                self._handle.write(''.join(lines))
+            if self._handle is not None:
+                self._handle.flush()
+
+    def drop_expired(self, cutoff_timestamp):
+        removed = 0
+        with self._lock:
+            for key in self.segment_keys():
+                # Só descarta segmentos inteiros, cujo dia terminou antes do corte
+                if self.segment_start(key) + DAY_MS > cutoff_timestamp:
+                    break
+                self._remove_segment(key)
+                removed += 1
+        if removed:
+            logger.info(f"Histórico: {removed} segmentos expirados removidos")
+        return removed
+
+    def compact(self, cutoff_timestamp=None):
+        """Reescreve segmentos com linhas inválidas e o segmento parcialmente expirado"""
+        with self._lock:
+            keys = self.segment_keys()
+            if cutoff_timestamp is not None:
+                # Segmentos inteiros anteriores ao corte são apagados, sem reescrita
+                while keys and self.segment_start(keys[0]) + DAY_MS <= cutoff_timestamp:
+                    self._remove_segment(keys.pop(0))
+            targets = set(self._dirty_segments) & set(keys)
+            if cutoff_timestamp is not None and keys:
+                # O mais antigo só é reescrito se tiver registros anteriores ao corte
+                first = self._first_timestamp(keys[0])
+                if first is not None and first < cutoff_timestamp:
+                    targets.add(keys[0])
+
+            for key in sorted(targets):
+                if key == self._handle_key:
+                    self._close_handle()
+                records = self._read_segment(key)
+                if cutoff_timestamp is not None:
+                    records = [r for r in records if r['timestamp'] >= cutoff_timestamp]
+                self._write_segment(key, records)
+                self._dirty_segments.discard(key)
+
+            if targets:
+                logger.info(f"Histórico: {len(targets)} segmentos compactados")
+
+    def flush(self):
+        with self._lock:
+            if self._handle is not None:
+                self._handle.flush()
+                os.fsync(self._handle.fileno())
+
+    def close(self):
+        with self._lock:
+            self._close_handle()
+
+
+class SqliteHistoryStore(HistoryStore):
+    """Histórico em SQLite (modo WAL) com índice por timestamp e inserções em lote"""
+
+    name = 'sqlite'
+    indexed = True
+
+    COLUMNS = ('timestamp', 'download', 'upload', 'ping', 'totalDownload', 'totalUpload')
+
+    def __init__(self, path, legacy_file=None, segments_dir=None,
+                 batch_size=50, flush_interval=300):
+        self.path = path
+        self.legacy_file = legacy_file
+        self.segments_dir = segments_dir
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self._lock = Lock()
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS history ('
+            'timestamp INTEGER NOT NULL, '
+            'download REAL, upload REAL, ping REAL, '
+            'totalDownload REAL, totalUpload REAL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp)')
+        self._conn.commit()
+
+    @classmethod
+    def _row(cls, record):
+        return tuple(record.get(column, 0) for column in cls.COLUMNS)
+
+    @classmethod
+    def _record(cls, row):
+        return dict(zip(cls.COLUMNS, row))
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                'INSERT INTO history VALUES (?, ?, ?, ?, ?, ?)',
+                self._pending
+            )
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+    def _migrate(self):
+        """Importa o history.json legado ou os segmentos existentes se o banco estiver vazio"""
+        count = self._conn.execute('SELECT COUNT(*) FROM history').fetchone()[0]
+        if count:
+            return
+
+        records = []
+        if self.segments_dir and os.path.isdir(self.segments_dir):
+            records = SegmentLogStore(self.segments_dir, legacy_file=self.legacy_file).load()
+        elif self.legacy_file and os.path.exists(self.legacy_file):
+            with open(self.legacy_file, 'r') as f:
+                records = sorted(json.load(f), key=lambda x: x['timestamp'])
+            os.replace(self.legacy_file, self.legacy_file + '.migrated')
+
+        if records:
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT INTO history VALUES (?, ?, ?, ?, ?, ?)',
+                    [self._row(record) for record in records]
+                )
+            logger.info(f"Histórico importado para SQLite: {len(records)} registros")
+
+    # Interface HistoryStore
+    def load(self):
+        # Não carrega registros em memória: as consultas são feitas no banco
+        with self._lock:
+            try:
+                self._migrate()
+            except Exception as e:
+                logger.error(f"Erro ao importar histórico para SQLite: {e}")
+        return []
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records):
+        with self._lock:
+            self._pending.extend(self._row(record) for record in records)
+            if (len(self._pending) >= self.batch_size or
+                    time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+
+    def drop_expired(self, cutoff_timestamp):
+        with self._lock:
+            self._flush_locked()
+            with self._conn:
+                removed = self._conn.execute(
+                    'DELETE FROM history WHERE timestamp < ?', (cutoff_timestamp,)
+                ).rowcount
+        if removed:
+            logger.info(f"Histórico: {removed} registros expirados removidos do SQLite")
+        return removed
+
+    def compact(self, cutoff_timestamp=None):
+        with self._lock:
+            self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+    # Consultas indexadas
+    def query_range(self, start_timestamp, end_timestamp=None):
+        end_timestamp = end_timestamp if end_timestamp is not None else 2 ** 62
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute(
+                'SELECT * FROM history WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp',
+                (start_timestamp, end_timestamp)
+            ).fetchall()
+        return [self._record(row) for row in rows]
+
+    def iter_range(self, start_timestamp, end_timestamp=None, chunk_size=1000):
+        """Percorre os registros do período em blocos, sem materializar a lista"""
+        end_timestamp = end_timestamp if end_timestamp is not None else 2 ** 62
+        with self._lock:
+            self._flush_locked()
+        # Cada bloco continua após (timestamp, rowid) do anterior: registros com
+        # o mesmo timestamp na divisa entre blocos não são pulados
+        last = (start_timestamp, -1)
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT rowid, * FROM history WHERE (timestamp, rowid) > (?, ?) '
+                    'AND timestamp < ? ORDER BY timestamp, rowid LIMIT ?',
+                    (last[0], last[1], end_timestamp, chunk_size)
+                ).fetchall()
+            for row in rows:
+                yield self._record(row[1:])
+            if len(rows) < chunk_size:
+                return
+            last = (rows[-1][1], rows[-1][0])
+
+    def summary(self, start_timestamp, end_timestamp=None):
+        end_timestamp = end_timestamp if end_timestamp is not None else 2 ** 62
+        with self._lock:
+            self._flush_locked()
+            count, avg_download, avg_upload = self._conn.execute(
+                'SELECT COUNT(*), AVG(download), AVG(upload) FROM history '
+                'WHERE timestamp >= ? AND timestamp < ?',
+                (start_timestamp, end_timestamp)
+            ).fetchone()
+            last = self._conn.execute(
+                'SELECT totalDownload, totalUpload FROM history '
+                'WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp DESC LIMIT 1',
+                (start_timestamp, end_timestamp)
+            ).fetchone()
+
+        return {
+            'avgDownload': avg_download or 0,
+            'avgUpload': avg_upload or 0,
+            'totalDownload': last[0] if last else 0,
+            'totalUpload': last[1] if last else 0
+        }
+
+    def tail(self, limit):
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute(
+                'SELECT * FROM history ORDER BY timestamp DESC LIMIT ?', (limit,)
+            ).fetchall()
+        return [self._record(row) for row in reversed(rows)]
+
+    def snapshot(self, start_timestamp, end_timestamp=None, chunk_size=1000):
+        """Período lido de uma transação própria: estatísticas e registros consistentes"""
+        with self._lock:
+            self._flush_locked()
+        return HistorySnapshot(self.path, start_timestamp, end_timestamp, chunk_size)
+
+
+class HistorySnapshot:
+    """Leitura de um período do SQLite em uma transação de leitura dedicada
+
+    Em modo WAL a transação fixa a versão do banco vista pelas estatísticas e
+    pelos registros, sem bloquear as gravações do monitor. Os registros são
+    entregues em blocos de chunk_size linhas; close() encerra a transação.
+    """
+
+    STAT_FIELDS = ('download', 'upload', 'ping')
+
+    def __init__(self, path, start_timestamp, end_timestamp=None, chunk_size=1000):
+        self.start_timestamp = start_timestamp
+        self.end_timestamp = end_timestamp if end_timestamp is not None else 2 ** 62
+        self.chunk_size = max(1, int(chunk_size))
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        try:
+            self._conn.execute('BEGIN')
+            self._stats = self._read_stats()
+        except Exception:
+            self._conn.close()
+            raise
+
+    def _read_stats(self):
+        columns = ', '.join(f'AVG({field}), MIN({field}), MAX({field})' for field in self.STAT_FIELDS)
+        row = self._conn.execute(
+            f'SELECT COUNT(*), MIN(timestamp), MAX(timestamp), {columns} FROM history '
+            'WHERE timestamp >= ? AND timestamp < ?',
+            (self.start_timestamp, self.end_timestamp)
+        ).fetchone()
+        last = self._conn.execute(
+            'SELECT totalDownload, totalUpload FROM history '
+            'WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp DESC LIMIT 1',
+            (self.start_timestamp, self.end_timestamp)
+        ).fetchone()
+
+        stats = {
+            'count': row[0],
+            'first': row[1],
+            'last': row[2],
+            'totalDownload': last[0] if last else 0,
+            'totalUpload': last[1] if last else 0
+        }
+        for index, field in enumerate(self.STAT_FIELDS):
+            name = field.capitalize()
+            average, low, high = row[3 + index * 3:6 + index * 3]
+            stats[f'avg{name}'] = average or 0
+            stats[f'min{name}'] = low or 0
+            stats[f'max{name}'] = high or 0
+        return stats
+
+    def stats(self):
+        return self._stats
+
+    def __iter__(self):
+        cursor = self._conn.execute(
+            'SELECT * FROM history WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp',
+            (self.start_timestamp, self.end_timestamp)
+        )
+        while True:
+            rows = cursor.fetchmany(self.chunk_size)
+            if not rows:
+                return
+            for row in rows:
+                yield SqliteHistoryStore._record(row)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.rollback()
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Backends disponíveis, selecionados pela chave 'historyEngine' da configuração
+HISTORY_ENGINES = {
+    SegmentLogStore.name: SegmentLogStore,
+    SqliteHistoryStore.name: SqliteHistoryStore,
+}
+
+DEFAULT_ENGINE = SegmentLogStore.name
+
+
+def create_history_store(engine, data_dir, legacy_file=None, **options):
+    """Cria o backend de histórico configurado, com fallback para o padrão"""
+    if engine not in HISTORY_ENGINES:
+        logger.warning(f"Backend de histórico desconhecido '{engine}'. Usando '{DEFAULT_ENGINE}'")
+        engine = DEFAULT_ENGINE
+
+    segments_dir = os.path.join(data_dir, 'history')
+    if engine == SqliteHistoryStore.name:
+        return SqliteHistoryStore(
+            os.path.join(data_dir, 'history.db'),
+            legacy_file=legacy_file,
+            segments_dir=segments_dir,
+            **options
+        )
+    return SegmentLogStore(segments_dir, legacy_file=legacy_file)
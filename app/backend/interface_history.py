@@ -0,0 +1,142 @@
+"""
+Monitor de Rede - Séries históricas por interface de rede
+Um registro por interface e por minuto (médias de download/upload e totais
+acumulados) em SQLite, indexado por interface e timestamp. O histórico
+principal continua guardando a soma das interfaces monitoradas; esta série
+atende às consultas filtradas por interface.
+"""
+
+import sqlite3
+import logging
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('download', 'upload')
+
+
+class InterfaceSeries:
+    """Registros por minuto de cada interface em SQLite (modo WAL)"""
+
+    COLUMNS = ('timestamp', 'interface', 'download', 'upload', 'totalDownload', 'totalUpload')
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS interface_history ('
+            'timestamp INTEGER NOT NULL, interface TEXT NOT NULL, '
+            'download REAL, upload REAL, totalDownload REAL, totalUpload REAL)'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_interface_history ON interface_history (interface, timestamp)')
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_interface_history_timestamp ON interface_history (timestamp)')
+        self._conn.commit()
+
+    def append_many(self, records):
+        """Grava registros com a chave 'interface' (uma transação por lote)"""
+        if not records:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO interface_history VALUES (?, ?, ?, ?, ?, ?)',
+                [tuple(record.get(column, 0) for column in self.COLUMNS) for record in records]
+            )
+
+    def query_range(self, interface, start_timestamp, end_timestamp=None):
+        end_timestamp = end_timestamp if end_timestamp is not None else 2 ** 62
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT timestamp, download, upload, totalDownload, totalUpload FROM interface_history '
+                'WHERE interface = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp',
+                (interface, start_timestamp, end_timestamp)
+            ).fetchall()
+        return [
+            {'timestamp': row[0], 'download': row[1], 'upload': row[2], 'ping': 0,
+             'totalDownload': row[3], 'totalUpload': row[4]}
+            for row in rows
+        ]
+
+    def aggregate(self, interface, width, start_timestamp, end_timestamp=None):
+        """Média/mín/máx por bucket de width ms, no formato das camadas do histórico"""
+        end_timestamp = end_timestamp if end_timestamp is not None else 2 ** 62
+        columns = ', '.join(f'AVG({metric}), MIN({metric}), MAX({metric})' for metric in METRICS)
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT timestamp - timestamp % ? AS bucket, COUNT(*), {columns}, '
+                'MAX(totalDownload), MAX(totalUpload) FROM interface_history '
+                'WHERE interface = ? AND timestamp >= ? AND timestamp < ? '
+                'GROUP BY bucket ORDER BY bucket',
+                (width, interface, start_timestamp, end_timestamp)
+            ).fetchall()
+
+        buckets = []
+        for row in rows:
+            bucket = {'timestamp': row[0], 'samples': row[1], 'ping': 0,
+                      'totalDownload': row[8], 'totalUpload': row[9]}
+            for index, metric in enumerate(METRICS):
+                average, low, high = row[2 + index * 3:5 + index * 3]
+                bucket[metric] = average
+                bucket[f'{metric}Min'] = low
+                bucket[f'{metric}Max'] = high
+            buckets.append(bucket)
+        return buckets
+
+    def summary(self, interface, start_timestamp):
+        """Resumo do período no formato de /api/history (totais do último registro)"""
+        with self._lock:
+            averages = self._conn.execute(
+                'SELECT AVG(download), AVG(upload) FROM interface_history '
+                'WHERE interface = ? AND timestamp >= ?',
+                (interface, start_timestamp)
+            ).fetchone()
+            totals = self._conn.execute(
+                'SELECT totalDownload, totalUpload FROM interface_history '
+                'WHERE interface = ? AND timestamp >= ? ORDER BY timestamp DESC LIMIT 1',
+                (interface, start_timestamp)
+            ).fetchone() or (0, 0)
+        return {
+            'avgDownload': averages[0] or 0,
+            'avgUpload': averages[1] or 0,
+            'totalDownload': totals[0],
+            'totalUpload': totals[1]
+        }
+
+    def latest(self):
+        """Último registro de cada interface"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT interface, timestamp, download, upload, totalDownload, totalUpload '
+                'FROM interface_history AS h WHERE timestamp = '
+                '(SELECT MAX(timestamp) FROM interface_history WHERE interface = h.interface)'
+            ).fetchall()
+        return {
+            row[0]: {'download': row[2], 'upload': row[3], 'totalDownload': row[4],
+                     'totalUpload': row[5], 'lastUpdate': row[1] / 1000}
+            for row in rows
+        }
+
+    def interfaces(self, start_timestamp=0):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT DISTINCT interface FROM interface_history WHERE timestamp >= ? ORDER BY interface',
+                (start_timestamp,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def drop_expired(self, cutoff_timestamp):
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                'DELETE FROM interface_history WHERE timestamp < ?', (cutoff_timestamp,)
+            ).rowcount
+        if removed:
+            logger.info(f"Histórico por interface: {removed} registros expirados removidos")
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,266 @@
+"""
+Monitor de Rede - Inventário das interfaces de rede em cache
+A lista de interfaces (nome e endereço IPv4) é montada uma vez e só é refeita
+quando o conjunto de interfaces ou seus endereços mudam, de modo que
+/api/interfaces apenas lê a lista em memória.
+
+No Linux as mudanças chegam por um socket rtnetlink inscrito nos grupos de
+link e de endereços. Sem netlink, uma assinatura barata (nomes em
+/sys/class/net e /proc/net/dev, estado de cada link, endereço IPv4 via ioctl
+e os endereços IPv6 de /proc/net/if_inet6) é comparada periodicamente. Em ambos os casos a lista é refeita também a cada ttl
+segundos, para cobrir mudanças que não geram aviso.
+"""
+
+import os
+import time
+import socket
+import struct
+import logging
+from threading import Event, Lock, Thread
+
+logger = logging.getLogger(__name__)
+
+NETIFACES_AVAILABLE = True
+try:
+    import netifaces
+except ImportError:
+    NETIFACES_AVAILABLE = False
+    logging.warning("Módulo 'netifaces' não encontrado. Detecção de interfaces limitada será usada.")
+
+PSUTIL_AVAILABLE = True
+try:
+    import psutil
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+FCNTL_AVAILABLE = True
+try:
+    import fcntl
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+SYS_CLASS_NET = '/sys/class/net'
+PROC_NET_DEV = '/proc/net/dev'
+PROC_IF_INET6 = '/proc/net/if_inet6'
+
+# Grupos multicast do rtnetlink (linux/rtnetlink.h)
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV6_IFADDR = 0x100
+NETLINK_AVAILABLE = hasattr(socket, 'AF_NETLINK') and hasattr(socket, 'NETLINK_ROUTE')
+
+# ioctl que retorna o endereço IPv4 de uma interface (linux/sockios.h)
+SIOCGIFADDR = 0x8915
+
+# Endereço de documentação (RFC 5737): connect() em UDP não envia pacotes
+UNROUTED_ADDRESS = ('192.0.2.1', 9)
+
+
+def _is_loopback(ip):
+    return ip.startswith('127.')
+
+
+def _ioctl_address(sock, name):
+    request = struct.pack('256s', name.encode('utf-8')[:15])
+    return socket.inet_ntoa(fcntl.ioctl(sock.fileno(), SIOCGIFADDR, request)[20:24])
+
+
+def _interface_names():
+    try:
+        return sorted(os.listdir(SYS_CLASS_NET))
+    except OSError:
+        return [name for _, name in socket.if_nameindex()] if hasattr(socket, 'if_nameindex') else []
+
+
+def discover_interfaces():
+    """Lista [{'name', 'ip'}] das interfaces com IPv4, exceto loopback (sem consultas DNS)"""
+    interfaces = []
+
+    if NETIFACES_AVAILABLE:
+        for iface in netifaces.interfaces():
+            try:
+                # Uma única consulta por interface
+                addresses = netifaces.ifaddresses(iface).get(netifaces.AF_INET)
+                if addresses and not _is_loopback(addresses[0]['addr']):
+                    interfaces.append({'name': iface, 'ip': addresses[0]['addr']})
+            except Exception as e:
+                logger.warning(f"Erro ao processar interface {iface}: {e}")
+        return interfaces
+
+    if PSUTIL_AVAILABLE:
+        for iface, addresses in psutil.net_if_addrs().items():
+            for address in addresses:
+                if address.family == socket.AF_INET and not _is_loopback(address.address):
+                    interfaces.append({'name': iface, 'ip': address.address})
+                    break
+        return interfaces
+
+    if FCNTL_AVAILABLE:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            for iface in _interface_names():
+                try:
+                    ip = _ioctl_address(sock, iface)
+                except OSError:
+                    # Interface sem endereço IPv4
+                    continue
+                if not _is_loopback(ip):
+                    interfaces.append({'name': iface, 'ip': ip})
+        if interfaces:
+            return interfaces
+
+    # Endereço de saída da rota padrão, sem resolver o nome da máquina
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.connect(UNROUTED_ADDRESS)
+        interfaces.append({'name': 'default', 'ip': sock.getsockname()[0]})
+    return interfaces
+
+
+def _ipv4_addresses(names):
+    """Endereço IPv4 de cada interface (None sem endereço); vazio sem fcntl"""
+    if not FCNTL_AVAILABLE:
+        return {}
+    addresses = {}
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for name in names:
+            try:
+                addresses[name] = _ioctl_address(sock, name)
+            except OSError:
+                addresses[name] = None
+    return addresses
+
+
+def interface_signature():
+    """Assinatura barata do conjunto de interfaces: nomes, estado e endereços"""
+    names = _interface_names()
+    addresses = _ipv4_addresses(names)
+    signature = []
+    for name in names:
+        try:
+            with open(os.path.join(SYS_CLASS_NET, name, 'operstate'), 'rb') as f:
+                signature.append((name, f.read().strip(), addresses.get(name)))
+        except OSError:
+            signature.append((name, None, addresses.get(name)))
+    try:
+        with open(PROC_NET_DEV, 'rb') as f:
+            # Nomes de /proc/net/dev cobrem sistemas sem /sys montado
+            lines = f.read().split(b'\n')[2:]
+        signature.append(tuple(line.partition(b':')[0].strip() for line in lines if b':' in line))
+    except OSError:
+        pass
+    try:
+        with open(PROC_IF_INET6, 'rb') as f:
+            signature.append(f.read())
+    except OSError:
+        pass
+    return tuple(signature)
+
+
+class InterfaceInventory:
+    """Lista de interfaces em memória, refeita apenas quando algo muda
+
+    check_interval é o intervalo (s) entre verificações da assinatura quando
+    não há netlink; ttl força uma nova descoberta mesmo sem mudanças.
+    """
+
+    def __init__(self, check_interval=5.0, ttl=300.0, discover=discover_interfaces):
+        self.check_interval = check_interval
+        self.ttl = ttl
+        self.discover = discover
+        self.refreshes = 0
+        self.updated = None
+        self.source = None
+        self._interfaces = []
+        self._signature = None
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread = None
+
+    def interfaces(self):
+        with self._lock:
+            return list(self._interfaces)
+
+    def stats(self):
+        with self._lock:
+            return {'refreshes': self.refreshes, 'updated': self.updated, 'source': self.source}
+
+    def refresh(self):
+        """Refaz a lista de interfaces; em caso de erro mantém a anterior"""
+        try:
+            interfaces = self.discover()
+        except Exception as e:
+            logger.error(f"Erro ao obter interfaces de rede: {e}")
+            interfaces = None
+        with self._lock:
+            if interfaces is not None:
+                self._interfaces = interfaces
+            elif not self._interfaces:
+                # Fallback básico
+                self._interfaces = [{'name': 'unknown', 'ip': '127.0.0.1'}]
+            self.refreshes += 1
+            self.updated = time.time()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._signature = interface_signature()
+        self.refresh()
+        self._stop.clear()
+        self._thread = Thread(target=self._watch, name='interface-inventory', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _open_netlink(self):
+        if not NETLINK_AVAILABLE:
+            return None
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR))
+            return sock
+        except OSError as e:
+            logger.info(f"Netlink indisponível ({e}); verificando interfaces por {SYS_CLASS_NET}")
+            return None
+
+    def _watch(self):
+        sock = self._open_netlink()
+        self.source = 'netlink' if sock is not None else 'poll'
+        try:
+            while not self._stop.is_set():
+                changed = self._wait_netlink(sock) if sock is not None else self._wait_poll()
+                if self._stop.is_set():
+                    break
+                if changed or time.time() - self.updated >= self.ttl:
+                    self.refresh()
+        finally:
+            if sock is not None:
+                sock.close()
+
+    def _wait_netlink(self, sock):
+        # O conteúdo das mensagens não importa: qualquer aviso dispara a redescoberta
+        sock.settimeout(min(self.ttl, 30.0))
+        try:
+            sock.recv(65536)
+        except socket.timeout:
+            return False
+        except OSError as e:
+            logger.warning(f"Erro no socket netlink: {e}")
+            self._stop.wait(self.check_interval)
+            return True
+        # Mudanças chegam em rajadas (link, endereços IPv4 e IPv6): consome o restante
+        sock.settimeout(0.2)
+        try:
+            while True:
+                sock.recv(65536)
+        except (socket.timeout, OSError):
+            pass
+        return True
+
+    def _wait_poll(self):
+        if self._stop.wait(self.check_interval):
+            return False
+        signature = interface_signature()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        return True
@@ -0,0 +1,111 @@
+"""
+Monitor de Rede - Série histórica das medições de latência
+Um registro por alvo e por minuto (RTT médio/mín/máx, p50/p95/p99, jitter e
+perda) em SQLite, indexado por alvo e timestamp. O registro agregado de todos
+os alvos ('*') guarda também o histograma de latência do minuto, usado para
+reconstruir os percentis das janelas ao reiniciar.
+"""
+
+import sqlite3
+import logging
+from array import array
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+
+class LatencySeries:
+    """Medições de latência por alvo em SQLite (modo WAL)"""
+
+    COLUMNS = ('timestamp', 'target', 'samples', 'lost', 'loss', 'rtt', 'rttMin', 'rttMax',
+               'jitter', 'p50', 'p95', 'p99')
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS latency ('
+            'timestamp INTEGER NOT NULL, target TEXT NOT NULL, '
+            'samples INTEGER, lost INTEGER, loss REAL, '
+            'rtt REAL, rttMin REAL, rttMax REAL, jitter REAL, '
+            'p50 REAL, p95 REAL, p99 REAL, histogram BLOB)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_latency_target ON latency (target, timestamp)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_latency_timestamp ON latency (timestamp)')
+        self._conn.commit()
+
+    def append_minute(self, timestamp, rows, histogram=None, aggregate_target='*'):
+        """Grava os registros de um minuto; o histograma acompanha o registro agregado"""
+        values = []
+        for row in rows:
+            blob = histogram.tobytes() if histogram is not None and row['target'] == aggregate_target else None
+            values.append((int(timestamp),) + tuple(row.get(column) for column in self.COLUMNS[1:]) + (blob,))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO latency VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', values)
+
+    def query_range(self, target, start_timestamp, end_timestamp=None):
+        end_timestamp = end_timestamp if end_timestamp is not None else 2 ** 62
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT {", ".join(self.COLUMNS)} FROM latency '
+                'WHERE target = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp',
+                (target, start_timestamp, end_timestamp)
+            ).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+    def latest(self):
+        """Último registro de cada alvo"""
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT {", ".join(self.COLUMNS)} FROM latency '
+                'WHERE timestamp = (SELECT MAX(timestamp) FROM latency)'
+            ).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+    def targets(self, start_timestamp=0):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT DISTINCT target FROM latency WHERE timestamp >= ? ORDER BY target',
+                (start_timestamp,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_histograms(self, start_timestamp, aggregate_target='*', chunk_size=1000):
+        """(timestamp, histograma) dos registros agregados a partir de start_timestamp
+
+        Os registros são lidos em blocos de chunk_size linhas, continuando após
+        (timestamp, rowid) do bloco anterior, sem materializar todos os blobs.
+        """
+        last = (start_timestamp, -1)
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT rowid, timestamp, histogram FROM latency '
+                    'WHERE target = ? AND (timestamp, rowid) > (?, ?) AND histogram IS NOT NULL '
+                    'ORDER BY timestamp, rowid LIMIT ?',
+                    (aggregate_target, last[0], last[1], chunk_size)
+                ).fetchall()
+            for _, timestamp, blob in rows:
+                histogram = array('q')
+                histogram.frombytes(blob)
+                yield timestamp, histogram
+            if len(rows) < chunk_size:
+                return
+            last = (rows[-1][1], rows[-1][0])
+
+    def drop_expired(self, cutoff_timestamp):
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                'DELETE FROM latency WHERE timestamp < ?', (cutoff_timestamp,)
+            ).rowcount
+        if removed:
+            logger.info(f"Latência: {removed} registros expirados removidos")
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,379 @@
+"""
+Monitor de Rede - Medição ativa de latência (RTT, jitter e perda)
+Cada alvo é sondado por conexão TCP (tempo do handshake) ou por eco UDP. As
+sondas rodam em um laço asyncio em uma única thread, então centenas de alvos
+podem ser medidos ao mesmo tempo sem uma thread por alvo.
+
+A cada minuto as amostras de cada alvo viram um registro com RTT médio,
+mínimo, máximo, p50/p95/p99, jitter e perda, e um registro agregado de todos
+os alvos ('*') com o histograma de latência usado nos percentis das janelas.
+
+Alvos: "tcp://host:porta", "udp://host:porta" ou "host:porta" (TCP). Os nomes
+são resolvidos antes de cada rodada (com cache de latencyDnsTtl segundos), de
+modo que o RTT medido não inclui o tempo de DNS.
+"""
+
+import time
+import socket
+import asyncio
+import logging
+from threading import Event, Thread
+
+from history_rollups import percentile, latency_histogram
+
+logger = logging.getLogger(__name__)
+
+ALL_TARGETS = '*'
+PROBE_TCP = 'tcp'
+PROBE_UDP = 'udp'
+DEFAULT_ECHO_PORT = 7007
+# O servidor de eco não autentica: por padrão ouve apenas em loopback
+DEFAULT_ECHO_BIND = '127.0.0.1'
+DEFAULT_DNS_TTL = 300
+# Alvos padrão externos (DNS públicos da Cloudflare e do Google); [] desativa as sondas
+DEFAULT_TARGETS = ['tcp://1.1.1.1:443', 'tcp://8.8.8.8:443']
+
+
+def parse_target(spec):
+    """Converte "tcp://host:porta" em (esquema, host, porta)"""
+    scheme, sep, address = spec.partition('://')
+    if not sep:
+        scheme, address = PROBE_TCP, spec
+    scheme = scheme.lower()
+    if scheme not in (PROBE_TCP, PROBE_UDP):
+        raise ValueError(f"Tipo de sonda não suportado: {scheme}")
+    host, _, port = address.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"Alvo inválido (esperado host:porta): {spec}")
+    return scheme, host.strip('[]'), int(port)
+
+
+async def probe_tcp(host, port, timeout):
+    """RTT (ms) do handshake TCP; None se não houver resposta no prazo"""
+    started = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except ConnectionRefusedError:
+        # RST também é uma resposta do host: o RTT continua válido
+        return (time.perf_counter() - started) * 1000
+    except (OSError, asyncio.TimeoutError):
+        return None
+    rtt = (time.perf_counter() - started) * 1000
+    writer.close()
+    return rtt
+
+
+class _EchoClient(asyncio.DatagramProtocol):
+    def __init__(self, payload, future):
+        self.payload = payload
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if data == self.payload and not self.future.done():
+            self.future.set_result(time.perf_counter())
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+async def probe_udp(host, port, timeout, sequence=0):
+    """RTT (ms) de um datagrama ecoado pelo alvo; None em caso de perda"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    payload = f'network-monitor {sequence} {time.time_ns()}'.encode('ascii')
+    try:
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _EchoClient(payload, future), remote_addr=(host, port))
+    except OSError:
+        return None
+    try:
+        started = time.perf_counter()
+        transport.sendto(payload)
+        received = await asyncio.wait_for(future, timeout)
+        return (received - started) * 1000
+    except (OSError, asyncio.TimeoutError):
+        return None
+    finally:
+        transport.close()
+
+
+class TargetMinute:
+    """Amostras de um alvo no minuto em andamento"""
+
+    __slots__ = ('rtts', 'lost', 'jitter_sum', 'jitter_count', 'last_rtt')
+
+    def __init__(self):
+        self.rtts = []
+        self.lost = 0
+        self.jitter_sum = 0.0
+        self.jitter_count = 0
+        self.last_rtt = None
+
+    def add(self, rtt):
+        if rtt is None:
+            self.lost += 1
+            return
+        if self.last_rtt is not None:
+            # Jitter como variação média entre amostras consecutivas (RFC 3550)
+            self.jitter_sum += abs(rtt - self.last_rtt)
+            self.jitter_count += 1
+        self.last_rtt = rtt
+        self.rtts.append(rtt)
+
+
+def summarize(target, rtts, lost, jitter):
+    values = sorted(rtts)
+    samples = len(values) + lost
+    return {
+        'target': target,
+        'samples': samples,
+        'lost': lost,
+        'loss': lost / samples * 100 if samples else 0.0,
+        'rtt': sum(values) / len(values) if values else None,
+        'rttMin': values[0] if values else None,
+        'rttMax': values[-1] if values else None,
+        'jitter': jitter,
+        'p50': percentile(values, 0.50) if values else None,
+        'p95': percentile(values, 0.95) if values else None,
+        'p99': percentile(values, 0.99) if values else None
+    }
+
+
+class LatencyProber:
+    """Sonda periodicamente uma lista de alvos em um laço asyncio próprio
+
+    get_config() fornece latencyTargets, latencyInterval, latencyCount,
+    latencyTimeout e latencyConcurrency a cada rodada. on_minute(timestamp,
+    rows, histogram) recebe os registros de cada minuto fechado.
+    """
+
+    def __init__(self, get_config, on_minute=None):
+        self.get_config = get_config
+        self.on_minute = on_minute
+        self.latest = {}
+        self.rounds = 0
+        self._minute = None
+        self._targets = {}
+        self._loop = None
+        self._stop = None
+        self._halted = False
+        self._thread = None
+        self._parsed = (None, [])
+        self._addresses = {}
+
+    @property
+    def ping(self):
+        """Mediana dos RTTs médios dos alvos que responderam na última rodada"""
+        values = sorted(stats['rtt'] for stats in list(self.latest.values()) if stats['rtt'] is not None)
+        if not values:
+            return None
+        return values[len(values) // 2]
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = Thread(target=self._run, name='latency-prober', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._halted = True
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._main())
+        except Exception as e:
+            logger.error(f"Erro no medidor de latência: {e}")
+        finally:
+            self._close_minute()
+            self._loop.close()
+
+    async def _main(self):
+        self._stop = asyncio.Event()
+        next_round = time.monotonic()
+        while not self._stop.is_set() and not self._halted:
+            config = self.get_config()
+            interval = max(float(config.get('latencyInterval', 5)), 0.5)
+            await self._round(config)
+
+            next_round += interval
+            delay = next_round - time.monotonic()
+            if delay < 0:
+                # Rodada mais longa que o intervalo: retoma a grade sem acumular atraso
+                next_round = time.monotonic()
+                delay = 0
+            try:
+                await asyncio.wait_for(self._stop.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _parse_targets(self, specs):
+        # Lista convertida só quando a configuração muda (avisos uma única vez)
+        specs = tuple(specs or ())
+        if self._parsed[0] != specs:
+            targets = []
+            for spec in specs:
+                try:
+                    targets.append((spec, parse_target(spec)))
+                except ValueError as e:
+                    logger.warning(str(e))
+            self._parsed = (specs, targets)
+        return self._parsed[1]
+
+    async def _resolve(self, scheme, host, port, ttl):
+        """Endereço IP do alvo, em cache por ttl segundos (None se não resolver)"""
+        key = (scheme, host, port)
+        now = time.monotonic()
+        cached = self._addresses.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        kind = socket.SOCK_DGRAM if scheme == PROBE_UDP else socket.SOCK_STREAM
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=kind)
+            address = infos[0][4][0]
+        except (OSError, IndexError) as e:
+            logger.warning(f"Não foi possível resolver o alvo de latência {host}: {e}")
+            address = None
+            # Falhas são tentadas de novo mais cedo
+            ttl = min(ttl, 30)
+        self._addresses[key] = (now + ttl, address)
+        return address
+
+    async def _round(self, config):
+        targets = self._parse_targets(config.get('latencyTargets', DEFAULT_TARGETS))
+
+        count = max(int(config.get('latencyCount', 3)), 1)
+        timeout = float(config.get('latencyTimeout', 2.0))
+        semaphore = asyncio.Semaphore(max(int(config.get('latencyConcurrency', 256)), 1))
+
+        # Resolução antes das sondas: o tempo de DNS fica fora do RTT
+        ttl = float(config.get('latencyDnsTtl', DEFAULT_DNS_TTL))
+        addresses = await asyncio.gather(*(self._resolve(*target, ttl) for _, target in targets))
+
+        async def probe_target(spec, target, address):
+            scheme, host, port = target
+            if address is None:
+                # Alvo sem endereço: todas as sondas da rodada contam como perdidas
+                return spec, [None] * count
+            rtts = []
+            async with semaphore:
+                # Sondas do mesmo alvo em sequência, para medir o jitter entre elas
+                for sequence in range(count):
+                    if scheme == PROBE_UDP:
+                        rtts.append(await probe_udp(address, port, timeout, sequence))
+                    else:
+                        rtts.append(await probe_tcp(address, port, timeout))
+            return spec, rtts
+
+        results = await asyncio.gather(*(probe_target(spec, target, address)
+                                         for (spec, target), address in zip(targets, addresses)))
+
+        now = time.time()
+        minute = int(now // 60) * 60000
+        if self._minute is not None and minute != self._minute:
+            self._close_minute()
+        self._minute = minute
+
+        latest = {}
+        for spec, rtts in results:
+            accumulator = self._targets.setdefault(spec, TargetMinute())
+            for rtt in rtts:
+                accumulator.add(rtt)
+            answered = [rtt for rtt in rtts if rtt is not None]
+            jitter = (sum(abs(b - a) for a, b in zip(answered, answered[1:])) / (len(answered) - 1)
+                      if len(answered) > 1 else 0.0)
+            latest[spec] = dict(summarize(spec, answered, len(rtts) - len(answered), jitter),
+                                timestamp=now * 1000)
+        self.latest = latest
+        self.rounds += 1
+
+    def _close_minute(self):
+        """Fecha o minuto: um registro por alvo e um agregado com o histograma"""
+        if self._minute is None or not self._targets:
+            return
+        rows = []
+        all_rtts = []
+        all_lost = 0
+        jitters = []
+        for spec, accumulator in self._targets.items():
+            jitter = accumulator.jitter_sum / accumulator.jitter_count if accumulator.jitter_count else 0.0
+            rows.append(summarize(spec, accumulator.rtts, accumulator.lost, jitter))
+            all_rtts.extend(accumulator.rtts)
+            all_lost += accumulator.lost
+            if accumulator.jitter_count:
+                jitters.append(jitter)
+        rows.append(summarize(ALL_TARGETS, all_rtts, all_lost,
+                              sum(jitters) / len(jitters) if jitters else 0.0))
+        histogram = latency_histogram(all_rtts)
+
+        minute = self._minute
+        self._targets = {}
+        self._minute = None
+        if self.on_minute is not None:
+            try:
+                self.on_minute(minute, rows, histogram)
+            except Exception as e:
+                logger.error(f"Erro ao gravar as medições de latência: {e}")
+
+
+class _EchoServerProtocol(asyncio.DatagramProtocol):
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.transport.sendto(data, addr)
+
+
+class EchoServer:
+    """Servidor de eco local (UDP ecoa datagramas; TCP aceita e fecha conexões)
+
+    Permite testar as sondas sem depender de alvos externos.
+    """
+
+    def __init__(self, host=DEFAULT_ECHO_BIND, port=DEFAULT_ECHO_PORT):
+        self.host = host
+        self.port = port
+        self._loop = None
+        self._thread = None
+        self._ready = None
+
+    def start(self):
+        self._ready = Event()
+        self._thread = Thread(target=self._run, name='echo-server', daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=5)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+        async def accept(reader, writer):
+            writer.close()
+
+        try:
+            udp, _ = self._loop.run_until_complete(self._loop.create_datagram_endpoint(
+                _EchoServerProtocol, local_addr=(self.host, self.port), family=socket.AF_INET))
+            tcp = self._loop.run_until_complete(asyncio.start_server(accept, self.host, self.port))
+        except OSError as e:
+            logger.error(f"Erro ao iniciar o servidor de eco na porta {self.port}: {e}")
+            self._ready.set()
+            return
+        logger.info(f"Servidor de eco ouvindo na porta {self.port} (UDP e TCP)")
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            udp.close()
+            tcp.close()
+            self._loop.close()
+
+    def stop(self):
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
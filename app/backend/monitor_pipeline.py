@@ -0,0 +1,146 @@
+"""
+Monitor de Rede - Pipeline entre a amostragem e a persistência do histórico
+A thread de amostragem apenas enfileira as amostras em uma fila limitada; a
+etapa de gravação consome a fila em lotes, monta os registros por minuto e
+grava no backend de histórico. Uma escrita lenta em disco não atrasa a
+próxima amostra: se a fila encher, a amostra é descartada e contabilizada.
+"""
+
+import time
+from collections import namedtuple
+from queue import Queue, Full, Empty
+from threading import Lock
+
+# Amostra enviada pela thread de amostragem; interfaces é {nome: (download,
+# upload, totalDownload, totalUpload)} quando há valores por interface
+Sample = namedtuple('Sample', (
+    'time', 'download', 'upload', 'ping', 'totalDownload', 'totalUpload', 'enqueued', 'interfaces'
+), defaults=(None,))
+
+
+class SamplePipeline:
+    """Fila limitada de amostras com estatísticas de descarte e atraso"""
+
+    def __init__(self, maxsize=1024, delay_threshold=1.0):
+        self.queue = Queue(maxsize=maxsize)
+        self.delay_threshold = delay_threshold
+        self.closed = False
+        self._lock = Lock()
+        self.enqueued = 0
+        self.dropped = 0
+        self.processed = 0
+        self.delayed = 0
+        self.max_latency = 0.0
+        self.batches = 0
+
+    def put(self, current_time, download, upload, ping, total_download, total_upload,
+            interfaces=None):
+        """Enfileira uma amostra sem bloquear. Retorna False se ela foi descartada"""
+        sample = Sample(current_time, download, upload, ping,
+                        total_download, total_upload, time.monotonic(), interfaces)
+        try:
+            self.queue.put_nowait(sample)
+        except Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def drain(self, max_items=256, timeout=1.0):
+        """Aguarda ao menos uma amostra e retorna todas as disponíveis (até max_items)"""
+        try:
+            samples = [self.queue.get(timeout=timeout)]
+        except Empty:
+            return []
+        while len(samples) < max_items:
+            try:
+                samples.append(self.queue.get_nowait())
+            except Empty:
+                break
+
+        now = time.monotonic()
+        with self._lock:
+            self.batches += 1
+            self.processed += len(samples)
+            for sample in samples:
+                latency = now - sample.enqueued
+                if latency > self.delay_threshold:
+                    self.delayed += 1
+                if latency > self.max_latency:
+                    self.max_latency = latency
+        return samples
+
+    def close(self):
+        self.closed = True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enqueued': self.enqueued,
+                'processed': self.processed,
+                'dropped': self.dropped,
+                'delayed': self.delayed,
+                'queued': self.queue.qsize(),
+                'batches': self.batches,
+                'maxLatency': self.max_latency
+            }
+
+
+class MinuteAccumulator:
+    """Agrupa amostras em um registro de histórico por minuto (médias do período)
+
+    Os registros são alinhados ao início de cada período no relógio de parede,
+    de modo que os timestamps do histórico ficam em uma grade regular.
+    """
+
+    def __init__(self, period=60):
+        self.period_ms = int(period * 1000)
+        self.bucket = None
+        self._reset()
+
+    def _reset(self):
+        self.count = 0
+        self.sum_download = 0.0
+        self.sum_upload = 0.0
+        self.sum_ping = 0.0
+        self.total_download = 0
+        self.total_upload = 0
+
+    def _record(self):
+        return {
+            'timestamp': self.bucket,  # ms, início do período
+            'download': self.sum_download / self.count,
+            'upload': self.sum_upload / self.count,
+            'ping': self.sum_ping / self.count,
+            'totalDownload': self.total_download,
+            'totalUpload': self.total_upload
+        }
+
+    def add(self, sample):
+        """Acumula a amostra; retorna o registro do período anterior quando ele se fecha"""
+        timestamp = int(round(sample.time * 1000))
+        bucket = timestamp - timestamp % self.period_ms
+
+        record = None
+        if self.bucket is not None and bucket != self.bucket and self.count:
+            record = self._record()
+            self._reset()
+        self.bucket = bucket
+
+        self.count += 1
+        self.sum_download += sample.download
+        self.sum_upload += sample.upload
+        self.sum_ping += sample.ping
+        self.total_download = sample.totalDownload
+        self.total_upload = sample.totalUpload
+        return record
+
+    def flush(self):
+        """Fecha o período em andamento (ex.: ao parar o monitoramento)"""
+        if not self.count:
+            return None
+        record = self._record()
+        self._reset()
+        return record
@@ -0,0 +1,170 @@
+"""
+Monitor de Rede - Leitura dos contadores de tráfego das interfaces
+As taxas de download/upload são calculadas a partir da diferença entre duas
+leituras dos contadores de bytes de cada interface, usando relógio monotônico.
+
+No Linux os contadores vêm de uma única leitura de /proc/net/dev por amostra
+(o descritor fica aberto e é relido com pread); nos demais sistemas usa-se
+psutil.net_io_counters(pernic=True), quando disponível.
+"""
+
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+PSUTIL_AVAILABLE = True
+try:
+    import psutil
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+PROC_NET_DEV = '/proc/net/dev'
+READ_SIZE = 256 * 1024
+LOOPBACK_INTERFACES = ('lo', 'lo0')
+
+# Interface "automática": soma de todas as interfaces exceto loopback
+AUTO_INTERFACES = ('', 'auto', 'default', None)
+
+
+def parse_proc_net_dev(data):
+    """Converte o conteúdo de /proc/net/dev em {interface: (rx_bytes, tx_bytes)}"""
+    counters = {}
+    # As duas primeiras linhas são cabeçalho
+    for line in data.split(b'\n')[2:]:
+        name, sep, fields = line.partition(b':')
+        if not sep:
+            continue
+        values = fields.split()
+        if len(values) < 9:
+            continue
+        counters[name.strip().decode('ascii', 'replace')] = (int(values[0]), int(values[8]))
+    return counters
+
+
+class CounterReader:
+    """Lê os contadores de bytes de todas as interfaces em uma única operação"""
+
+    def __init__(self, path=PROC_NET_DEV):
+        self.path = path
+        self._fd = None
+        if os.path.exists(path):
+            try:
+                self._fd = os.open(path, os.O_RDONLY)
+            except OSError as e:
+                logger.warning(f"Não foi possível abrir {path}: {e}")
+
+    @property
+    def available(self):
+        return self._fd is not None or PSUTIL_AVAILABLE
+
+    def read(self):
+        """Retorna {interface: (rx_bytes, tx_bytes)}"""
+        if self._fd is not None:
+            return parse_proc_net_dev(os.pread(self._fd, READ_SIZE, 0))
+        if PSUTIL_AVAILABLE:
+            return {
+                name: (stats.bytes_recv, stats.bytes_sent)
+                for name, stats in psutil.net_io_counters(pernic=True).items()
+            }
+        return {}
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def counter_delta(previous, current):
+    """Diferença entre leituras de um contador, tratando o retorno a zero (wraparound)"""
+    if current >= previous:
+        return current - previous
+    # Contadores de 32 bits em kernels/drivers antigos, 64 bits nos demais
+    modulus = 2 ** 32 if previous < 2 ** 32 else 2 ** 64
+    delta = current + modulus - previous
+    if delta > modulus // 2:
+        # Queda grande demais para ser wraparound: contador foi reiniciado
+        return current
+    return delta
+
+
+class InterfaceSampler:
+    """Calcula taxas (Mbps) e bytes transferidos entre amostras consecutivas
+
+    interface pode ser uma interface, uma lista de interfaces ou vazio
+    (todas exceto loopback). Cada amostra faz uma única leitura dos contadores
+    e calcula ao mesmo tempo o total e os valores de cada interface.
+    """
+
+    def __init__(self, interface=None, reader=None):
+        if isinstance(interface, (list, tuple, set)):
+            self.interfaces = [name for name in interface if name not in AUTO_INTERFACES] or None
+        elif interface in AUTO_INTERFACES:
+            self.interfaces = None
+        else:
+            self.interfaces = [interface]
+        self.reader = reader or CounterReader()
+        self._last_counters = None
+        self._last_time = None
+        self._missing = False
+
+    @property
+    def interface(self):
+        return ','.join(self.interfaces) if self.interfaces else None
+
+    def _select(self, counters):
+        if self.interfaces is not None:
+            selected = {name: counters[name] for name in self.interfaces if name in counters}
+            if selected:
+                if self._missing:
+                    logger.info(f"Interface '{self.interface}' disponível novamente")
+                    self._missing = False
+                return selected
+            # Só esta leitura usa todas as interfaces; a seleção é tentada de novo na próxima
+            if not self._missing:
+                logger.warning(f"Interface '{self.interface}' não encontrada. Usando todas as interfaces")
+                self._missing = True
+        return {name: value for name, value in counters.items()
+                if name not in LOOPBACK_INTERFACES}
+
+    def sample_all(self):
+        """Retorna ((download_mbps, upload_mbps, rx_bytes, tx_bytes), {interface: (...)})
+
+        O primeiro elemento é a soma das interfaces selecionadas. A primeira
+        chamada apenas registra a linha de base e retorna zeros.
+        """
+        counters = self._select(self.reader.read())
+        now = time.monotonic()
+
+        per_interface = {}
+        elapsed = 0
+        if self._last_counters is not None:
+            elapsed = now - self._last_time
+            for name, (rx, tx) in counters.items():
+                if name not in self._last_counters:
+                    continue
+                last_rx, last_tx = self._last_counters[name]
+                per_interface[name] = (counter_delta(last_rx, rx), counter_delta(last_tx, tx))
+
+        self._last_counters = counters
+        self._last_time = now
+
+        if elapsed <= 0:
+            return (0.0, 0.0, 0, 0), {name: (0.0, 0.0, 0, 0) for name in counters}
+
+        scale = 8 / elapsed / 1_000_000
+        rates = {
+            name: (rx_bytes * scale, tx_bytes * scale, rx_bytes, tx_bytes)
+            for name, (rx_bytes, tx_bytes) in per_interface.items()
+        }
+        rx_total = sum(rx_bytes for rx_bytes, _ in per_interface.values())
+        tx_total = sum(tx_bytes for _, tx_bytes in per_interface.values())
+        return (rx_total * scale, tx_total * scale, rx_total, tx_total), rates
+
+    def sample(self):
+        """Retorna (download_mbps, upload_mbps, rx_bytes, tx_bytes) desde a última amostra"""
+        return self.sample_all()[0]
+
+    def close(self):
+        self.reader.close()
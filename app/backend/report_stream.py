@@ -0,0 +1,51 @@
+"""
+Monitor de Rede - Geração incremental de relatórios
+Os relatórios de período completo percorrem o histórico como um gerador:
+as linhas de texto/CSV são escritas à medida que os registros chegam e as
+tabelas do PDF são montadas em blocos, enquanto as páginas são desenhadas.
+"""
+
+from itertools import islice
+
+
+def chunked(iterable, size, first_size=None):
+    """Agrupa os itens em listas de até size elementos (a primeira com até first_size)"""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size if first_size is None else first_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+class FlowableStream(list):
+    """Lista de flowables preenchida sob demanda a partir de um iterável
+
+    O build() do ReportLab consome a lista pela frente (len, [0], del [0] e
+    inserções no início quando um flowable é dividido entre páginas). Mantendo
+    apenas lookahead itens carregados, cada tabela do histórico é criada só
+    quando a página anterior já foi desenhada e descartada.
+    """
+
+    def __init__(self, flowables, lookahead=4):
+        super().__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+        self._fill()
+
+    def _fill(self):
+        while self._source is not None and list.__len__(self) < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._fill()
+        return list.__len__(self)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, index):
+        self._fill()
+        return list.__getitem__(self, index)
@@ -0,0 +1,99 @@
+"""
+Monitor de Rede - Cache de respostas JSON já codificadas
+Cada entrada guarda os bytes da resposta e um ETag forte calculado uma única
+vez, associados à chave de validade informada pelo chamador (por exemplo, a
+versão do histórico). Enquanto a chave não muda, a resposta é reutilizada sem
+recodificar, e clientes com If-None-Match recebem 304.
+
+As versões comprimidas (gzip e, se o módulo 'brotli' estiver instalado, br)
+são geradas sob demanda e guardadas na própria entrada.
+"""
+
+import gzip
+import hashlib
+import logging
+from collections import namedtuple
+from threading import Lock
+
+BROTLI_AVAILABLE = True
+try:
+    import brotli
+except ImportError:
+    BROTLI_AVAILABLE = False
+    logging.info("Módulo 'brotli' não encontrado. Apenas gzip será usado para compressão.")
+
+# Respostas menores que isso não compensam a compressão
+COMPRESS_MIN_SIZE = 1024
+
+CacheEntry = namedtuple('CacheEntry', ('key', 'body', 'etag', 'mimetype', 'variants'))
+
+
+def make_etag(body):
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def make_entry(key, body, mimetype='application/json'):
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return CacheEntry(key, body, make_etag(body), mimetype, {})
+
+
+def supported_encodings():
+    """Codificações de conteúdo aceitas, em ordem de preferência"""
+    return ['br', 'gzip'] if BROTLI_AVAILABLE else ['gzip']
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def entry_variant(entry, encoding):
+    """Corpo da entrada na codificação pedida; retorna (bytes, codificação usada)"""
+    if encoding is None or len(entry.body) < COMPRESS_MIN_SIZE:
+        return entry.body, None
+    variant = entry.variants.get(encoding)
+    if variant is None:
+        variant = compress(entry.body, encoding)
+        # Corrida inofensiva: duas threads podem comprimir o mesmo conteúdo
+        entry.variants[encoding] = variant
+    return variant, encoding
+
+
+class ResponseCache:
+    """Respostas codificadas por nome, válidas enquanto a chave for a mesma"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, key):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.key == key:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, name, key, body, mimetype='application/json'):
+        entry = make_entry(key, body, mimetype)
+        with self._lock:
+            # Entrada renovada vai para o fim: a descartada é a atualizada há mais tempo
+            if self._entries.pop(name, None) is None and len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[name] = entry
+        return entry
+
+    def invalidate(self, prefix=None):
+        """Remove as entradas cujo nome (tupla) começa com prefix, ou todas"""
+        with self._lock:
+            if prefix is None:
+                self._entries.clear()
+                return
+            for name in [name for name in self._entries if name[0] == prefix]:
+                del self._entries[name]
@@ -0,0 +1,91 @@
+"""
+Monitor de Rede - Agendamento do laço de amostragem sem deriva
+Os instantes de cada amostra são prazos absolutos no relógio monotônico
+(início + n * intervalo), alinhados a múltiplos do intervalo no relógio de
+parede. O tempo gasto no trabalho de cada ciclo não desloca os seguintes.
+"""
+
+import math
+import time
+
+MISSED_SKIP = 'skip'
+MISSED_CATCHUP = 'catchup'
+
+
+class TickScheduler:
+    """Gera ciclos em prazos absolutos e mede o atraso (jitter) de cada um"""
+
+    def __init__(self, interval, missed=MISSED_SKIP, align=True,
+                 clock=time.monotonic, wall_clock=time.time, sleep=time.sleep):
+        self.interval = float(interval)
+        self.missed = missed if missed in (MISSED_SKIP, MISSED_CATCHUP) else MISSED_SKIP
+        self._clock = clock
+        self._sleep = sleep
+
+        # Âncora entre o relógio monotônico e o de parede
+        self._mono_anchor = clock()
+        self._wall_anchor = wall_clock()
+
+        first_delay = 0.0
+        if align:
+            first_delay = (-self._wall_anchor) % self.interval
+        self._next = self._mono_anchor + first_delay
+
+        self.ticks = 0
+        self.skipped = 0
+        self.late = 0
+        self._jitter_sum = 0.0
+        self._jitter_sq_sum = 0.0
+        self.max_jitter = 0.0
+
+    def wall_time(self, deadline):
+        """Horário de parede correspondente a um prazo monotônico"""
+        return self._wall_anchor + (deadline - self._mono_anchor)
+
+    def wait(self, should_stop=None):
+        """Dorme até o próximo prazo; retorna o horário de parede agendado do ciclo
+
+        Retorna None se should_stop() ficar verdadeiro durante a espera.
+        """
+        deadline = self._next
+        while True:
+            if should_stop is not None and should_stop():
+                return None
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                break
+            # Dorme em fatias para responder rapidamente a um pedido de parada
+            self._sleep(min(remaining, 0.5))
+
+        now = self._clock()
+        jitter = now - deadline
+        self.ticks += 1
+        self._jitter_sum += jitter
+        self._jitter_sq_sum += jitter * jitter
+        if jitter > self.max_jitter:
+            self.max_jitter = jitter
+        if jitter > self.interval:
+            self.late += 1
+
+        self._next = deadline + self.interval
+        if self.missed == MISSED_SKIP and now >= self._next:
+            # Pula os ciclos perdidos e volta à grade regular
+            missed = math.floor((now - self._next) / self.interval) + 1
+            self.skipped += missed
+            self._next += missed * self.interval
+
+        return self.wall_time(deadline)
+
+    def stats(self):
+        mean = self._jitter_sum / self.ticks if self.ticks else 0.0
+        variance = self._jitter_sq_sum / self.ticks - mean * mean if self.ticks else 0.0
+        return {
+            'interval': self.interval,
+            'missedPolicy': self.missed,
+            'ticks': self.ticks,
+            'late': self.late,
+            'skipped': self.skipped,
+            'jitterMeanMs': mean * 1000,
+            'jitterStdMs': math.sqrt(max(variance, 0.0)) * 1000,
+            'jitterMaxMs': self.max_jitter * 1000
+        }
@@ -0,0 +1,147 @@
+"""
+Monitor de Rede - Estado compartilhado entre processos
+Com vários workers do servidor, um único processo coletor faz a amostragem e
+publica o status atual em um bloco de memória compartilhada; os workers da API
+apenas leem esse bloco. O histórico segue pelo SQLite (modo WAL), que aceita
+um escritor e vários leitores simultâneos.
+
+O bloco é protegido por um seqlock: o contador de sequência fica ímpar
+durante a escrita, e o leitor repete a leitura se ele mudou no meio dela.
+Como há um único escritor, leitores nunca bloqueiam o coletor.
+"""
+
+import math
+import struct
+import time
+from threading import Lock
+
+SHARED_MEMORY_AVAILABLE = True
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    SHARED_MEMORY_AVAILABLE = False
+
+# Papéis do processo
+ROLE_STANDALONE = 'standalone'  # processo único: amostra e responde à API
+ROLE_COLLECTOR = 'collector'    # amostra e grava o histórico; não responde à API
+ROLE_READER = 'reader'          # worker da API: lê o estado publicado pelo coletor
+
+# seq, versão do status, versão do histórico, download, upload, ping,
+# totalDownload, totalUpload, lastUpdate, monitorando, pronto
+LAYOUT = struct.Struct('<QQQddddddBB')
+SEQ = struct.Struct('<Q')
+# Corpo do bloco (tudo após a sequência)
+PAYLOAD = struct.Struct('<QQddddddBB')
+PAYLOAD_OFFSET = SEQ.size
+
+STATUS_FIELDS = ('download', 'upload', 'ping', 'totalDownload', 'totalUpload', 'lastUpdate')
+
+
+class SharedStatus:
+    """Status atual publicado por um escritor e lido por vários processos"""
+
+    def __init__(self, memory, owner=False):
+        self._memory = memory
+        self._buf = memory.buf
+        self.owner = owner
+        self._write_lock = Lock()
+        self._values = {
+            'version': 0,
+            'historyVersion': 0,
+            'current': dict.fromkeys(STATUS_FIELDS, 0.0),
+            'monitoring': False,
+            'ready': False
+        }
+
+    @classmethod
+    def create(cls):
+        """Cria o bloco (no processo principal, antes de criar os demais por fork)"""
+        memory = shared_memory.SharedMemory(create=True, size=LAYOUT.size)
+        status = cls(memory, owner=True)
+        status._write()
+        return status
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    def _write(self):
+        values = self._values
+        current = values['current']
+        last_update = current['lastUpdate']
+        seq = SEQ.unpack_from(self._buf, 0)[0]
+        # Sequência ímpar sinaliza escrita em andamento; só volta a ser par com o corpo completo
+        SEQ.pack_into(self._buf, 0, seq + 1)
+        PAYLOAD.pack_into(
+            self._buf, PAYLOAD_OFFSET,
+            values['version'], values['historyVersion'],
+            current['download'], current['upload'], current['ping'],
+            current['totalDownload'], current['totalUpload'],
+            math.nan if last_update is None else last_update,
+            values['monitoring'], values['ready']
+        )
+        SEQ.pack_into(self._buf, 0, seq + 2)
+
+    def publish(self, current, monitoring):
+        """Publica o status atual (apenas no processo coletor)"""
+        with self._write_lock:
+            self._values['current'] = {field: current.get(field) or 0 for field in STATUS_FIELDS}
+            self._values['current']['lastUpdate'] = current.get('lastUpdate')
+            self._values['monitoring'] = bool(monitoring)
+            self._values['version'] += 1
+            self._write()
+
+    def publish_history(self, history_version):
+        """Sinaliza que há novos registros gravados no histórico"""
+        with self._write_lock:
+            self._values['historyVersion'] = history_version
+            self._write()
+
+    def set_ready(self):
+        with self._write_lock:
+            self._values['ready'] = True
+            self._write()
+
+    def read(self):
+        """Lê um snapshot consistente do bloco"""
+        while True:
+            seq = SEQ.unpack_from(self._buf, 0)[0]
+            if seq % 2:
+                time.sleep(0)
+                continue
+            payload = bytes(self._buf[PAYLOAD_OFFSET:LAYOUT.size])
+            # A cópia só vale se nenhuma escrita começou ou terminou durante ela
+            if SEQ.unpack_from(self._buf, 0)[0] == seq:
+                break
+
+        (version, history_version, download, upload, ping,
+         total_download, total_upload, last_update, monitoring, ready) = PAYLOAD.unpack(payload)
+        return {
+            'version': version,
+            'historyVersion': history_version,
+            'current': {
+                'download': download,
+                'upload': upload,
+                'ping': ping,
+                'totalDownload': total_download,
+                'totalUpload': total_upload,
+                'lastUpdate': None if math.isnan(last_update) else last_update
+            },
+            'monitoring': bool(monitoring),
+            'ready': bool(ready)
+        }
+
+    def wait_ready(self, timeout=60.0, interval=0.1):
+        """Aguarda o coletor terminar de carregar o histórico"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.read()['ready']:
+                return True
+            time.sleep(interval)
+        return False
+
+    def close(self):
+        self._buf = None
+        self._memory.close()
+        if self.owner:
+            self._memory.unlink()
@@ -0,0 +1,68 @@
+"""
+Monitor de Rede - Cliente do speedtest-cli com escolha de servidor em cache
+Criar um Speedtest() baixa a configuração do cliente, e get_best_server()
+baixa a lista de servidores e mede a latência de vários candidatos: segundos
+gastos antes de qualquer medição. O cliente e o servidor escolhido são
+reaproveitados até o TTL expirar; nos testes seguintes apenas a latência do
+servidor escolhido é medida novamente.
+"""
+
+import time
+import logging
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+
+class SpeedtestClientCache:
+    """Mantém um cliente speedtest com o melhor servidor já escolhido"""
+
+    def __init__(self, factory, ttl=3600):
+        self.factory = factory
+        self.ttl = ttl
+        self._client = None
+        self._lengths = None
+        self._expires = 0.0
+        self._lock = Lock()
+        self.refreshes = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._client = None
+            self._expires = 0.0
+
+    def acquire(self, quick_duration=None):
+        """Retorna um cliente pronto para medir, com a latência do servidor atualizada
+
+        quick_duration limita (em segundos) cada fase de download e upload.
+        """
+        with self._lock:
+            client = self._client
+            if client is None or time.monotonic() >= self._expires:
+                client = self._refresh()
+            else:
+                # Mede apenas o servidor já escolhido (atualiza results.ping)
+                try:
+                    client.get_best_server([client.best])
+                except Exception as e:
+                    logger.warning(f"Servidor em cache indisponível ({e}); escolhendo outro")
+                    client = self._refresh()
+
+            lengths = dict(self._lengths)
+            if quick_duration:
+                for phase in ('download', 'upload'):
+                    lengths[phase] = min(lengths.get(phase, quick_duration), quick_duration)
+            client.config['length'] = lengths
+            return client
+
+    def _refresh(self):
+        # Configuração, lista de servidores e escolha do mais próximo
+        client = self.factory()
+        client.get_best_server()
+        self._client = client
+        self._lengths = dict(client.config.get('length', {}))
+        self._expires = time.monotonic() + self.ttl
+        self.refreshes += 1
+        logger.info(f"Servidor de teste de velocidade escolhido: {client.best.get('sponsor')} "
+                    f"({client.best.get('name')})")
+        return client
@@ -0,0 +1,129 @@
+"""
+Monitor de Rede - Série histórica dos testes de velocidade
+Resultados dos testes (manuais e agendados) ficam em uma tabela SQLite
+própria, separada do histórico por minuto, com índice por timestamp. As
+consultas por período e as agregações por bucket são feitas no banco, sem
+carregar a série em memória.
+"""
+
+import sqlite3
+import logging
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('download', 'upload', 'ping')
+
+
+class SpeedTestSeries:
+    """Resultados de testes de velocidade em SQLite (modo WAL)"""
+
+    COLUMNS = ('timestamp', 'download', 'upload', 'ping',
+               'server', 'sponsor', 'country', 'source', 'quick')
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS speedtests ('
+            'timestamp INTEGER NOT NULL, '
+            'download REAL, upload REAL, ping REAL, '
+            'server TEXT, sponsor TEXT, country TEXT, '
+            'source TEXT, quick INTEGER)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_speedtests_timestamp ON speedtests (timestamp)')
+        self._conn.commit()
+
+    def append(self, timestamp, result, source='manual'):
+        server = result.get('server') or {}
+        row = (
+            int(timestamp), result.get('download', 0), result.get('upload', 0), result.get('ping', 0),
+            server.get('name'), server.get('sponsor'), server.get('country'),
+            source, int(bool(result.get('quick')))
+        )
+        with self._lock, self._conn:
+            self._conn.execute('INSERT INTO speedtests VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', row)
+
+    def query_range(self, start_timestamp, end_timestamp=None, limit=None):
+        """Resultados do período em ordem cronológica (os mais recentes, se houver limite)"""
+        end_timestamp = end_timestamp if end_timestamp is not None else 2 ** 62
+        sql = 'SELECT * FROM speedtests WHERE timestamp >= ? AND timestamp < ?'
+        params = [start_timestamp, end_timestamp]
+        if limit:
+            sql = f'SELECT * FROM ({sql} ORDER BY timestamp DESC LIMIT ?)'
+            params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(sql + ' ORDER BY timestamp', params).fetchall()
+        return [self._record(row) for row in rows]
+
+    def aggregate(self, width, start_timestamp, end_timestamp=None):
+        """Média/mín/máx por bucket de width ms, no mesmo formato das camadas do histórico"""
+        end_timestamp = end_timestamp if end_timestamp is not None else 2 ** 62
+        columns = ', '.join(
+            f'AVG({metric}), MIN({metric}), MAX({metric})' for metric in METRICS
+        )
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT timestamp - timestamp % ? AS bucket, COUNT(*), {columns} '
+                'FROM speedtests WHERE timestamp >= ? AND timestamp < ? '
+                'GROUP BY bucket ORDER BY bucket',
+                (width, start_timestamp, end_timestamp)
+            ).fetchall()
+
+        buckets = []
+        for row in rows:
+            bucket = {'timestamp': row[0], 'samples': row[1]}
+            for index, metric in enumerate(METRICS):
+                average, low, high = row[2 + index * 3:5 + index * 3]
+                bucket[metric] = average
+                bucket[f'{metric}Min'] = low
+                bucket[f'{metric}Max'] = high
+            buckets.append(bucket)
+        return buckets
+
+    def summary(self, start_timestamp, end_timestamp=None):
+        """Quantidade de testes e média/mín/máx de cada métrica no período"""
+        buckets = self.aggregate(2 ** 62, start_timestamp, end_timestamp)
+        if not buckets:
+            summary = {'count': 0}
+            for metric in METRICS:
+                summary.update({metric: 0, f'{metric}Min': 0, f'{metric}Max': 0})
+            return summary
+        summary = buckets[0]
+        summary['count'] = summary.pop('samples')
+        summary.pop('timestamp')
+        return summary
+
+    def latest(self):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT * FROM speedtests ORDER BY timestamp DESC LIMIT 1'
+            ).fetchone()
+        return self._record(row) if row else None
+
+    def drop_expired(self, cutoff_timestamp):
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                'DELETE FROM speedtests WHERE timestamp < ?', (cutoff_timestamp,)
+            ).rowcount
+        if removed:
+            logger.info(f"Testes de velocidade: {removed} resultados expirados removidos")
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @classmethod
+    def _record(cls, row):
+        record = dict(zip(cls.COLUMNS, row))
+        record['server'] = {
+            'name': record.pop('server'),
+            'sponsor': record.pop('sponsor'),
+            'country': record.pop('country')
+        }
+        record['quick'] = bool(record['quick'])
+        return record
@@ -0,0 +1,313 @@
+"""
+Monitor de Rede - Testes de velocidade em segundo plano
+O teste roda em uma thread própria e as rotas apenas consultam o andamento:
+nenhuma thread do servidor fica presa durante os dezenas de segundos do teste.
+Só um teste roda por vez; pedidos feitos enquanto há um teste na fila ou em
+andamento recebem o mesmo job (single-flight). Com vários processos (workers
+do gunicorn e o coletor), uma trava de arquivo (flock) impede que dois testes
+rodem ao mesmo tempo e distorçam um ao outro.
+
+Testes periódicos são disparados pelo mesmo executor, com intervalo
+configurável, variação aleatória (jitter) e janelas de horário opcionais.
+"""
+
+import time
+import uuid
+import random
+import logging
+import datetime
+from contextlib import contextmanager
+from collections import OrderedDict
+from threading import Condition, Event, Thread
+
+from broadcast import encode_event, HEARTBEAT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+FCNTL_AVAILABLE = True
+try:
+    import fcntl
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_ERROR = 'error'
+
+FINISHED = (STATUS_DONE, STATUS_ERROR)
+
+
+@contextmanager
+def process_lock(path, on_wait=None):
+    """Trava exclusiva entre processos (flock); on_wait() é chamado se for preciso esperar"""
+    if path is None or not FCNTL_AVAILABLE:
+        # Sem fcntl (Windows) o servidor roda em um único processo
+        yield
+        return
+    with open(path, 'a') as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            if on_wait is not None:
+                on_wait()
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class SpeedTestJob:
+    """Estado de um teste de velocidade: fase, progresso e resultados parciais"""
+
+    def __init__(self, options=None, source='manual'):
+        self.id = uuid.uuid4().hex[:12]
+        self.options = options or {}
+        self.source = source
+        self.status = STATUS_QUEUED
+        self.phase = None
+        self.progress = 0.0
+        self.partial = {}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.version = 0
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'source': self.source,
+            'phase': self.phase,
+            'progress': round(self.progress, 3),
+            'partial': dict(self.partial),
+            'result': self.result,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'version': self.version
+        }
+
+
+class SpeedTestRunner:
+    """Executa testes de velocidade um de cada vez, fora das threads das requisições
+
+    run_test(progress, **options) executa o teste e chama
+    progress(phase, fraction, partial) conforme avança. on_complete(job) é
+    chamado ao fim de cada teste concluído com sucesso. lock_path é o arquivo
+    da trava compartilhada com os demais processos.
+    """
+
+    def __init__(self, run_test, max_jobs=20, on_complete=None, lock_path=None):
+        self.run_test = run_test
+        self.on_complete = on_complete
+        self.max_jobs = max_jobs
+        self.lock_path = lock_path
+        self._jobs = OrderedDict()
+        self._active = None
+        self._condition = Condition()
+
+    def submit(self, source='manual', **options):
+        """Cria um job, ou retorna o que já está na fila/em andamento; retorna (job, criado)"""
+        with self._condition:
+            if self._active is not None and not self._active.done:
+                return self._active, False
+            job = SpeedTestJob(options, source)
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+            self._active = job
+        Thread(target=self._run, args=(job,), name=f'speedtest-{job.id}', daemon=True).start()
+        return job, True
+
+    def get(self, job_id):
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def latest(self):
+        with self._condition:
+            return next(reversed(self._jobs.values()), None)
+
+    @property
+    def busy(self):
+        with self._condition:
+            return self._active is not None and not self._active.done
+
+    def snapshot(self, job):
+        with self._condition:
+            return job.to_dict()
+
+    def _update(self, job, **fields):
+        with self._condition:
+            for key, value in fields.items():
+                setattr(job, key, value)
+            job.version += 1
+            self._condition.notify_all()
+
+    def _run(self, job):
+        # Outro processo testando: o job fica na fila até a trava ser liberada
+        with process_lock(self.lock_path, on_wait=lambda: self._update(job, phase='waiting')):
+            self._execute(job)
+
+    def _execute(self, job):
+        self._update(job, status=STATUS_RUNNING, started=time.time(), phase='server')
+
+        def progress(phase, fraction, partial=None):
+            with self._condition:
+                job.phase = phase
+                job.progress = min(max(fraction, job.progress), 1.0)
+                if partial:
+                    job.partial.update(partial)
+                job.version += 1
+                self._condition.notify_all()
+
+        try:
+            result = self.run_test(progress, **job.options)
+            self._update(job, status=STATUS_DONE, result=result, progress=1.0,
+                         phase='done', finished=time.time())
+        except Exception as e:
+            logger.error(f"Erro no teste de velocidade {job.id}: {e}")
+            self._update(job, status=STATUS_ERROR, error=str(e),
+                         phase='error', finished=time.time())
+            return
+
+        if self.on_complete is not None:
+            try:
+                self.on_complete(job)
+            except Exception as e:
+                logger.error(f"Erro ao registrar o teste de velocidade {job.id}: {e}")
+
+    def stream(self, job):
+        """Gerador de eventos SSE com o andamento do job até ele terminar"""
+        version = -1
+        while True:
+            with self._condition:
+                if job.version == version:
+                    self._condition.wait(timeout=HEARTBEAT_INTERVAL)
+                changed = job.version != version
+                version = job.version
+                payload = job.to_dict()
+            if changed:
+                yield encode_event(payload, event='progress')
+                if payload['status'] in FINISHED:
+                    return
+            else:
+                yield b': keep-alive\n\n'
+
+
+def parse_windows(windows):
+    """Converte ["22:00-06:00", ...] em [(início, fim)] em minutos do dia"""
+    parsed = []
+    for window in windows or []:
+        try:
+            start, end = (part.strip() for part in window.split('-'))
+            start_h, start_m = (int(value) for value in start.split(':'))
+            end_h, end_m = (int(value) for value in end.split(':'))
+            parsed.append((start_h * 60 + start_m, end_h * 60 + end_m))
+        except ValueError:
+            logger.warning(f"Janela de horário inválida ignorada: {window!r}")
+    return parsed
+
+
+def in_windows(moment, windows):
+    """Indica se o horário local está dentro de alguma janela (sem janelas: sempre)"""
+    if not windows:
+        return True
+    minute = moment.hour * 60 + moment.minute
+    for start, end in windows:
+        if start <= end:
+            if start <= minute < end:
+                return True
+        elif minute >= start or minute < end:
+            # Janela que atravessa a meia-noite
+            return True
+    return False
+
+
+def next_window_start(moment, windows):
+    """Próximo início de janela a partir do horário local informado"""
+    midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    candidates = []
+    for start, _ in windows:
+        candidate = midnight + datetime.timedelta(minutes=start)
+        if candidate <= moment:
+            candidate += datetime.timedelta(days=1)
+        candidates.append(candidate)
+    return min(candidates)
+
+
+class PeriodicSpeedTests:
+    """Dispara testes de velocidade periódicos pelo executor de jobs
+
+    get_config() retorna a configuração atual a cada ciclo, de modo que
+    mudanças de intervalo, jitter ou janelas valem a partir do próximo teste.
+    """
+
+    def __init__(self, runner, get_config, clock=time.time):
+        self.runner = runner
+        self.get_config = get_config
+        self.clock = clock
+        self.next_run = None
+        self._stop = Event()
+        self._thread = None
+
+    def plan(self, after):
+        """Horário (epoch) do próximo teste depois de after"""
+        config = self.get_config()
+        interval = max(float(config.get('speedtestInterval', 21600)), 60.0)
+        jitter = max(float(config.get('speedtestJitter', 600)), 0.0)
+        windows = parse_windows(config.get('speedtestWindows'))
+
+        # Jitter evita que várias instâncias testem sempre no mesmo instante
+        candidate = after + interval + random.uniform(-jitter, jitter)
+        moment = datetime.datetime.fromtimestamp(candidate)
+        if not in_windows(moment, windows):
+            start = next_window_start(moment, windows)
+            candidate = start.timestamp() + random.uniform(0, jitter)
+        return candidate
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._loop, name='speedtest-schedule', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        self.next_run = self.plan(self.clock())
+        logger.info(f"Próximo teste de velocidade agendado para "
+                    f"{datetime.datetime.fromtimestamp(self.next_run):%d/%m/%Y %H:%M}")
+        while not self._stop.wait(timeout=min(max(self.next_run - self.clock(), 0.5), 60)):
+            config = self.get_config()
+            now = self.clock()
+            if not config.get('speedtestSchedule'):
+                # Desativado: o intervalo passa a contar de quando for reativado
+                self.next_run = self.plan(now)
+                continue
+            if now < self.next_run:
+                continue
+            if not in_windows(datetime.datetime.fromtimestamp(now), parse_windows(config.get('speedtestWindows'))):
+                # Janela alterada desde o planejamento
+                self.next_run = self.plan(now - float(config.get('speedtestInterval', 21600)))
+                continue
+
+            # Teste manual em andamento conta como o teste deste ciclo
+            self.runner.submit(source='scheduled', quick=bool(config.get('speedtestScheduleQuick', True)))
+            self.next_run = self.plan(now)
+
+    def stats(self):
+        return {
+            'enabled': bool(self.get_config().get('speedtestSchedule')),
+            'nextRun': self.next_run
+        }
@@ -159,6 +159,11 @@
                     if (data.monitoring) {
                         AppState.isMonitoring = true;
                         updateMonitoringControls(true);
+                        
+                        // Monitoramento já ativo no servidor: passa a receber atualizações
+                        if (!AppState.pollingInterval && !AppState.eventSource) {
+                            startPolling();
+                        }
                     } else {
                         AppState.isMonitoring = false;
                         updateMonitoringControls(false);
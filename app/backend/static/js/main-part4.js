@@ -85,15 +85,39 @@
 
     /**
      * Busca o histórico para o período selecionado
+     * Na primeira busca de um período baixa a janela inteira; nas seguintes,
+     * apenas os registros a partir do cursor, mesclados ao buffer local
      */
     function fetchHistory() {
         const range = DOM.history.rangeSelect ? DOM.history.rangeSelect.value : 'day';
+        const buffer = AppState.historyBuffer;
+        const incremental = buffer.range === range && buffer.cursor !== null;
         
-        fetch(`${API.BASE_URL}${API.ENDPOINTS.HISTORY}?range=${range}`)
+        // Formato colunar: nomes de campos uma única vez e decimais fixos
+        let url = `${API.BASE_URL}${API.ENDPOINTS.HISTORY}?range=${range}&format=columnar`;
+        if (incremental) {
+            url += `&since=${buffer.cursor}&resolution=${buffer.resolution}`;
+        }
+        
+        fetch(url)
             .then(response => response.json())
             .then(data => {
                 if (data.success) {
-                    updateHistoryChart(data.history);
+                    const records = data.format === 'columnar' ? columnsToRecords(data.history) : data.history;
+                    
+                    if (incremental) {
+                        mergeHistory(buffer, records, data.cutoff);
+                    } else {
+                        buffer.range = range;
+                        buffer.resolution = data.resolution;
+                        buffer.records = records;
+                    }
+                    
+                    if (data.cursor !== null && data.cursor !== undefined) {
+                        buffer.cursor = data.cursor;
+                    }
+                    
+                    updateHistoryChart(buffer.records);
                     updateHistorySummary(data.summary);
                 }
             })
@@ -103,6 +127,49 @@
             });
     }
 
+    /**
+     * Converte a resposta colunar ({fields, columns}) em uma lista de registros
+     */
+    function columnsToRecords(history) {
+        const fields = history.fields || [];
+        if (fields.length === 0) return [];
+        
+        const count = history.columns[fields[0]].length;
+        const records = new Array(count);
+        for (let i = 0; i < count; i++) {
+            const record = {};
+            fields.forEach(field => {
+                record[field] = history.columns[field][i];
+            });
+            records[i] = record;
+        }
+        return records;
+    }
+
+    /**
+     * Mescla registros novos ao buffer do histórico e descarta os expirados
+     */
+    function mergeHistory(buffer, records, cutoff) {
+        if (records.length > 0) {
+            // Registros com timestamp >= ao primeiro recebido são substituídos
+            const firstTimestamp = records[0].timestamp;
+            while (buffer.records.length > 0 &&
+                   buffer.records[buffer.records.length - 1].timestamp >= firstTimestamp) {
+                buffer.records.pop();
+            }
+            Array.prototype.push.apply(buffer.records, records);
+        }
+        
+        // Remove do início os registros que saíram da janela do período
+        let expired = 0;
+        while (expired < buffer.records.length && buffer.records[expired].timestamp < cutoff) {
+            expired++;
+        }
+        if (expired > 0) {
+            buffer.records.splice(0, expired);
+        }
+    }
+
     /**
      * Atualiza o gráfico de histórico
      */
@@ -150,7 +217,7 @@
     }
 
     /**
-     * Inicia um teste de velocidade
+     * Inicia um teste de velocidade (executado em segundo plano no servidor)
      */
     function startSpeedTest() {
         // Desabilita o botão durante o teste
@@ -168,7 +235,7 @@
         // Inicia a barra de progresso
         startProgressBar();
         
-        // Faz a chamada API
+        // Cria o job (ou recebe o teste que já está em andamento)
         fetch(API.BASE_URL + API.ENDPOINTS.SPEEDTEST, {
             method: 'POST'
         })
@@ -179,31 +246,22 @@
             return response.json();
         })
         .then(data => {
-            if (data.success) {
-                // Atualiza os valores com o resultado
-                if (DOM.speedTest.downloadValue) {
-                    DOM.speedTest.downloadValue.textContent = data.result.download.toFixed(2);
-                }
-                
-                if (DOM.speedTest.uploadValue) {
-                    DOM.speedTest.uploadValue.textContent = data.result.upload.toFixed(2);
-                }
-                
-                if (DOM.speedTest.pingValue) {
-                    DOM.speedTest.pingValue.textContent = Math.round(data.result.ping);
-                }
-                
-                if (DOM.speedTest.serverName) {
-                    DOM.speedTest.serverName.textContent = data.result.server.name || '-';
-                }
+            if (!data.success) {
+                throw new Error(data.error);
+            }
+            return followSpeedTest(data.job);
+        })
+        .then(job => {
+            if (job.status === 'done') {
+                showSpeedTestValues(job.result);
                 
                 if (DOM.speedTest.lastTestTime) {
-                    DOM.speedTest.lastTestTime.textContent = new Date().toLocaleString();
+                    DOM.speedTest.lastTestTime.textContent = new Date(job.finished * 1000).toLocaleString();
                 }
                 
                 showToast('Teste de velocidade concluído com sucesso!', 'success');
             } else {
-                showToast('Erro durante o teste de velocidade: ' + data.error, 'error');
+                showToast('Erro durante o teste de velocidade: ' + job.error, 'error');
             }
         })
         .catch(error => {
@@ -220,4 +278,86 @@
             // Conclui a barra de progresso
             completeProgressBar();
         });
+    }
+
+    /**
+     * Acompanha o andamento de um teste até o fim (SSE, com polling como alternativa)
+     */
+    function followSpeedTest(job) {
+        const jobUrl = API.BASE_URL + API.ENDPOINTS.SPEEDTEST + '/' + job.id;
+        
+        const onProgress = job => {
+            setProgressBar(job.progress * 100);
+            showSpeedTestValues(job.partial);
+        };
+        onProgress(job);
+        
+        if (job.status === 'done' || job.status === 'error') {
+            return Promise.resolve(job);
+        }
+        
+        const poll = resolve => {
+            const timer = setInterval(() => {
+                fetch(jobUrl)
+                    .then(response => response.json())
+                    .then(data => {
+                        if (!data.success) {
+                            clearInterval(timer);
+                            resolve({ status: 'error', error: data.error });
+                            return;
+                        }
+                        onProgress(data.job);
+                        if (data.job.status === 'done' || data.job.status === 'error') {
+                            clearInterval(timer);
+                            resolve(data.job);
+                        }
+                    })
+                    .catch(error => console.error('Erro ao consultar teste de velocidade:', error));
+            }, 1000);
+        };
+        
+        return new Promise(resolve => {
+            if (!window.EventSource) {
+                poll(resolve);
+                return;
+            }
+            
+            const source = new EventSource(jobUrl + '/stream');
+            source.addEventListener('progress', event => {
+                const current = JSON.parse(event.data);
+                onProgress(current);
+                if (current.status === 'done' || current.status === 'error') {
+                    source.close();
+                    resolve(current);
+                }
+            });
+            source.onerror = () => {
+                // Conexão perdida: continua por polling
+                source.close();
+                poll(resolve);
+            };
+        });
+    }
+
+    /**
+     * Exibe os valores (parciais ou finais) de um teste de velocidade
+     */
+    function showSpeedTestValues(values) {
+        if (!values) return;
+        
+        if (DOM.speedTest.downloadValue && values.download !== undefined) {
+            DOM.speedTest.downloadValue.textContent = values.download.toFixed(2);
+        }
+        
+        if (DOM.speedTest.uploadValue && values.upload !== undefined) {
+            DOM.speedTest.uploadValue.textContent = values.upload.toFixed(2);
+        }
+        
+        if (DOM.speedTest.pingValue && values.ping !== undefined) {
+            DOM.speedTest.pingValue.textContent = Math.round(values.ping);
+        }
+        
+        if (DOM.speedTest.serverName && values.server) {
+            DOM.speedTest.serverName.textContent = values.server.name || '-';
+        }
     }
\ No newline at end of file
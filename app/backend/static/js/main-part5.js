@@ -46,7 +46,10 @@
      * Gera um relatório
      */
     function generateReport(type) {
-        fetch(`${API.BASE_URL}${API.ENDPOINTS.REPORTS}?type=${type}`, {
+        // Período completo (dia/semana/mês) ou, sem seleção, as últimas entradas
+        const range = DOM.reports.rangeSelect ? DOM.reports.rangeSelect.value : '';
+        const rangeParam = range ? `&range=${range}` : '';
+        fetch(`${API.BASE_URL}${API.ENDPOINTS.REPORTS}?type=${type}${rangeParam}`, {
             method: 'POST'
         })
         .then(response => response.json())
@@ -71,26 +74,78 @@
     }
 
     /**
-     * Inicia o polling para obter atualizações
+     * Inicia o recebimento de atualizações (SSE, com polling como alternativa)
      */
     function startPolling() {
-        if (AppState.pollingInterval) {
-            clearInterval(AppState.pollingInterval);
-        }
+        stopPolling();
         
-        AppState.pollingInterval = setInterval(() => {
-            fetchStatus();
-        }, API.POLL_INTERVAL);
+        if (!startStream()) {
+            AppState.pollingInterval = setInterval(() => {
+                fetchStatus();
+            }, API.POLL_INTERVAL);
+        }
     }
 
     /**
-     * Para o polling
+     * Para o recebimento de atualizações
      */
     function stopPolling() {
         if (AppState.pollingInterval) {
             clearInterval(AppState.pollingInterval);
             AppState.pollingInterval = null;
         }
+        
+        if (AppState.eventSource) {
+            AppState.eventSource.close();
+            AppState.eventSource = null;
+        }
+    }
+
+    /**
+     * Assina o stream de status via Server-Sent Events
+     * Retorna false se o navegador não suportar EventSource
+     */
+    function startStream() {
+        if (!window.EventSource) {
+            return false;
+        }
+        
+        const source = new EventSource(API.BASE_URL + API.ENDPOINTS.STREAM);
+        AppState.eventSource = source;
+        
+        source.onmessage = function(event) {
+            const message = JSON.parse(event.data);
+            
+            // O servidor envia apenas os campos alterados; mescla com o estado local
+            const current = message.full ? {} : Object.assign({}, AppState.data.current);
+            Object.keys(message).forEach(key => {
+                if (key !== 'version' && key !== 'full' && key !== 'monitoring') {
+                    current[key] = message[key];
+                }
+            });
+            
+            if (current.lastUpdate !== undefined && current.download !== undefined) {
+                updateUI({ current: current });
+            }
+            
+            if (message.monitoring !== undefined) {
+                AppState.isMonitoring = message.monitoring;
+                updateMonitoringControls(message.monitoring);
+            }
+        };
+        
+        source.onerror = function() {
+            // Conexão recusada ou SSE indisponível: volta ao polling
+            if (source.readyState === EventSource.CLOSED && AppState.eventSource === source) {
+                console.warn('Stream de status indisponível, usando polling');
+                AppState.eventSource = null;
+                AppState.pollingInterval = setInterval(() => {
+                    fetchStatus();
+                }, API.POLL_INTERVAL);
+            }
+        };
+        
+        return true;
     }
 
     /**
@@ -107,29 +162,18 @@
     }
 
     /**
-     * Inicia a animação da barra de progresso
+     * Reinicia a barra de progresso
      */
     function startProgressBar() {
+        setProgressBar(0);
+    }
+
+    /**
+     * Atualiza a barra de progresso com o andamento informado pelo servidor
+     */
+    function setProgressBar(percent) {
         if (DOM.speedTest.progressInner) {
-            DOM.speedTest.progressInner.style.width = '0%';
-            
-            // Simula progresso incremental
-            let progress = 0;
-            const progressInterval = setInterval(() => {
-                // Avança mais rápido no início, mais lento no final
-                const step = progress < 50 ? 5 : (progress < 80 ? 3 : 1);
-                progress += step;
-                
-                if (progress >= 95) {
-                    clearInterval(progressInterval);
-                    progress = 95; // Deixa em 95% até completar
-                }
-                
-                DOM.speedTest.progressInner.style.width = progress + '%';
-            }, 500);
-            
-            // Guarda a referência do intervalo
-            AppState.progressInterval = progressInterval;
+            DOM.speedTest.progressInner.style.width = Math.min(Math.max(percent, 0), 100) + '%';
         }
     }
 
@@ -138,17 +182,12 @@
      */
     function completeProgressBar() {
         if (DOM.speedTest.progressInner) {
-            // Limpa o intervalo existente
-            if (AppState.progressInterval) {
-                clearInterval(AppState.progressInterval);
-            }
-            
             // Completa para 100%
-            DOM.speedTest.progressInner.style.width = '100%';
+            setProgressBar(100);
             
             // Após completar, esconde a barra
             setTimeout(() => {
-                DOM.speedTest.progressInner.style.width = '0%';
+                setProgressBar(0);
             }, 1500);
         }
     }
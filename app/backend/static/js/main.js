@@ -10,6 +10,7 @@
         BASE_URL: '',
         ENDPOINTS: {
             STATUS: '/api/status',
+            STREAM: '/api/stream',
             HISTORY: '/api/history',
             SPEEDTEST: '/api/speedtest',
             CONFIG: '/api/config',
@@ -27,6 +28,7 @@
     const AppState = {
         isMonitoring: false,
         pollingInterval: null,
+        eventSource: null,
         lastUpdate: null,
         data: {
             current: {
@@ -38,6 +40,13 @@
             },
             history: []
         },
+        // Buffer local do histórico, atualizado com buscas incrementais (since)
+        historyBuffer: {
+            range: null,
+            resolution: null,
+            records: [],
+            cursor: null
+        },
         charts: {},
         systemInfo: {},
         interfaces: [],
@@ -98,6 +107,8 @@
         reports: {
             generatePDFBtn: document.getElementById('generate-report-pdf'),
             generateTXTBtn: document.getElementById('generate-report-txt'),
+            generateCSVBtn: document.getElementById('generate-report-csv'),
+            rangeSelect: document.getElementById('report-range'),
             reportsContainer: document.getElementById('reports-container')
         },
         modal: {
@@ -192,6 +203,12 @@
             });
         }
         
+        if (DOM.reports.generateCSVBtn) {
+            DOM.reports.generateCSVBtn.addEventListener('click', function() {
+                generateReport('csv');
+            });
+        }
+        
         // Modal Sobre
         if (DOM.modal.openAboutBtn) {
             DOM.modal.openAboutBtn.addEventListener('click', function(e) {
@@ -57,6 +57,9 @@ self.addEventListener('fetch', event => {
     // Ignora requisições não GET
     if (event.request.method !== 'GET') return;
 
+    // Streams SSE (status e testes de velocidade) vão direto para a rede, sem passar pelo service worker
+    if (event.request.url.includes('/api/stream') || event.request.url.endsWith('/stream')) return;
+
     // Ignora requisições de API
     if (event.request.url.includes('/api/')) {
         // Para chamadas API, tenta rede e retorna resposta offline personalizada
@@ -0,0 +1,18 @@
+"""
+Monitor de Rede - Configuração dos testes
+Os módulos do backend são importados pelo nome (como em app.py), a partir do
+diretório app/backend. Dados e logs de app.py vão para um diretório temporário,
+definido antes da primeira importação.
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+TEST_ROOT = tempfile.mkdtemp(prefix='network-monitor-tests-')
+os.environ['NETWORK_MONITOR_DATA_DIR'] = os.path.join(TEST_ROOT, 'data')
+os.environ['NETWORK_MONITOR_LOG_DIR'] = os.path.join(TEST_ROOT, 'logs')
@@ -0,0 +1,117 @@
+"""Difusão do status para clientes de /api/stream"""
+
+import json
+
+import app as monitor
+from broadcast import StatusBroadcaster, StreamSlots, encode_event
+
+
+def parse(event):
+    """Campos de uma mensagem SSE; 'data' já decodificado"""
+    fields = {}
+    for line in event.decode('utf-8').strip().split('\n'):
+        name, _, value = line.partition(': ')
+        fields[name] = value
+    if 'data' in fields:
+        fields['data'] = json.loads(fields['data'])
+    return fields
+
+
+def test_encode_event():
+    event = encode_event({'version': 3, 'download': 1.5}, event='status')
+
+    assert event == b'event: status\nid: 3\ndata: {"version":3,"download":1.5}\n\n'
+
+
+def test_stream_starts_with_full_snapshot_then_deltas():
+    broadcaster = StatusBroadcaster()
+    broadcaster.publish({'download': 1.0, 'upload': 2.0})
+    stream = broadcaster.stream()
+
+    first = next(stream)
+    assert first.startswith(b'retry: 3000\n')
+    assert parse(first[len(b'retry: 3000\n'):])['data'] == {
+        'download': 1.0, 'upload': 2.0, 'version': 1, 'full': True}
+    assert broadcaster.subscribers == 1
+
+    broadcaster.publish({'download': 5.0, 'upload': 2.0})
+    delta = parse(next(stream))
+    assert delta['id'] == '2'
+    assert delta['data'] == {'download': 5.0, 'version': 2}
+
+    stream.close()
+    assert broadcaster.subscribers == 0
+
+
+def test_unchanged_status_is_not_published():
+    broadcaster = StatusBroadcaster()
+    broadcaster.publish({'download': 1.0})
+    broadcaster.publish({'download': 1.0})
+
+    assert broadcaster.version == 1
+
+
+def test_slow_subscriber_gets_latest_snapshot():
+    broadcaster = StatusBroadcaster()
+    broadcaster.publish({'download': 1.0, 'upload': 2.0})
+    stream = broadcaster.stream()
+    next(stream)
+
+    broadcaster.publish({'download': 3.0, 'upload': 2.0})
+    broadcaster.publish({'download': 3.0, 'upload': 4.0})
+
+    # Perdeu a versão 2: recebe o estado completo da 3
+    assert parse(next(stream))['data'] == {'download': 3.0, 'upload': 4.0, 'version': 3, 'full': True}
+    stream.close()
+
+
+def test_stop_request_ends_the_stream():
+    broadcaster = StatusBroadcaster()
+    broadcaster.publish({'download': 1.0})
+
+    events = list(broadcaster.stream(should_stop=lambda: True))
+
+    assert len(events) == 1
+    assert broadcaster.subscribers == 0
+
+
+# Limite de streams simultâneos
+
+def test_stream_slots_reject_above_limit():
+    slots = StreamSlots(2)
+
+    assert slots.acquire() and slots.acquire()
+    assert not slots.acquire()
+    slots.release()
+    assert slots.acquire()
+    assert slots.stats() == {'limit': 2, 'active': 2, 'rejected': 1}
+
+
+def test_stream_limit_leaves_threads_free(monkeypatch):
+    monkeypatch.setitem(monitor.state['config'], 'maxStreams', 6)
+
+    assert monitor.stream_limit() == 6
+    assert monitor.stream_limit(threads=4) == 2
+    assert monitor.stream_limit(threads=2) == 1
+
+
+def test_stream_route_answers_503_when_full(monkeypatch):
+    slots = StreamSlots(1)
+    monkeypatch.setitem(monitor.state, 'stream_slots', slots)
+    client = monitor.app.test_client()
+
+    stream = client.get('/api/stream')
+    assert stream.status_code == 200
+    assert stream.mimetype == 'text/event-stream'
+    assert slots.active == 1
+
+    rejected = client.get('/api/stream')
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After'] == '30'
+
+    # Fechar a conexão libera a vaga
+    stream.close()
+    assert slots.active == 0
+    again = client.get('/api/stream')
+    assert again.status_code == 200
+    again.close()
@@ -0,0 +1,231 @@
+"""Contabilização de fluxos: blocos TPACKET_V3 e reprodução de arquivos pcap"""
+
+import mmap
+import socket
+import struct
+
+import pytest
+
+import flow_accounting
+from flow_accounting import (FlowAccounting, PacketRing, LINKTYPE_ETHERNET, LINKTYPE_RAW,
+                             TP_STATUS_USER, TP_STATUS_KERNEL, PACKET_OUTGOING, ARPHRD_NONE)
+
+ARPHRD_ETHER = 1
+PACKET_HOST = 0
+BLOCK_SIZE = 4096
+FIRST_PACKET = 48
+PACKET_HEADER_SIZE = 48 + 20  # tpacket3_hdr + sockaddr_ll
+
+
+def ipv4(src, dst, protocol, sport, dport, payload=0):
+    length = 20 + 8 + payload
+    header = struct.pack('!BBHHHBBH4s4s', 0x45, 0, length, 1, 0, 64, protocol, 0,
+                         socket.inet_aton(src), socket.inet_aton(dst))
+    return header + struct.pack('!HHHH', sport, dport, 8 + payload, 0) + bytes(payload)
+
+
+def ipv6(src, dst, protocol, sport, dport, payload=0):
+    header = struct.pack('!IHBB16s16s', 6 << 28, 8 + payload, protocol, 64,
+                         socket.inet_pton(socket.AF_INET6, src), socket.inet_pton(socket.AF_INET6, dst))
+    return header + struct.pack('!HHHH', sport, dport, 8 + payload, 0) + bytes(payload)
+
+
+def ethernet(packet, ethertype=0x0800, vlan=None):
+    header = b'\x02' * 6 + b'\x04' * 6
+    if vlan is not None:
+        header += struct.pack('!HH', 0x8100, vlan)
+    return header + struct.pack('!H', ethertype) + packet
+
+
+def flows_by_port(records):
+    return {(record['protocol'], record['sport']): record for record in records}
+
+
+# TPACKET_V3
+
+def ring_block(frames, seconds=1000):
+    """Bloco do anel como o kernel o entrega: descritor seguido dos pacotes"""
+    block = bytearray(BLOCK_SIZE)
+    offset = FIRST_PACKET
+    for index, (frame, hatype, pkttype, ifindex) in enumerate(frames):
+        size = PACKET_HEADER_SIZE + len(frame)
+        next_offset = 0 if index == len(frames) - 1 else (size + 15) & ~15
+        # tpacket3_hdr: next_offset, sec, nsec, snaplen, len, status, mac, net
+        struct.pack_into('=6IHH', block, offset, next_offset, seconds, 0, len(frame), len(frame),
+                         TP_STATUS_USER, PACKET_HEADER_SIZE, PACKET_HEADER_SIZE + 14)
+        # sockaddr_ll: family, protocol, ifindex, hatype, pkttype
+        struct.pack_into('=HHiHB', block, offset + 48, socket.AF_PACKET, 0x0008, ifindex, hatype, pkttype)
+        block[offset + PACKET_HEADER_SIZE:offset + size] = frame
+        offset += next_offset
+    # tpacket_block_desc: version, offset_to_priv, block_status, num_pkts, offset_to_first_pkt
+    struct.pack_into('=5I', block, 0, 3, 0, TP_STATUS_USER, len(frames), FIRST_PACKET)
+    return block
+
+
+def memory_ring(blocks):
+    """PacketRing sobre um mapa anônimo, sem socket (apenas para blocks())"""
+    ring = PacketRing.__new__(PacketRing)
+    ring.block_size = BLOCK_SIZE
+    ring.block_count = len(blocks)
+    ring.block = 0
+    ring.map = mmap.mmap(-1, BLOCK_SIZE * len(blocks))
+    ring.map.write(b''.join(blocks))
+    return ring
+
+
+def capture(accounting, ring):
+    # Mesmo laço de FlowAccounting._capture, sem esperar no socket
+    for data, offset, count in ring.blocks(0):
+        _, now, packets, total, skipped = accounting.process(data, offset, None, count, None)
+        accounting.packets += packets
+        accounting.bytes += total
+        accounting.skipped += skipped
+    return now
+
+
+def test_ring_blocks_are_parsed_and_returned_to_kernel():
+    tcp = ipv4('10.0.0.1', '10.0.0.2', 6, 40000, 443, payload=100)
+    udp = ipv6('2001:db8::1', '2001:db8::2', 17, 5353, 53, payload=20)
+    first = ring_block([
+        (ethernet(tcp), ARPHRD_ETHER, PACKET_HOST, 2),
+        (ethernet(tcp, vlan=10), ARPHRD_ETHER, PACKET_HOST, 2),
+        (ethernet(udp, ethertype=0x86DD), ARPHRD_ETHER, PACKET_HOST, 2),
+    ])
+    second = ring_block([(tcp, ARPHRD_NONE, PACKET_HOST, 3)], seconds=1001)
+    ring = memory_ring([first, second])
+    exported = []
+    accounting = FlowAccounting(on_export=exported.extend)
+
+    now = capture(accounting, ring)
+
+    assert now == 1001
+    assert accounting.packets == 4
+    assert accounting.bytes == 3 * len(tcp) + len(udp)
+    for block in range(2):
+        assert struct.unpack_from('=I', ring.map, block * BLOCK_SIZE + 8)[0] == TP_STATUS_KERNEL
+    # Anel circular: volta ao primeiro bloco, ainda com o kernel
+    assert ring.block == 0
+    assert not ring._ready()
+
+    accounting.flush(now)
+    flows = flows_by_port(exported)
+    assert flows[('tcp', 40000)]['packets'] == 3
+    assert flows[('tcp', 40000)]['dst'] == '10.0.0.2'
+    assert flows[('tcp', 40000)]['dport'] == 443
+    assert flows[('tcp', 40000)]['start'] == 1000 * 1000
+    assert flows[('tcp', 40000)]['end'] == 1001 * 1000
+    assert flows[('udp', 5353)]['src'] == '2001:db8::1'
+    assert flows[('udp', 5353)]['bytes'] == len(udp)
+    assert {record['reason'] for record in exported} == {'end'}
+
+
+def test_ring_skips_outgoing_loopback_copies():
+    accounting = FlowAccounting()
+    if accounting.loopback is None:
+        pytest.skip('sem interface de loopback')
+    packet = ethernet(ipv4('127.0.0.1', '127.0.0.1', 17, 1000, 2000))
+    ring = memory_ring([ring_block([
+        (packet, ARPHRD_ETHER, PACKET_OUTGOING, accounting.loopback),
+        (packet, ARPHRD_ETHER, PACKET_HOST, accounting.loopback),
+    ])])
+
+    capture(accounting, ring)
+
+    assert accounting.packets == 1
+    assert accounting.skipped == 1
+
+
+# pcap
+
+def write_pcap(path, packets, linktype=LINKTYPE_ETHERNET, endian='<', snaplen=65535):
+    with open(path, 'wb') as f:
+        f.write(struct.pack(endian + 'IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, snaplen, linktype))
+        for seconds, frame in packets:
+            captured = frame[:snaplen]
+            f.write(struct.pack(endian + 'IIII', seconds, 0, len(captured), len(frame)) + captured)
+
+
+def test_replay_pcap(tmp_path):
+    tcp = ethernet(ipv4('192.168.0.10', '1.1.1.1', 6, 50000, 443, payload=500))
+    reply = ethernet(ipv4('1.1.1.1', '192.168.0.10', 6, 443, 50000, payload=1000))
+    arp = b'\xff' * 6 + b'\x02' * 6 + b'\x08\x06' + bytes(28)
+    path = tmp_path / 'capture.pcap'
+    write_pcap(path, [(100, tcp), (101, reply), (101, arp), (102, tcp)])
+    exported = []
+    accounting = FlowAccounting(on_export=exported.extend)
+
+    stats = accounting.replay(str(path))
+
+    assert stats['source'] == 'pcap:capture.pcap'
+    assert stats['packets'] == 3
+    assert stats['skipped'] == 1
+    assert stats['bytes'] == 2 * (len(tcp) - 14) + len(reply) - 14
+    assert stats['activeFlows'] == 0
+    flows = flows_by_port(exported)
+    assert flows[('tcp', 50000)]['packets'] == 2
+    assert flows[('tcp', 50000)]['end'] == 102 * 1000
+    assert flows[('tcp', 443)]['bytes'] == len(reply) - 14
+
+
+def test_replay_counts_wire_length_of_truncated_packets(tmp_path):
+    packet = ipv4('10.1.1.1', '10.2.2.2', 17, 1, 2, payload=1400)
+    path = tmp_path / 'snap.pcap'
+    write_pcap(path, [(5, packet)], linktype=LINKTYPE_RAW, endian='>', snaplen=64)
+
+    stats = FlowAccounting().replay(str(path))
+
+    assert stats['packets'] == 1
+    assert stats['bytes'] == len(packet)
+
+
+def test_replay_carries_records_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(flow_accounting, 'PCAP_CHUNK', 50)
+    packets = [(i, ethernet(ipv4('10.0.0.1', '10.0.0.2', 17, 1000 + i % 3, 53, payload=i))) for i in range(20)]
+    path = tmp_path / 'chunks.pcap'
+    write_pcap(path, packets)
+    exported = []
+
+    stats = FlowAccounting(on_export=exported.extend).replay(str(path))
+
+    assert stats['packets'] == 20
+    assert stats['bytes'] == sum(len(frame) - 14 for _, frame in packets)
+    assert sum(record['packets'] for record in exported) == 20
+
+
+def test_replay_exports_idle_flows_on_packet_clock(tmp_path, monkeypatch):
+    # Expirações são verificadas entre trechos lidos do arquivo
+    monkeypatch.setattr(flow_accounting, 'PCAP_CHUNK', 64)
+    early = ethernet(ipv4('10.0.0.1', '10.0.0.2', 6, 1111, 80))
+    late = ethernet(ipv4('10.0.0.1', '10.0.0.2', 6, 2222, 80))
+    path = tmp_path / 'idle.pcap'
+    write_pcap(path, [(1000, early)] + [(1000 + t, late) for t in range(0, 40, 2)])
+    exported = []
+
+    FlowAccounting(idle_timeout=15, active_timeout=1000, on_export=exported.extend).replay(str(path))
+
+    reasons = {(record['sport'], record['reason']) for record in exported}
+    assert (1111, 'idle') in reasons
+    assert (2222, 'end') in reasons
+
+
+def test_replay_sampling_scales_counters(tmp_path):
+    packet = ethernet(ipv4('10.0.0.1', '10.0.0.2', 17, 1, 2, payload=72))
+    path = tmp_path / 'sampled.pcap'
+    write_pcap(path, [(1, packet)] * 10)
+
+    stats = FlowAccounting(sampling=2).replay(str(path))
+
+    assert stats['packets'] == 5
+    assert stats['bytes'] == 10 * (len(packet) - 14)
+
+
+def test_replay_rejects_pcapng_and_truncated_files(tmp_path):
+    pcapng = tmp_path / 'capture.pcapng'
+    pcapng.write_bytes(b'\x0a\x0d\x0d\x0a' + bytes(40))
+    with pytest.raises(ValueError):
+        FlowAccounting().replay(str(pcapng))
+
+    truncated = tmp_path / 'short.pcap'
+    truncated.write_bytes(b'\xd4\xc3\xb2\xa1')
+    with pytest.raises(ValueError):
+        FlowAccounting().replay(str(truncated))
@@ -0,0 +1,67 @@
+"""Busca incremental de /api/history com o cursor since"""
+
+import time
+
+import pytest
+
+import app as monitor
+from history_columns import HistoryColumns
+
+MINUTE = 60 * 1000
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Dez registros por minuto terminando no minuto atual
+    now = int(time.time() * 1000)
+    last = now - now % MINUTE
+    records = [{'timestamp': last - (9 - i) * MINUTE, 'download': float(i), 'upload': 1.0, 'ping': 10.0,
+                'totalDownload': i, 'totalUpload': i} for i in range(10)]
+    monkeypatch.setitem(monitor.state, 'history', HistoryColumns(records))
+    monkeypatch.setitem(monitor.state, 'history_store', None)
+    monitor.state['response_cache'].invalidate()
+    yield monitor.app.test_client()
+    monitor.state['response_cache'].invalidate()
+
+
+def get_history(client, **params):
+    return client.get('/api/history', query_string=dict(params, resolution='raw')).get_json()
+
+
+def test_full_fetch_returns_cursor(client):
+    data = get_history(client)
+
+    assert data['success']
+    assert len(data['history']) == 10
+    assert data['cursor'] == data['history'][-1]['timestamp']
+    assert data['incremental'] is False
+    assert data['cutoff'] < data['history'][0]['timestamp']
+
+
+def test_since_returns_records_from_the_cursor(client):
+    history = get_history(client)['history']
+
+    data = get_history(client, since=history[6]['timestamp'])
+
+    # O registro do cursor é reenviado: o cliente substitui o de mesmo timestamp
+    assert data['history'] == history[6:]
+    assert data['incremental'] is True
+    assert data['cursor'] == history[-1]['timestamp']
+
+
+def test_since_after_last_record_keeps_cursor(client):
+    cursor = get_history(client)['cursor'] + 1
+
+    data = get_history(client, since=cursor)
+
+    assert data['history'] == []
+    assert data['cursor'] == cursor
+
+
+def test_since_before_window_is_clamped_to_cutoff(client):
+    old = dict(monitor.state['history'][0], timestamp=monitor.state['history'][0]['timestamp'] - 2 * 24 * 60 * MINUTE)
+    monitor.state['history'].append(old)
+
+    data = get_history(client, since=0)
+
+    assert len(data['history']) == 10
@@ -0,0 +1,110 @@
+"""Histórico em colunas: registros como dicionários e limites da busca binária"""
+
+import pytest
+
+from history_columns import HistoryColumns
+
+
+def record(timestamp, download=1.0):
+    return {'timestamp': timestamp, 'download': download, 'upload': 0.5, 'ping': 10.0,
+            'totalDownload': timestamp, 'totalUpload': 0}
+
+
+def test_records_are_rebuilt_as_dicts():
+    history = HistoryColumns([record(10, download=2.5), record(20)])
+
+    assert len(history) == 2
+    assert history[0] == record(10, download=2.5)
+    assert history[-1]['timestamp'] == 20
+    assert list(history) == [record(10, download=2.5), record(20)]
+    assert history[1:] == [record(20)]
+    with pytest.raises(IndexError):
+        history[2]
+
+
+def test_missing_fields_default_to_zero():
+    history = HistoryColumns()
+    history.append({'timestamp': 5.0, 'download': 1.0})
+
+    assert history[0] == {'timestamp': 5, 'download': 1.0, 'upload': 0.0, 'ping': 0.0,
+                          'totalDownload': 0.0, 'totalUpload': 0.0}
+    assert isinstance(history[0]['timestamp'], int)
+
+
+def test_clear_empties_every_column():
+    history = HistoryColumns([record(10), record(20)])
+
+    history.clear()
+
+    assert not history
+    assert all(len(column) == 0 for column in history.columns.values())
+    assert list(history) == []
+
+
+@pytest.fixture
+def history():
+    # Timestamps 10, 20, 20, 30, 40
+    return HistoryColumns([record(10), record(20), record(20), record(30), record(40)])
+
+
+def timestamps(records):
+    return [r['timestamp'] for r in records]
+
+
+@pytest.mark.parametrize('timestamp, index', [
+    (0, 0), (10, 0), (11, 1), (20, 1), (21, 3), (40, 4), (41, 5)
+])
+def test_index_of_is_first_at_or_after(history, timestamp, index):
+    assert history.index_of(timestamp) == index
+
+
+def test_range_is_half_open(history):
+    assert timestamps(history.range(20, 30)) == [20, 20]
+    assert timestamps(history.range(10, 40)) == [10, 20, 20, 30]
+    assert timestamps(history.range(15)) == [20, 20, 30, 40]
+    assert history.range(41) == []
+    assert history.range(30, 30) == []
+    assert timestamps(history.range(0, 1000)) == [10, 20, 20, 30, 40]
+
+
+def test_copy_range_matches_range_and_is_independent(history):
+    copy = history.copy_range(20, 40)
+    assert list(copy) == history.range(20, 40)
+
+    copy.append(record(35))
+    assert len(history) == 5
+
+
+def test_tail_bounds(history):
+    assert timestamps(history.tail(2)) == [30, 40]
+    assert timestamps(history.tail(5)) == timestamps(history)
+    assert timestamps(history.tail(100)) == timestamps(history)
+    assert history.tail(0) == []
+    assert HistoryColumns().tail(3) == []
+
+
+def test_trim_removes_records_before_cutoff(history):
+    assert history.trim(5) == 0
+    assert history.trim(20) == 1
+    assert timestamps(history) == [20, 20, 30, 40]
+    assert history.trim(100) == 4
+    assert len(history) == 0
+
+
+def test_out_of_order_append_keeps_order(history):
+    history.append(record(20, download=9.0))
+    history.append(record(5))
+
+    assert timestamps(history) == [5, 10, 20, 20, 20, 30, 40]
+    # Inserido após os registros de mesmo timestamp (bisect_right)
+    assert history[4]['download'] == 9.0
+
+
+def test_stats(history):
+    stats = history.stats()
+    assert stats['count'] == 5
+    assert stats['first'] == 10
+    assert stats['last'] == 40
+    assert stats['totalDownload'] == 40
+    assert stats['avgDownload'] == 1.0
+    assert HistoryColumns().stats()['first'] is None
@@ -0,0 +1,178 @@
+"""Agregações do histórico: camadas de resolução e somas correntes por janela"""
+
+from array import array
+
+import pytest
+
+from history_rollups import (HistoryRollups, WindowAggregates, LatencyWindows, LATENCY_BUCKETS,
+                             RAW_RESOLUTION)
+
+MINUTE = 60 * 1000
+HOUR = 60 * MINUTE
+BASE = 1704067200000
+
+
+def record(minute, download, upload=0.0, ping=10.0):
+    return {'timestamp': BASE + minute * MINUTE, 'download': download, 'upload': upload, 'ping': ping,
+            'totalDownload': minute, 'totalUpload': 2 * minute}
+
+
+# Camadas de resolução
+
+@pytest.fixture
+def rollups():
+    return HistoryRollups(tiers=(('5m', 5 * MINUTE), ('1h', HOUR)))
+
+
+def test_closed_bucket_has_min_avg_max_p95(rollups):
+    for minute in range(7):
+        rollups.add(record(minute, download=minute + 1.0, ping=20.0 - minute))
+
+    closed, current = rollups.query('5m', BASE)
+
+    assert closed == {
+        'timestamp': BASE, 'samples': 5, 'totalDownload': 4, 'totalUpload': 8,
+        'download': 3.0, 'downloadMin': 1.0, 'downloadMax': 5.0, 'downloadP95': 5.0,
+        'upload': 0.0, 'uploadMin': 0.0, 'uploadMax': 0.0, 'uploadP95': 0.0,
+        'ping': 18.0, 'pingMin': 16.0, 'pingMax': 20.0, 'pingP95': 20.0}
+    # O bucket aberto também é devolvido, com as amostras até agora
+    assert current['timestamp'] == BASE + 5 * MINUTE
+    assert current['samples'] == 2
+    assert len(rollups.tiers['5m']) == 1
+
+
+def test_query_starts_at_bucket_containing_start(rollups):
+    for minute in range(20):
+        rollups.add(record(minute, download=1.0))
+
+    buckets = rollups.query('5m', BASE + 7 * MINUTE)
+
+    assert [bucket['timestamp'] for bucket in buckets] == [BASE + minute * MINUTE for minute in (5, 10, 15)]
+    assert [bucket['timestamp'] for bucket in rollups.query('1h', BASE + 7 * MINUTE)] == [BASE]
+
+
+def test_out_of_order_record_does_not_reopen_bucket(rollups):
+    rollups.add(record(0, download=1.0))
+    rollups.add(record(6, download=1.0))
+    rollups.add(record(1, download=100.0))
+
+    assert [bucket['downloadMax'] for bucket in rollups.query('5m', BASE)] == [1.0, 1.0]
+
+
+def test_trim_drops_buckets_that_ended_before_cutoff(rollups):
+    for minute in range(20):
+        rollups.add(record(minute, download=1.0))
+
+    rollups.trim(BASE + 12 * MINUTE)
+
+    assert [bucket['timestamp'] for bucket in rollups.query('5m', 0)] == [BASE + 10 * MINUTE, BASE + 15 * MINUTE]
+    assert rollups.query('1h', 0)[0]['samples'] == 20
+
+
+def test_resolution_is_the_finest_within_max_points(rollups):
+    assert rollups.resolution_for(24 * HOUR, 3000) == RAW_RESOLUTION
+    assert rollups.resolution_for(7 * 24 * HOUR, 3000) == '5m'
+    assert rollups.resolution_for(30 * 24 * HOUR, 3000) == '1h'
+    assert rollups.resolution_for(365 * 24 * HOUR, 3000) == '1h'
+
+
+# Somas correntes por janela
+
+@pytest.fixture
+def aggregates():
+    # Janelas de 10 e 60 minutos
+    return WindowAggregates(windows=(('short', 10 * MINUTE), ('long', 60 * MINUTE)))
+
+
+def test_add_sums_every_window(aggregates):
+    for minute in range(5):
+        aggregates.add(record(minute, download=minute + 1, upload=1.0))
+
+    for name in ('short', 'long'):
+        summary = aggregates.summary(name, BASE + 5 * MINUTE)
+        assert summary['avgDownload'] == 3.0
+        assert summary['avgUpload'] == 1.0
+        assert summary['totalDownload'] == 4
+        assert summary['totalUpload'] == 8
+
+
+def test_records_leaving_a_window_are_subtracted(aggregates):
+    for minute in range(20):
+        aggregates.add(record(minute, download=minute))
+
+    # 'short' termina no minuto 20: restam os registros dos minutos 10 a 19
+    assert aggregates.summary('short', BASE + 20 * MINUTE)['avgDownload'] == 14.5
+    assert aggregates.running['short'][1] == 10
+    assert aggregates.summary('long', BASE + 20 * MINUTE)['avgDownload'] == 9.5
+
+    assert aggregates.summary('short', BASE + 25 * MINUTE)['avgDownload'] == 17
+    assert aggregates.summary('short', BASE + 40 * MINUTE)['avgDownload'] == 0
+
+
+def test_window_starts_exactly_at_cutoff(aggregates):
+    aggregates.add(record(0, download=1000.0))
+    aggregates.add(dict(record(0, download=2.0), timestamp=BASE + 30 * 1000))
+    aggregates.add(record(1, download=4.0))
+
+    # Janela de 10 minutos terminando em 10:30: o registro de 00:00 fica de fora
+    assert aggregates.summary('short', BASE + 10 * MINUTE + 30 * 1000)['avgDownload'] == 3.0
+    assert aggregates.summary('short', BASE + 10 * MINUTE + 30 * 1000 + 1)['avgDownload'] == 4.0
+
+
+def test_out_of_order_record_is_ignored(aggregates):
+    aggregates.add(record(5, download=10.0))
+    aggregates.add(record(3, download=1000.0))
+
+    assert aggregates.summary('long', BASE + 6 * MINUTE)['avgDownload'] == 10.0
+
+
+def test_trim_evicts_and_compacts(aggregates):
+    aggregates.COMPACT_THRESHOLD = 4
+    for minute in range(10):
+        aggregates.add(record(minute, download=1.0))
+
+    aggregates.trim(BASE + 3 * MINUTE)
+    # Menos registros expirados que o limite: as colunas ainda não são compactadas
+    assert len(aggregates.timestamps) == 10
+    assert aggregates.running['long'][:2] == [3, 7]
+
+    aggregates.trim(BASE + 6 * MINUTE)
+    assert list(aggregates.timestamps) == [BASE + minute * MINUTE for minute in range(6, 10)]
+    assert aggregates.running['short'][:2] == [0, 4]
+    assert aggregates.running['long'][:2] == [0, 4]
+    assert aggregates.summary('long', BASE + 10 * MINUTE)['avgDownload'] == 1.0
+
+
+def test_compaction_waits_for_every_window(aggregates):
+    aggregates.COMPACT_THRESHOLD = 4
+    for minute in range(30):
+        aggregates.add(record(minute, download=1.0))
+
+    # Só a janela curta avançou: os registros ainda pertencem à longa
+    aggregates.summary('short', BASE + 30 * MINUTE)
+    assert len(aggregates.timestamps) == 30
+    assert aggregates.summary('long', BASE + 30 * MINUTE)['avgDownload'] == 1.0
+
+
+def test_rebuild_matches_incremental(aggregates):
+    records = [record(minute, download=minute % 7) for minute in range(90)]
+    for item in records:
+        aggregates.add(item)
+    rebuilt = WindowAggregates(windows=tuple(aggregates.windows.items()))
+    rebuilt.rebuild(records)
+
+    now = BASE + 90 * MINUTE
+    assert rebuilt.summary('long', now) == aggregates.summary('long', now)
+
+
+# Histogramas de latência por janela
+
+def test_latency_window_drops_minutes_starting_before_it():
+    histogram = array('q', bytes(8 * LATENCY_BUCKETS))
+    histogram[3] = 1
+    windows = LatencyWindows(windows=(('short', 10 * MINUTE),))
+    for minute in range(3):
+        windows.add(BASE + minute * MINUTE, histogram)
+
+    assert windows.summary('short', BASE + 10 * MINUTE)['latencySamples'] == 3
+    assert windows.summary('short', BASE + 10 * MINUTE + 30 * 1000)['latencySamples'] == 2
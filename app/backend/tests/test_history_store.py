@@ -0,0 +1,178 @@
+"""Backends de armazenamento do histórico"""
+
+import os
+
+import pytest
+
+from history_store import SegmentLogStore, SqliteHistoryStore, DAY_MS
+
+DAY1 = SegmentLogStore.segment_start('20240101')
+DAY2 = DAY1 + DAY_MS
+DAY3 = DAY2 + DAY_MS
+MINUTE = 60 * 1000
+
+
+def record(timestamp, download=1.0):
+    return {'timestamp': timestamp, 'download': download, 'upload': 0.5, 'ping': 10.0,
+            'totalDownload': 100, 'totalUpload': 50}
+
+
+@pytest.fixture
+def segments(tmp_path):
+    store = SegmentLogStore(str(tmp_path / 'history'))
+    yield store
+    store.close()
+
+
+def test_segments_split_by_utc_day(segments):
+    segments.append_many([record(DAY1), record(DAY1 + MINUTE), record(DAY2), record(DAY3 - 1)])
+    segments.flush()
+
+    assert segments.segment_keys() == ['20240101', '20240102']
+    assert [r['timestamp'] for r in segments.load()] == [DAY1, DAY1 + MINUTE, DAY2, DAY3 - 1]
+
+
+def test_load_orders_out_of_order_records(segments):
+    segments.append_many([record(DAY2 + MINUTE), record(DAY1), record(DAY2)])
+
+    assert [r['timestamp'] for r in segments.load()] == [DAY1, DAY2, DAY2 + MINUTE]
+
+
+def test_drop_expired_removes_only_whole_days(segments):
+    segments.append_many([record(DAY1), record(DAY2), record(DAY3)])
+
+    # O corte no meio do segundo dia mantém o segmento inteiro
+    assert segments.drop_expired(DAY2 + MINUTE) == 1
+    assert segments.segment_keys() == ['20240102', '20240103']
+    assert segments.drop_expired(DAY3) == 1
+    assert segments.segment_keys() == ['20240103']
+
+
+def test_compact_deletes_expired_and_trims_oldest_segment(segments):
+    segments.append_many([record(DAY1), record(DAY2), record(DAY2 + 10 * MINUTE),
+                          record(DAY2 + 20 * MINUTE), record(DAY3)])
+
+    segments.compact(DAY2 + 10 * MINUTE)
+
+    assert segments.segment_keys() == ['20240102', '20240103']
+    assert [r['timestamp'] for r in segments.load()] == [DAY2 + 10 * MINUTE, DAY2 + 20 * MINUTE, DAY3]
+
+
+def test_compact_skips_oldest_segment_without_expired_records(segments):
+    segments.append_many([record(DAY2 + 10 * MINUTE), record(DAY3)])
+    segments.close()
+    path = segments.segment_path('20240102')
+    before = os.stat(path).st_ino
+
+    segments.compact(DAY2 + 5 * MINUTE)
+
+    # A reescrita troca o arquivo (os.replace); sem registros expirados ele é mantido
+    assert os.stat(path).st_ino == before
+    assert len(segments.load()) == 2
+
+
+def test_compact_rewrites_segment_with_invalid_lines(segments):
+    segments.append_many([record(DAY1), record(DAY1 + MINUTE)])
+    segments.close()
+    with open(segments.segment_path('20240101'), 'a') as f:
+        f.write('{"timestamp": 17')
+
+    assert len(segments.load()) == 2
+    segments.compact()
+
+    with open(segments.segment_path('20240101')) as f:
+        assert len(f.read().splitlines()) == 2
+
+
+def test_legacy_file_is_migrated(tmp_path):
+    legacy = tmp_path / 'history.json'
+    legacy.write_text('[{"timestamp": %d, "download": 2.0}, {"timestamp": %d, "download": 1.0}]'
+                      % (DAY2, DAY1))
+    store = SegmentLogStore(str(tmp_path / 'history'), legacy_file=str(legacy))
+
+    assert [r['timestamp'] for r in store.load()] == [DAY1, DAY2]
+    assert not legacy.exists()
+    assert (tmp_path / 'history.json.migrated').exists()
+    store.close()
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    store = SqliteHistoryStore(str(tmp_path / 'history.db'), batch_size=3)
+    yield store
+    store.close()
+
+
+def test_sqlite_range_is_half_open(sqlite_store):
+    sqlite_store.append_many([record(DAY1 + i * MINUTE, download=i) for i in range(5)])
+
+    result = sqlite_store.query_range(DAY1 + MINUTE, DAY1 + 3 * MINUTE)
+    assert [r['timestamp'] for r in result] == [DAY1 + MINUTE, DAY1 + 2 * MINUTE]
+    assert len(sqlite_store.query_range(DAY1)) == 5
+    assert sqlite_store.query_range(DAY1 + 5 * MINUTE) == []
+
+
+def test_sqlite_queries_include_pending_batch(sqlite_store):
+    # Dois registros ficam abaixo do batch_size e ainda não foram gravados
+    sqlite_store.append_many([record(DAY1), record(DAY1 + MINUTE)])
+    assert sqlite_store._pending
+
+    assert len(sqlite_store.query_range(DAY1)) == 2
+    assert [r['timestamp'] for r in sqlite_store.tail(1)] == [DAY1 + MINUTE]
+
+
+def test_sqlite_iter_range_crosses_chunks_with_equal_timestamps(sqlite_store):
+    records = [record(DAY1 + (i // 2) * MINUTE) for i in range(7)]
+    sqlite_store.append_many(records)
+
+    assert [r['timestamp'] for r in sqlite_store.iter_range(DAY1, chunk_size=3)] == \
+        [r['timestamp'] for r in records]
+
+
+def test_sqlite_summary(sqlite_store):
+    sqlite_store.append_many([
+        dict(record(DAY1, download=2.0), totalDownload=10),
+        dict(record(DAY1 + MINUTE, download=4.0), totalDownload=20),
+        dict(record(DAY2, download=100.0), totalDownload=30)
+    ])
+
+    summary = sqlite_store.summary(DAY1, DAY2)
+    assert summary['avgDownload'] == 3.0
+    assert summary['totalDownload'] == 20
+    assert sqlite_store.summary(DAY3)['avgDownload'] == 0
+
+
+def test_sqlite_drop_expired_and_compact(sqlite_store):
+    sqlite_store.append_many([record(DAY1), record(DAY2), record(DAY2 + MINUTE), record(DAY3)])
+
+    assert sqlite_store.drop_expired(DAY2 + MINUTE) == 2
+    sqlite_store.compact(DAY2 + MINUTE)
+    assert [r['timestamp'] for r in sqlite_store.query_range(0)] == [DAY2 + MINUTE, DAY3]
+    assert os.path.getsize(sqlite_store.path + '-wal') == 0
+
+
+def test_sqlite_snapshot_ignores_later_writes(sqlite_store):
+    sqlite_store.append_many([record(DAY1 + i * MINUTE, download=i) for i in range(4)])
+
+    with sqlite_store.snapshot(DAY1, DAY2, chunk_size=2) as snapshot:
+        sqlite_store.append_many([record(DAY1 + 10 * MINUTE, download=50)] * 3)
+        stats = snapshot.stats()
+        records = list(snapshot)
+
+    assert stats['count'] == 4
+    assert stats['first'] == DAY1
+    assert stats['last'] == DAY1 + 3 * MINUTE
+    assert stats['maxDownload'] == 3
+    assert [r['download'] for r in records] == [0, 1, 2, 3]
+    assert len(sqlite_store.query_range(DAY1, DAY2)) == 7
+
+
+def test_sqlite_imports_existing_segments(tmp_path):
+    segments = SegmentLogStore(str(tmp_path / 'history'))
+    segments.append_many([record(DAY1), record(DAY2)])
+    segments.close()
+
+    store = SqliteHistoryStore(str(tmp_path / 'history.db'), segments_dir=str(tmp_path / 'history'))
+    assert store.load() == []
+    assert [r['timestamp'] for r in store.query_range(0)] == [DAY1, DAY2]
+    store.close()
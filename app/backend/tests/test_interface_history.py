@@ -0,0 +1,71 @@
+"""Séries por interface e escolha das interfaces monitoradas"""
+
+import pytest
+
+import app as monitor
+from interface_history import InterfaceSeries
+
+MINUTE = 60 * 1000
+BASE = 1704067200000
+
+
+def record(minute, interface, download, total=0):
+    return {'timestamp': BASE + minute * MINUTE, 'interface': interface, 'download': download,
+            'upload': download / 2, 'totalDownload': total, 'totalUpload': total / 2}
+
+
+@pytest.fixture
+def series(tmp_path):
+    series = InterfaceSeries(str(tmp_path / 'interfaces.db'))
+    series.append_many([record(minute, name, float(minute), total=100 * minute)
+                        for minute in range(10) for name in ('eth0', 'wlan0')])
+    series.append_many([record(10, 'eth0', 10.0, total=1000)])
+    yield series
+    series.close()
+
+
+def test_query_range_filters_by_interface(series):
+    records = series.query_range('wlan0', BASE + 2 * MINUTE, BASE + 4 * MINUTE)
+
+    assert [record['timestamp'] for record in records] == [BASE + 2 * MINUTE, BASE + 3 * MINUTE]
+    assert records[1]['download'] == 3.0
+    assert records[1]['ping'] == 0
+
+
+def test_aggregate_and_summary(series):
+    buckets = series.aggregate('eth0', 5 * MINUTE, BASE)
+
+    assert [bucket['samples'] for bucket in buckets] == [5, 5, 1]
+    assert (buckets[0]['download'], buckets[0]['downloadMin'], buckets[0]['downloadMax']) == (2.0, 0.0, 4.0)
+    assert buckets[1]['totalDownload'] == 900
+
+    summary = series.summary('wlan0', BASE + 5 * MINUTE)
+    assert summary == {'avgDownload': 7.0, 'avgUpload': 3.5, 'totalDownload': 900, 'totalUpload': 450}
+
+
+def test_latest_and_interfaces(series):
+    latest = series.latest()
+
+    assert latest['eth0']['lastUpdate'] == (BASE + 10 * MINUTE) / 1000
+    assert latest['wlan0']['download'] == 9.0
+    assert series.interfaces() == ['eth0', 'wlan0']
+    assert series.interfaces(BASE + 10 * MINUTE) == ['eth0']
+
+    assert series.drop_expired(BASE + 10 * MINUTE) == 20
+    assert series.interfaces() == ['eth0']
+
+
+def test_monitored_interfaces_precedence(monkeypatch):
+    config = monitor.state['config']
+    monkeypatch.setitem(config, 'selectedInterface', 'eth0')
+    monkeypatch.setitem(config, 'monitoredInterfaces', [])
+    assert monitor.monitored_interfaces() == ['eth0']
+
+    # monitoredInterfaces vale sobre selectedInterface; uma interface explícita vale sobre ambas
+    monkeypatch.setitem(config, 'monitoredInterfaces', ['eth1', 'wlan0'])
+    assert monitor.monitored_interfaces() == ['eth1', 'wlan0']
+    assert monitor.monitored_interfaces('eth2') == ['eth2']
+
+    monkeypatch.setitem(config, 'monitoredInterfaces', [])
+    monkeypatch.setitem(config, 'selectedInterface', '')
+    assert monitor.monitored_interfaces() == ['']
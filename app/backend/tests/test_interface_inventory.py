@@ -0,0 +1,102 @@
+"""Inventário de interfaces em cache, refeito apenas quando algo muda"""
+
+import time
+
+import app as monitor
+import interface_inventory
+from interface_inventory import InterfaceInventory
+
+TIMEOUT = 5
+
+
+class Discovery:
+    """discover() controlado pelo teste; conta as chamadas"""
+
+    def __init__(self, interfaces):
+        self.interfaces = interfaces
+        self.calls = 0
+        self.error = None
+
+    def __call__(self):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return list(self.interfaces)
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + TIMEOUT
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_interfaces_are_served_from_memory():
+    discover = Discovery([{'name': 'eth0', 'ip': '10.0.0.2'}])
+    inventory = InterfaceInventory(discover=discover)
+    inventory.refresh()
+
+    for _ in range(3):
+        assert inventory.interfaces() == [{'name': 'eth0', 'ip': '10.0.0.2'}]
+    assert discover.calls == 1
+    assert inventory.stats()['refreshes'] == 1
+
+
+def test_failed_discovery_keeps_previous_list():
+    discover = Discovery([{'name': 'eth0', 'ip': '10.0.0.2'}])
+    inventory = InterfaceInventory(discover=discover)
+    inventory.refresh()
+
+    discover.error = OSError('sem permissão')
+    inventory.refresh()
+    assert inventory.interfaces() == [{'name': 'eth0', 'ip': '10.0.0.2'}]
+
+    # Sem lista anterior: interface genérica
+    empty = InterfaceInventory(discover=discover)
+    empty.refresh()
+    assert empty.interfaces() == [{'name': 'unknown', 'ip': '127.0.0.1'}]
+
+
+def test_polling_refreshes_only_when_signature_changes(monkeypatch):
+    signature = ['eth0', 'up']
+    monkeypatch.setattr(interface_inventory, 'interface_signature', lambda: tuple(signature))
+    monkeypatch.setattr(InterfaceInventory, '_open_netlink', lambda self: None)
+    discover = Discovery([{'name': 'eth0', 'ip': '10.0.0.2'}])
+    inventory = InterfaceInventory(check_interval=0.02, discover=discover)
+
+    inventory.start()
+    try:
+        time.sleep(0.2)
+        assert discover.calls == 1
+        assert inventory.stats()['source'] == 'poll'
+
+        signature[1] = 'down'
+        discover.interfaces = []
+        wait_for(lambda: discover.calls == 2)
+        assert inventory.interfaces() == []
+    finally:
+        inventory.stop()
+
+
+def test_ttl_forces_a_new_discovery(monkeypatch):
+    monkeypatch.setattr(interface_inventory, 'interface_signature', lambda: ())
+    monkeypatch.setattr(InterfaceInventory, '_open_netlink', lambda self: None)
+    discover = Discovery([])
+    inventory = InterfaceInventory(check_interval=0.02, ttl=0.1, discover=discover)
+
+    inventory.start()
+    try:
+        wait_for(lambda: discover.calls >= 3)
+    finally:
+        inventory.stop()
+
+
+def test_interfaces_endpoint_reads_the_inventory(monkeypatch):
+    inventory = InterfaceInventory(discover=Discovery([{'name': 'wlan0', 'ip': '192.168.0.5'}]))
+    inventory.refresh()
+    monkeypatch.setitem(monitor.state, 'interface_inventory', inventory)
+
+    data = monitor.app.test_client().get('/api/interfaces').get_json()
+
+    assert data['interfaces'] == [{'name': 'wlan0', 'ip': '192.168.0.5'}]
+    assert data['inventory']['refreshes'] == 1
@@ -0,0 +1,116 @@
+"""Sondas de latência: alvos, resumo por minuto e servidor de eco local"""
+
+import asyncio
+import socket
+from array import array
+
+import pytest
+
+from history_rollups import LATENCY_BUCKETS, histogram_percentile, latency_bucket
+from latency_history import LatencySeries
+from latency_probe import (LatencyProber, EchoServer, TargetMinute, parse_target, summarize,
+                           ALL_TARGETS, DEFAULT_ECHO_BIND)
+
+MINUTE = 60 * 1000
+BASE = 1704067200000
+
+
+def free_port():
+    # Porta livre em UDP e TCP para o servidor de eco
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp, socket.socket() as tcp:
+        udp.bind(('127.0.0.1', 0))
+        port = udp.getsockname()[1]
+        tcp.bind(('127.0.0.1', port))
+    return port
+
+
+@pytest.fixture
+def echo():
+    server = EchoServer(port=free_port())
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.mark.parametrize('spec, parsed', [
+    ('tcp://1.1.1.1:443', ('tcp', '1.1.1.1', 443)),
+    ('UDP://[::1]:7007', ('udp', '::1', 7007)),
+    ('example.com:80', ('tcp', 'example.com', 80)),
+])
+def test_parse_target(spec, parsed):
+    assert parse_target(spec) == parsed
+
+
+@pytest.mark.parametrize('spec', ['icmp://1.1.1.1:0', 'tcp://1.1.1.1', 'tcp://:443', 'tcp://host:http'])
+def test_parse_target_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_target(spec)
+
+
+def test_target_minute_jitter_and_summary():
+    minute = TargetMinute()
+    for rtt in (10.0, None, 14.0, 12.0):
+        minute.add(rtt)
+
+    assert minute.lost == 1
+    assert minute.jitter_sum / minute.jitter_count == 3.0
+    row = summarize('tcp://host:1', minute.rtts, minute.lost, 3.0)
+    assert row['samples'] == 4
+    assert row['loss'] == 25.0
+    assert row['rtt'] == 12.0
+    assert (row['rttMin'], row['rttMax'], row['p50']) == (10.0, 14.0, 12.0)
+    assert summarize('tcp://host:1', [], 2, 0.0)['rtt'] is None
+
+
+def test_latency_histogram_percentile_is_close():
+    histogram = [0] * LATENCY_BUCKETS
+    for rtt in range(1, 101):
+        histogram[latency_bucket(float(rtt))] += 1
+
+    # Buckets de 15%: o percentil aproximado fica a menos de 8% do exato
+    assert histogram_percentile(histogram, 0.50) == pytest.approx(50, rel=0.08)
+    assert histogram_percentile(histogram, 0.95) == pytest.approx(95, rel=0.08)
+    assert latency_bucket(10 ** 9) == LATENCY_BUCKETS - 1
+
+
+def test_echo_server_binds_loopback_by_default():
+    assert EchoServer().host == DEFAULT_ECHO_BIND == '127.0.0.1'
+
+
+def test_round_against_local_echo_server(echo):
+    minutes = []
+    prober = LatencyProber(lambda: {}, on_minute=lambda *args: minutes.append(args))
+    config = {'latencyTargets': [f'udp://127.0.0.1:{echo.port}', f'tcp://127.0.0.1:{echo.port}',
+                                 'bogus://x:1'],
+              'latencyCount': 2, 'latencyTimeout': 1.0}
+
+    asyncio.run(prober._round(config))
+
+    assert set(prober.latest) == {f'udp://127.0.0.1:{echo.port}', f'tcp://127.0.0.1:{echo.port}'}
+    assert all(stats['lost'] == 0 for stats in prober.latest.values())
+    assert prober.ping is not None
+
+    prober._close_minute()
+    (timestamp, rows, histogram), = minutes
+    assert timestamp % MINUTE == 0
+    assert rows[-1]['target'] == ALL_TARGETS
+    assert rows[-1]['samples'] == 4
+    assert sum(histogram) == 4
+
+
+def test_series_iterates_histograms_in_chunks(tmp_path):
+    series = LatencySeries(str(tmp_path / 'latency.db'))
+    try:
+        histogram = array('q', bytes(8 * LATENCY_BUCKETS))
+        for minute in range(5):
+            histogram[minute] = 1
+            rows = [summarize(target, [1.0], 0, 0.0) for target in ('tcp://a:1', ALL_TARGETS)]
+            series.append_minute(BASE + minute * MINUTE, rows, histogram)
+
+        read = list(series.iter_histograms(BASE + MINUTE, chunk_size=2))
+
+        assert [timestamp for timestamp, _ in read] == [BASE + minute * MINUTE for minute in range(1, 5)]
+        assert sum(read[-1][1]) == 5
+        assert series.targets() == [ALL_TARGETS, 'tcp://a:1']
+    finally:
+        series.close()
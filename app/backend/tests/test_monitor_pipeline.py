@@ -0,0 +1,90 @@
+"""Fila entre a amostragem e a gravação do histórico"""
+
+import pytest
+
+from monitor_pipeline import SamplePipeline, MinuteAccumulator, Sample
+
+
+def put(pipeline, second, download=1.0):
+    return pipeline.put(second, download, 0.5, 10.0, 100 * second, 50 * second)
+
+
+def test_drain_returns_samples_in_order():
+    pipeline = SamplePipeline()
+    for second in range(5):
+        assert put(pipeline, second, download=float(second))
+
+    samples = pipeline.drain(timeout=0)
+
+    assert [sample.download for sample in samples] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert samples[2].totalDownload == 200
+    stats = pipeline.stats()
+    assert (stats['enqueued'], stats['processed'], stats['batches'], stats['queued']) == (5, 5, 1, 0)
+
+
+def test_drain_is_limited_to_max_items():
+    pipeline = SamplePipeline()
+    for second in range(5):
+        put(pipeline, second)
+
+    assert len(pipeline.drain(max_items=3, timeout=0)) == 3
+    assert len(pipeline.drain(max_items=3, timeout=0)) == 2
+    assert pipeline.drain(timeout=0.01) == []
+
+
+def test_full_queue_drops_without_blocking():
+    pipeline = SamplePipeline(maxsize=2)
+
+    results = [put(pipeline, second) for second in range(4)]
+
+    assert results == [True, True, False, False]
+    assert pipeline.stats()['dropped'] == 2
+    assert [sample.time for sample in pipeline.drain(timeout=0)] == [0, 1]
+
+
+def test_slow_consumer_is_reported_as_delayed(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('monitor_pipeline.time.monotonic', lambda: now[0])
+    pipeline = SamplePipeline(delay_threshold=1.0)
+    put(pipeline, 0)
+    now[0] += 0.5
+    put(pipeline, 1)
+    now[0] += 1.0
+
+    pipeline.drain(timeout=0)
+
+    stats = pipeline.stats()
+    assert stats['delayed'] == 1
+    assert stats['maxLatency'] == pytest.approx(1.5)
+
+
+# Registros por minuto alinhados ao relógio de parede
+
+MINUTE_START = 1704067200.0
+
+
+def sample(offset, download, total=0):
+    return Sample(MINUTE_START + offset, download, download / 2, 10.0, total, total // 2, 0.0)
+
+
+def test_accumulator_closes_minute_on_the_grid():
+    accumulator = MinuteAccumulator()
+
+    assert accumulator.add(sample(0.4, 2.0, total=10)) is None
+    assert accumulator.add(sample(59.9, 4.0, total=20)) is None
+    record = accumulator.add(sample(61.2, 8.0, total=30))
+
+    assert record == {'timestamp': int(MINUTE_START * 1000), 'download': 3.0, 'upload': 1.5,
+                      'ping': 10.0, 'totalDownload': 20, 'totalUpload': 10}
+    assert accumulator.flush()['timestamp'] == int((MINUTE_START + 60) * 1000)
+    assert accumulator.flush() is None
+
+
+def test_accumulator_skips_empty_minutes():
+    accumulator = MinuteAccumulator()
+    accumulator.add(sample(5, 1.0))
+
+    record = accumulator.add(sample(185, 1.0))
+
+    assert record['timestamp'] == int(MINUTE_START * 1000)
+    assert accumulator.flush()['timestamp'] == int((MINUTE_START + 180) * 1000)
@@ -0,0 +1,108 @@
+"""Leitura e diferença dos contadores de /proc/net/dev"""
+
+from net_counters import CounterReader, InterfaceSampler, parse_proc_net_dev, counter_delta
+
+HEADER = (
+    b'Inter-|   Receive                                                |  Transmit\n'
+    b' face |bytes    packets errs drop fifo frame compressed multicast|'
+    b'bytes    packets errs drop fifo colls carrier compressed\n'
+)
+
+
+def proc_net_dev(counters):
+    lines = [f'{name:>6}: {rx} 10 0 0 0 0 0 0 {tx} 20 0 0 0 0 0 0\n'.encode()
+             for name, (rx, tx) in counters.items()]
+    return HEADER + b''.join(lines)
+
+
+def test_parse_proc_net_dev():
+    data = HEADER + (
+        b'    lo: 1234567     100    0    0    0     0          0         0  1234567     100    0    0    0     0       0          0\n'
+        b'  eth0: 98765432109 5000  0    2    0     0          0        15 123456789 4000    0    0    0     0       0          0\n'
+    )
+    assert parse_proc_net_dev(data) == {'lo': (1234567, 1234567), 'eth0': (98765432109, 123456789)}
+
+
+def test_parse_counters_glued_to_interface_name():
+    # Com contadores grandes o kernel não deixa espaço após os dois pontos
+    data = HEADER + b'enp3s0:18446744073709551615 1 0 0 0 0 0 0 42 1 0 0 0 0 0 0\n'
+    assert parse_proc_net_dev(data) == {'enp3s0': (2 ** 64 - 1, 42)}
+
+
+def test_parse_skips_header_and_short_lines():
+    data = HEADER + b' wlan0: 1 2 3\n\nbogus line\n  eth1: 5 0 0 0 0 0 0 0 7 0 0 0 0 0 0 0'
+    assert parse_proc_net_dev(data) == {'eth1': (5, 7)}
+    assert parse_proc_net_dev(HEADER) == {}
+    assert parse_proc_net_dev(b'') == {}
+
+
+def test_counter_delta():
+    assert counter_delta(100, 150) == 50
+    assert counter_delta(100, 100) == 0
+    # Retorno a zero de contadores de 32 e de 64 bits
+    assert counter_delta(2 ** 32 - 10, 5) == 15
+    assert counter_delta(2 ** 64 - 10, 5) == 15
+    assert counter_delta(3_000_000_000, 1000) == 2 ** 32 - 3_000_000_000 + 1000
+    # Queda grande demais: contador reiniciado (ex.: interface recriada)
+    assert counter_delta(1_000_000_000, 1000) == 1000
+
+
+def test_sampler_reads_file_and_computes_deltas(tmp_path):
+    path = tmp_path / 'dev'
+    path.write_bytes(proc_net_dev({'lo': (0, 0), 'eth0': (1000, 500), 'eth1': (0, 0)}))
+    sampler = InterfaceSampler(reader=CounterReader(str(path)))
+    try:
+        totals, per_interface = sampler.sample_all()
+        assert totals == (0.0, 0.0, 0, 0)
+        assert set(per_interface) == {'eth0', 'eth1'}
+
+        path.write_bytes(proc_net_dev({'lo': (10 ** 6, 10 ** 6), 'eth0': (3000, 600), 'eth1': (100, 0)}))
+        totals, per_interface = sampler.sample_all()
+        assert totals[2:] == (2100, 100)
+        assert per_interface['eth0'][2:] == (2000, 100)
+        assert totals[0] > 0
+    finally:
+        sampler.close()
+
+
+def test_sampler_falls_back_for_one_read_when_interface_is_missing(tmp_path):
+    path = tmp_path / 'dev'
+    path.write_bytes(proc_net_dev({'eth0': (0, 0), 'eth1': (0, 0)}))
+    sampler = InterfaceSampler('wlan0', reader=CounterReader(str(path)))
+    try:
+        _, per_interface = sampler.sample_all()
+        assert set(per_interface) == {'eth0', 'eth1'}
+
+        path.write_bytes(proc_net_dev({'eth0': (10, 0), 'eth1': (0, 0), 'wlan0': (0, 0)}))
+        _, per_interface = sampler.sample_all()
+        assert set(per_interface) == set()
+        assert sampler._missing is False
+
+        path.write_bytes(proc_net_dev({'eth0': (20, 0), 'wlan0': (70, 0)}))
+        totals, per_interface = sampler.sample_all()
+        assert set(per_interface) == {'wlan0'}
+        assert totals[2] == 70
+    finally:
+        sampler.close()
+
+
+def test_sampler_sums_a_list_of_interfaces(tmp_path):
+    path = tmp_path / 'dev'
+    path.write_bytes(proc_net_dev({'eth0': (0, 0), 'eth1': (0, 0), 'wlan0': (0, 0)}))
+    sampler = InterfaceSampler(['eth0', 'auto', 'wlan0'], reader=CounterReader(str(path)))
+    try:
+        assert sampler.interface == 'eth0,wlan0'
+        sampler.sample_all()
+
+        path.write_bytes(proc_net_dev({'eth0': (400, 40), 'eth1': (9000, 0), 'wlan0': (100, 10)}))
+        totals, per_interface = sampler.sample_all()
+        assert totals[2:] == (500, 50)
+        assert {name: values[2:] for name, values in per_interface.items()} == {
+            'eth0': (400, 40), 'wlan0': (100, 10)}
+    finally:
+        sampler.close()
+
+
+def test_sampler_auto_interfaces():
+    assert InterfaceSampler('auto', reader=CounterReader('/nonexistent')).interfaces is None
+    assert InterfaceSampler(['', 'default'], reader=CounterReader('/nonexistent')).interfaces is None
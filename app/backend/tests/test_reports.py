@@ -0,0 +1,104 @@
+"""Exportação do histórico em CSV"""
+
+import csv
+import datetime
+
+import pytest
+
+import app as monitor
+from history_columns import HistoryColumns
+from history_store import SqliteHistoryStore
+
+MINUTE = 60 * 1000
+BASE = 1704067200000
+HEADER = ['dataHora', 'timestamp', 'download', 'upload', 'ping', 'totalDownload', 'totalUpload']
+
+
+def records(count):
+    return [{'timestamp': BASE + i * MINUTE, 'download': float(i), 'upload': i / 2, 'ping': 10.0 + i,
+             'totalDownload': 1000 * i, 'totalUpload': 500 * i} for i in range(count)]
+
+
+def moment(minute):
+    return datetime.datetime.fromtimestamp((BASE + minute * MINUTE) / 1000)
+
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        return list(csv.reader(f))
+
+
+@pytest.fixture
+def reports_dir(tmp_path, monkeypatch):
+    directory = tmp_path / 'reports'
+    directory.mkdir()
+    monkeypatch.setattr(monitor, 'REPORTS_DIR', str(directory))
+    monkeypatch.setitem(monitor.state, 'history', HistoryColumns(records(30)))
+    monkeypatch.setitem(monitor.state, 'history_store', None)
+    return directory
+
+
+def test_csv_without_period_exports_recent_entries(reports_dir):
+    result = monitor.generate_csv_report('recent')
+
+    assert result['success']
+    assert result['filename'] == 'recent.csv'
+    assert result['url'] == '/api/reports/download/recent.csv'
+    rows = read_csv(result['path'])
+    assert rows[0] == HEADER
+    assert len(rows) == 1 + monitor.REPORT_RECENT_ENTRIES
+    assert int(rows[-1][1]) == BASE + 29 * MINUTE
+
+
+def test_csv_rows_for_period(reports_dir):
+    period = ('custom', moment(5), moment(8))
+
+    rows = read_csv(monitor.generate_csv_report('period', period)['path'])
+
+    # Início incluído, fim excluído
+    assert [int(row[1]) for row in rows[1:]] == [BASE + minute * MINUTE for minute in (5, 6, 7)]
+    assert rows[1] == [moment(5).isoformat(timespec='seconds'), str(BASE + 5 * MINUTE),
+                       '5.0', '2.5', '15.0', '5000.0', '2500.0']
+
+
+def test_csv_from_sqlite_snapshot(reports_dir, tmp_path, monkeypatch):
+    store = SqliteHistoryStore(str(tmp_path / 'history.db'))
+    store.append_many(records(30))
+    monkeypatch.setitem(monitor.state, 'history_store', store)
+    try:
+        rows = read_csv(monitor.generate_csv_report('sqlite', ('custom', moment(0), moment(30)))['path'])
+    finally:
+        store.close()
+
+    assert rows[0] == HEADER
+    assert len(rows) == 31
+    assert rows[-1][2:] == ['29.0', '14.5', '39.0', '29000.0', '14500.0']
+
+
+def test_csv_empty_period(reports_dir):
+    rows = read_csv(monitor.generate_csv_report('empty', ('custom', moment(100), moment(200)))['path'])
+    assert rows == [HEADER]
+
+
+def test_reports_endpoint_generates_csv(reports_dir):
+    client = monitor.app.test_client()
+
+    response = client.post('/api/reports', query_string={
+        'type': 'csv', 'start': BASE + 10 * MINUTE, 'end': BASE + 20 * MINUTE})
+    report = response.get_json()['report']
+    assert report['filename'].endswith('_custom.csv')
+    assert len(read_csv(reports_dir / report['filename'])) == 11
+
+    download = client.get(report['url'])
+    assert download.status_code == 200
+    assert download.get_data().decode().splitlines()[0] == ','.join(HEADER)
+    download.close()
+
+
+def test_reports_endpoint_rejects_invalid_period(reports_dir):
+    client = monitor.app.test_client()
+
+    response = client.post('/api/reports', query_string={
+        'type': 'csv', 'start': BASE + 20 * MINUTE, 'end': BASE + 10 * MINUTE})
+    assert response.status_code == 400
+    assert list(reports_dir.iterdir()) == []
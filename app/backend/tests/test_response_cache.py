@@ -0,0 +1,155 @@
+"""Cache de respostas codificadas: ETag, 304 e negociação de compressão"""
+
+import gzip
+
+import pytest
+
+import app as monitor
+from response_cache import (ResponseCache, make_entry, entry_variant, supported_encodings,
+                            BROTLI_AVAILABLE, COMPRESS_MIN_SIZE)
+
+LARGE_BODY = '{"history": [%s]}' % ', '.join(['{"download": 12.5, "upload": 3.25}'] * 200)
+
+
+@pytest.fixture
+def client():
+    monitor.state['response_cache'].invalidate()
+    return monitor.app.test_client()
+
+
+def test_cache_hit_requires_same_key():
+    cache = ResponseCache()
+    entry = cache.put(('history', 'day'), 1, '{"a": 1}')
+
+    assert cache.get(('history', 'day'), 1) is entry
+    assert cache.get(('history', 'day'), 2) is None
+    assert cache.get(('history', 'week'), 1) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_cache_evicts_oldest_entry():
+    cache = ResponseCache(max_entries=2)
+    cache.put(('a',), 1, 'a')
+    cache.put(('b',), 1, 'b')
+    cache.put(('a',), 2, 'a2')
+    cache.put(('c',), 1, 'c')
+
+    assert cache.get(('a',), 2) is not None
+    assert cache.get(('b',), 1) is None
+    assert cache.get(('c',), 1) is not None
+
+
+def test_invalidate_by_prefix():
+    cache = ResponseCache()
+    cache.put(('history', 'day'), 1, 'h')
+    cache.put(('status', None), 1, 's')
+
+    cache.invalidate('history')
+    assert cache.get(('history', 'day'), 1) is None
+    assert cache.get(('status', None), 1) is not None
+    cache.invalidate()
+    assert cache.get(('status', None), 1) is None
+
+
+def test_etag_depends_only_on_body():
+    assert make_entry(1, '{"a": 1}').etag == make_entry(2, b'{"a": 1}').etag
+    assert make_entry(1, '{"a": 1}').etag != make_entry(1, '{"a": 2}').etag
+
+
+def test_cached_response_sets_etag_and_answers_304():
+    entry = make_entry(1, '{"success": true}')
+
+    with monitor.app.test_request_context():
+        response = monitor.cached_response(entry)
+    assert response.status_code == 200
+    assert response.get_etag() == (entry.etag, False)
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert response.get_data() == entry.body
+
+    with monitor.app.test_request_context(headers={'If-None-Match': f'"{entry.etag}"'}):
+        response = monitor.cached_response(entry)
+    assert response.status_code == 304
+
+    with monitor.app.test_request_context(headers={'If-None-Match': '"outra-versao"'}):
+        assert monitor.cached_response(entry).status_code == 200
+
+
+def test_status_endpoint_revalidates_until_state_changes(client, monkeypatch):
+    first = client.get('/api/status')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    not_modified = client.get('/api/status', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b''
+
+    monkeypatch.setitem(monitor.state['current'], 'download', 42.0)
+    monitor.state['broadcaster'].publish({'download': 42.0})
+    changed = client.get('/api/status', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_supported_encodings_follow_brotli_availability():
+    assert supported_encodings() == (['br', 'gzip'] if BROTLI_AVAILABLE else ['gzip'])
+
+
+def test_small_bodies_are_not_compressed():
+    entry = make_entry(1, 'x' * (COMPRESS_MIN_SIZE - 1))
+    assert entry_variant(entry, 'gzip') == (entry.body, None)
+    assert entry_variant(make_entry(1, LARGE_BODY), None)[1] is None
+
+
+def test_gzip_variant_is_built_once():
+    entry = make_entry(1, LARGE_BODY)
+
+    body, encoding = entry_variant(entry, 'gzip')
+    assert encoding == 'gzip'
+    assert gzip.decompress(body) == entry.body
+    assert len(body) < len(entry.body)
+    assert entry_variant(entry, 'gzip')[0] is body
+
+
+def request_variant(entry, headers):
+    with monitor.app.test_request_context(headers=headers):
+        return monitor.cached_response(entry)
+
+
+def test_cached_response_negotiates_gzip():
+    entry = make_entry(1, LARGE_BODY)
+
+    response = request_variant(entry, {'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == entry.body
+    assert response.get_etag() == (f'{entry.etag}-gzip', False)
+    assert 'Accept-Encoding' in response.vary
+
+    identity = request_variant(entry, {})
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.get_data() == entry.body
+    assert 'Accept-Encoding' in identity.vary
+
+    refused = request_variant(entry, {'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in refused.headers
+
+
+def test_etag_is_per_representation():
+    entry = make_entry(1, LARGE_BODY)
+
+    gzip_match = request_variant(entry, {'Accept-Encoding': 'gzip', 'If-None-Match': f'"{entry.etag}-gzip"'})
+    assert gzip_match.status_code == 304
+    # ETag da versão sem compressão não valida a versão gzip
+    identity_etag = request_variant(entry, {'Accept-Encoding': 'gzip', 'If-None-Match': f'"{entry.etag}"'})
+    assert identity_etag.status_code == 200
+
+
+def test_cached_response_prefers_brotli():
+    brotli = pytest.importorskip('brotli')
+    entry = make_entry(1, LARGE_BODY)
+
+    response = request_variant(entry, {'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.get_data()) == entry.body
+    assert response.get_etag() == (f'{entry.etag}-br', False)
+
+    assert request_variant(entry, {'Accept-Encoding': 'gzip'}).headers['Content-Encoding'] == 'gzip'
@@ -0,0 +1,110 @@
+"""Agendamento do laço de amostragem em prazos absolutos"""
+
+import pytest
+
+from scheduler import TickScheduler, MISSED_SKIP, MISSED_CATCHUP
+
+WALL_START = 1704067200.25
+
+
+class FakeClock:
+    """Relógios monotônico e de parede controlados pelo teste"""
+
+    def __init__(self, start=100.0):
+        self.now = start
+        self.start = start
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def wall(self):
+        return WALL_START + (self.now - self.start)
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def work(self, seconds):
+        self.now += seconds
+
+
+def scheduler(clock, interval=1.0, **kwargs):
+    return TickScheduler(interval, clock=clock.monotonic, wall_clock=clock.wall, sleep=clock.sleep, **kwargs)
+
+
+def test_first_tick_is_aligned_to_the_interval():
+    clock = FakeClock()
+
+    tick = scheduler(clock).wait()
+
+    assert tick == pytest.approx(WALL_START + 0.75)
+    assert tick % 1.0 == pytest.approx(0.0)
+
+
+def test_work_time_does_not_shift_later_ticks():
+    clock = FakeClock()
+    ticks = scheduler(clock, align=False)
+
+    scheduled = []
+    for work in (0.3, 0.7, 0.1, 0.9):
+        scheduled.append(ticks.wait())
+        clock.work(work)
+
+    assert scheduled == pytest.approx([WALL_START + n for n in range(4)])
+    assert ticks.stats()['jitterMaxMs'] == pytest.approx(0.0)
+
+
+def test_long_waits_sleep_in_slices():
+    clock = FakeClock()
+    ticks = scheduler(clock, interval=2.0, align=False)
+    ticks.wait()
+
+    ticks.wait()
+
+    assert max(clock.sleeps) <= 0.5
+    assert sum(clock.sleeps) == pytest.approx(2.0)
+
+
+def test_overrun_skips_missed_ticks():
+    clock = FakeClock()
+    ticks = scheduler(clock, missed=MISSED_SKIP, align=False)
+    ticks.wait()
+    clock.work(3.5)
+
+    late = ticks.wait()
+    following = ticks.wait()
+
+    # O ciclo atrasado ainda é entregue; os perdidos até agora são pulados
+    assert late == pytest.approx(WALL_START + 1)
+    assert following == pytest.approx(WALL_START + 4)
+    stats = ticks.stats()
+    assert stats['skipped'] == 2
+    assert stats['late'] == 1
+    assert stats['jitterMaxMs'] == pytest.approx(2500.0)
+
+
+def test_catchup_delivers_every_missed_tick():
+    clock = FakeClock()
+    ticks = scheduler(clock, missed=MISSED_CATCHUP, align=False)
+    ticks.wait()
+    clock.work(3.5)
+
+    scheduled = [ticks.wait() for _ in range(4)]
+
+    assert scheduled == pytest.approx([WALL_START + n for n in (1, 2, 3, 4)])
+    assert clock.sleeps == [pytest.approx(0.5)]
+    assert ticks.stats()['skipped'] == 0
+
+
+def test_unknown_policy_falls_back_to_skip():
+    assert scheduler(FakeClock(), missed='whatever').missed == MISSED_SKIP
+
+
+def test_stop_request_interrupts_the_wait():
+    clock = FakeClock()
+    ticks = scheduler(clock, interval=5.0, align=False)
+    ticks.wait()
+
+    assert ticks.wait(should_stop=lambda: len(clock.sleeps) >= 2) is None
+    assert ticks.ticks == 1
@@ -0,0 +1,95 @@
+"""Seqlock do status compartilhado entre processos"""
+
+import time
+from threading import Thread, Event
+
+import pytest
+
+from shared_state import SharedStatus, SHARED_MEMORY_AVAILABLE, SEQ
+
+pytestmark = pytest.mark.skipif(not SHARED_MEMORY_AVAILABLE,
+                                reason='multiprocessing.shared_memory indisponível')
+
+
+@pytest.fixture
+def status():
+    status = SharedStatus.create()
+    yield status
+    status.close()
+
+
+def test_read_initial_block(status):
+    values = status.read()
+    assert values['version'] == 0
+    assert values['historyVersion'] == 0
+    assert values['current']['download'] == 0.0
+    assert values['current']['lastUpdate'] == 0.0
+    assert values['monitoring'] is False
+    assert values['ready'] is False
+
+
+def test_publish_then_read(status):
+    status.publish({'download': 12.5, 'upload': 3.25, 'ping': 18.0, 'totalDownload': 1000,
+                    'totalUpload': 200, 'lastUpdate': 1700000000000}, monitoring=True)
+    status.publish_history(7)
+    status.set_ready()
+
+    values = status.read()
+    assert values['version'] == 1
+    assert values['historyVersion'] == 7
+    assert values['current'] == {'download': 12.5, 'upload': 3.25, 'ping': 18.0,
+                                 'totalDownload': 1000.0, 'totalUpload': 200.0,
+                                 'lastUpdate': 1700000000000}
+    assert values['monitoring'] is True
+    assert values['ready'] is True
+
+
+def test_each_write_advances_sequence_by_two(status):
+    before = SEQ.unpack_from(status._buf, 0)[0]
+    status.publish_history(1)
+    status.publish_history(2)
+    assert SEQ.unpack_from(status._buf, 0)[0] == before + 4
+
+
+def test_reader_waits_while_sequence_is_odd(status):
+    status.publish({'download': 1.0}, monitoring=True)
+    seq = SEQ.unpack_from(status._buf, 0)[0]
+    # Simula um escritor parado no meio da escrita
+    SEQ.pack_into(status._buf, 0, seq + 1)
+
+    done = Event()
+    result = {}
+
+    def reader():
+        result['values'] = status.read()
+        done.set()
+
+    thread = Thread(target=reader, daemon=True)
+    thread.start()
+    assert not done.wait(0.1)
+
+    SEQ.pack_into(status._buf, 0, seq + 2)
+    assert done.wait(2)
+    thread.join()
+    assert result['values']['current']['download'] == 1.0
+
+
+def test_concurrent_reads_are_consistent(status):
+    stop = Event()
+
+    def writer():
+        value = 0
+        while not stop.is_set():
+            value += 1
+            status.publish({'download': value, 'upload': value, 'totalDownload': value}, monitoring=True)
+
+    thread = Thread(target=writer, daemon=True)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 0.3
+        while time.monotonic() < deadline:
+            current = status.read()['current']
+            assert current['download'] == current['upload'] == current['totalDownload']
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,76 @@
+"""Cliente do speedtest-cli com servidor escolhido em cache"""
+
+import pytest
+
+import speedtest_client
+from speedtest_client import SpeedtestClientCache
+
+
+class FakeSpeedtest:
+    """Imita speedtest.Speedtest: configuração e escolha de servidor"""
+
+    created = 0
+
+    def __init__(self):
+        FakeSpeedtest.created += 1
+        self.config = {'length': {'download': 10, 'upload': 10}}
+        self.best = {'sponsor': 'ISP', 'name': 'Cidade'}
+        self.searches = []
+        self.fail = False
+
+    def get_best_server(self, servers=None):
+        self.searches.append(servers)
+        if self.fail:
+            raise OSError('servidor fora do ar')
+        return self.best
+
+
+@pytest.fixture(autouse=True)
+def reset_count():
+    FakeSpeedtest.created = 0
+
+
+def test_client_is_reused_and_only_pings_the_chosen_server():
+    cache = SpeedtestClientCache(FakeSpeedtest)
+
+    first = cache.acquire()
+    second = cache.acquire()
+
+    assert second is first
+    assert FakeSpeedtest.created == 1
+    assert cache.refreshes == 1
+    assert first.searches == [None, [first.best]]
+
+
+def test_expired_or_invalidated_client_is_replaced(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(speedtest_client.time, 'monotonic', lambda: now[0])
+    cache = SpeedtestClientCache(FakeSpeedtest, ttl=60)
+
+    first = cache.acquire()
+    now[0] += 61
+    second = cache.acquire()
+    cache.invalidate()
+    third = cache.acquire()
+
+    assert len({id(first), id(second), id(third)}) == 3
+    assert cache.refreshes == 3
+
+
+def test_unreachable_cached_server_triggers_new_choice():
+    cache = SpeedtestClientCache(FakeSpeedtest)
+    first = cache.acquire()
+    first.fail = True
+
+    second = cache.acquire()
+
+    assert second is not first
+    assert cache.refreshes == 2
+
+
+def test_quick_mode_limits_phase_length_without_changing_default():
+    cache = SpeedtestClientCache(FakeSpeedtest)
+
+    assert cache.acquire(quick_duration=4).config['length'] == {'download': 4, 'upload': 4}
+    assert cache.acquire().config['length'] == {'download': 10, 'upload': 10}
+    assert cache.acquire(quick_duration=30).config['length'] == {'download': 10, 'upload': 10}
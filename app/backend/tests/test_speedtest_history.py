@@ -0,0 +1,85 @@
+"""Série dos testes de velocidade em SQLite"""
+
+import pytest
+
+import app as monitor
+from speedtest_history import SpeedTestSeries
+from speedtest_jobs import SpeedTestJob
+
+HOUR = 60 * 60 * 1000
+BASE = 1704067200000
+
+
+def result(download, upload=10.0, ping=20.0, **extra):
+    return dict({'download': download, 'upload': upload, 'ping': ping,
+                 'server': {'name': 'Servidor', 'sponsor': 'ISP', 'country': 'Brasil'}}, **extra)
+
+
+@pytest.fixture
+def series(tmp_path):
+    series = SpeedTestSeries(str(tmp_path / 'speedtests.db'))
+    yield series
+    series.close()
+
+
+def test_append_and_query_range(series):
+    for hour in range(5):
+        series.append(BASE + hour * HOUR, result(100.0 + hour, quick=hour % 2), source='scheduled')
+
+    records = series.query_range(BASE + HOUR, BASE + 3 * HOUR)
+
+    assert [record['timestamp'] for record in records] == [BASE + HOUR, BASE + 2 * HOUR]
+    assert records[0]['download'] == 101.0
+    assert records[0]['quick'] is True
+    assert records[0]['source'] == 'scheduled'
+    assert records[0]['server'] == {'name': 'Servidor', 'sponsor': 'ISP', 'country': 'Brasil'}
+
+
+def test_limit_keeps_the_most_recent_in_order(series):
+    for hour in range(5):
+        series.append(BASE + hour * HOUR, result(float(hour)))
+
+    records = series.query_range(BASE, limit=2)
+
+    assert [record['download'] for record in records] == [3.0, 4.0]
+    assert series.latest()['download'] == 4.0
+
+
+def test_aggregate_and_summary(series):
+    for hour, download in enumerate((10.0, 30.0, 50.0, 70.0)):
+        series.append(BASE + hour * HOUR, result(download, ping=hour))
+
+    buckets = series.aggregate(2 * HOUR, BASE)
+
+    assert [bucket['timestamp'] for bucket in buckets] == [BASE, BASE + 2 * HOUR]
+    assert buckets[0]['samples'] == 2
+    assert (buckets[1]['download'], buckets[1]['downloadMin'], buckets[1]['downloadMax']) == (60.0, 50.0, 70.0)
+
+    summary = series.summary(BASE, BASE + 3 * HOUR)
+    assert summary['count'] == 3
+    assert summary['download'] == 30.0
+    assert summary['pingMax'] == 2
+    assert series.summary(BASE + 10 * HOUR)['count'] == 0
+
+
+def test_drop_expired(series):
+    for hour in range(4):
+        series.append(BASE + hour * HOUR, result(1.0))
+
+    assert series.drop_expired(BASE + 2 * HOUR) == 2
+    assert series.latest()['timestamp'] == BASE + 3 * HOUR
+    assert len(series.query_range(0)) == 2
+
+
+def test_simulated_results_are_not_recorded(series, monkeypatch):
+    monkeypatch.setitem(monitor.state, 'speedtest_series', series)
+    job = SpeedTestJob(source='scheduled')
+    job.finished = BASE / 1000
+
+    job.result = result(50.0, simulated=True)
+    monitor.record_speed_test(job)
+    assert series.latest() is None
+
+    job.result = result(50.0)
+    monitor.record_speed_test(job)
+    assert series.latest()['source'] == 'scheduled'
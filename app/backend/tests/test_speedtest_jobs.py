@@ -0,0 +1,203 @@
+"""Testes de velocidade em segundo plano: jobs, progresso e trava entre processos"""
+
+import json
+import datetime
+import threading
+
+import pytest
+
+import speedtest_jobs
+from speedtest_jobs import SpeedTestRunner, PeriodicSpeedTests, process_lock, STATUS_DONE, STATUS_ERROR
+
+TIMEOUT = 5
+
+
+class ControlledTest:
+    """run_test que só termina quando o teste libera"""
+
+    def __init__(self, result=None, error=None):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = []
+        self.result = result or {'download': 100.0, 'upload': 20.0}
+        self.error = error
+
+    def __call__(self, progress, **options):
+        self.calls.append(options)
+        progress('download', 0.5, {'download': 50.0})
+        self.started.set()
+        assert self.release.wait(TIMEOUT)
+        if self.error is not None:
+            raise self.error
+        progress('upload', 0.9, {'upload': 20.0})
+        return self.result
+
+
+def wait_done(runner, job):
+    # O stream de progresso termina quando o job termina
+    return [json.loads(event.decode().split('data: ', 1)[1]) for event in runner.stream(job)
+            if not event.startswith(b':')]
+
+
+def test_job_reports_progress_and_result():
+    run_test = ControlledTest()
+    completed = []
+    runner = SpeedTestRunner(run_test, on_complete=completed.append)
+
+    job, created = runner.submit(quick=True)
+    assert created
+    assert run_test.started.wait(TIMEOUT)
+    snapshot = runner.snapshot(job)
+    assert snapshot['phase'] == 'download'
+    assert snapshot['progress'] == 0.5
+    assert snapshot['partial'] == {'download': 50.0}
+    assert runner.busy
+
+    run_test.release.set()
+    events = wait_done(runner, job)
+
+    assert events[-1]['status'] == STATUS_DONE
+    assert events[-1]['result'] == run_test.result
+    assert events[-1]['progress'] == 1.0
+    assert run_test.calls == [{'quick': True}]
+    assert completed == [job]
+    assert not runner.busy
+    assert runner.latest() is job
+    assert runner.get(job.id) is job
+
+
+def test_requests_during_a_test_share_the_job():
+    run_test = ControlledTest()
+    runner = SpeedTestRunner(run_test)
+
+    job, _ = runner.submit()
+    again, created = runner.submit(quick=True)
+
+    assert again is job
+    assert not created
+    run_test.release.set()
+    wait_done(runner, job)
+    assert len(run_test.calls) == 1
+
+    # Terminado o teste, um novo pedido cria outro job
+    following, created = runner.submit()
+    assert created and following is not job
+    wait_done(runner, following)
+
+
+def test_failed_test_marks_job_as_error():
+    run_test = ControlledTest(error=RuntimeError('sem servidores'))
+    completed = []
+    runner = SpeedTestRunner(run_test, on_complete=completed.append)
+
+    job, _ = runner.submit()
+    run_test.release.set()
+    events = wait_done(runner, job)
+
+    assert events[-1]['status'] == STATUS_ERROR
+    assert events[-1]['error'] == 'sem servidores'
+    assert completed == []
+
+
+def test_only_the_newest_jobs_are_kept():
+    run_test = ControlledTest()
+    run_test.release.set()
+    runner = SpeedTestRunner(run_test, max_jobs=2)
+
+    jobs = []
+    for _ in range(3):
+        job, _ = runner.submit()
+        wait_done(runner, job)
+        jobs.append(job)
+
+    assert runner.get(jobs[0].id) is None
+    assert runner.get(jobs[2].id) is jobs[2]
+
+
+def process_lock_enter(path, waited, entered):
+    with process_lock(path, on_wait=lambda: waited.append(True)):
+        entered.set()
+
+
+@pytest.mark.skipif(not speedtest_jobs.FCNTL_AVAILABLE, reason='requer fcntl')
+def test_process_lock_waits_for_the_holder(tmp_path):
+    path = str(tmp_path / 'speedtest.lock')
+    waited = []
+    entered = threading.Event()
+
+    with process_lock(path):
+        # Cada open() é uma descrição de arquivo própria, como em outro processo
+        worker = threading.Thread(target=process_lock_enter, args=(path, waited, entered))
+        worker.start()
+        assert not entered.wait(0.3)
+    worker.join(TIMEOUT)
+
+    assert entered.is_set()
+    assert waited == [True]
+
+
+@pytest.mark.skipif(not speedtest_jobs.FCNTL_AVAILABLE, reason='requer fcntl')
+def test_job_waits_for_a_test_in_another_process(tmp_path):
+    path = str(tmp_path / 'speedtest.lock')
+    run_test = ControlledTest()
+    run_test.release.set()
+    runner = SpeedTestRunner(run_test, lock_path=path)
+
+    with process_lock(path):
+        job, _ = runner.submit()
+        assert not run_test.started.wait(0.3)
+        assert runner.snapshot(job)['phase'] == 'waiting'
+        assert runner.snapshot(job)['status'] == 'queued'
+    events = wait_done(runner, job)
+
+    assert events[-1]['status'] == STATUS_DONE
+
+
+# Testes periódicos
+
+def test_parse_windows_skips_invalid_entries():
+    assert speedtest_jobs.parse_windows(['22:00-06:30', 'sempre', '08:15 - 09:00']) == [
+        (22 * 60, 6 * 60 + 30), (8 * 60 + 15, 9 * 60)]
+    assert speedtest_jobs.parse_windows(None) == []
+
+
+def test_in_windows_handles_midnight():
+    windows = [(22 * 60, 6 * 60)]
+
+    assert speedtest_jobs.in_windows(datetime.datetime(2024, 1, 1, 23, 0), windows)
+    assert speedtest_jobs.in_windows(datetime.datetime(2024, 1, 1, 5, 59), windows)
+    assert not speedtest_jobs.in_windows(datetime.datetime(2024, 1, 1, 6, 0), windows)
+    assert speedtest_jobs.in_windows(datetime.datetime(2024, 1, 1, 12, 0), [])
+
+
+def test_next_window_start():
+    windows = [(2 * 60, 4 * 60), (13 * 60, 14 * 60)]
+
+    assert speedtest_jobs.next_window_start(datetime.datetime(2024, 1, 1, 12, 0), windows) == \
+        datetime.datetime(2024, 1, 1, 13, 0)
+    assert speedtest_jobs.next_window_start(datetime.datetime(2024, 1, 1, 15, 0), windows) == \
+        datetime.datetime(2024, 1, 2, 2, 0)
+
+
+def test_plan_applies_interval_and_jitter():
+    config = {'speedtestInterval': 3600, 'speedtestJitter': 60}
+    periodic = PeriodicSpeedTests(None, lambda: config)
+    start = datetime.datetime(2024, 1, 1, 12, 0).timestamp()
+
+    for _ in range(20):
+        assert start + 3540 <= periodic.plan(start) <= start + 3660
+
+
+def test_plan_moves_to_the_next_window():
+    config = {'speedtestInterval': 3600, 'speedtestJitter': 0, 'speedtestWindows': ['02:00-04:00']}
+    periodic = PeriodicSpeedTests(None, lambda: config)
+
+    planned = periodic.plan(datetime.datetime(2024, 1, 1, 12, 0).timestamp())
+
+    assert datetime.datetime.fromtimestamp(planned) == datetime.datetime(2024, 1, 2, 2, 0)
+
+
+def test_minimum_interval_is_one_minute():
+    periodic = PeriodicSpeedTests(None, lambda: {'speedtestInterval': 1, 'speedtestJitter': 0})
+
+    assert periodic.plan(1000.0) == 1060.0
@@ -0,0 +1,93 @@
+"""Servidor de vazão local: protocolo, limite de conexões e tempos limite"""
+
+import socket
+import time
+
+import pytest
+
+import throughput
+from throughput import ThroughputServer, measure, HEADER, COUNT, DOWNLOAD, UPLOAD, PAYLOAD
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(throughput, 'HEADER_TIMEOUT', 0.3)
+    monkeypatch.setattr(throughput, 'UPLOAD_GRACE', 0.2)
+    server = ThroughputServer(port=0, max_connections=1)
+    server.start()
+    yield server
+    server.stop()
+
+
+def connect(server):
+    return socket.create_connection(('127.0.0.1', server.port), timeout=5)
+
+
+def wait_closed(sock):
+    """Lê até o servidor fechar a conexão; retorna os bytes recebidos"""
+    data = b''
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return data
+        data += chunk
+
+
+def test_binds_to_loopback_by_default(server):
+    assert server.server_address[0] == '127.0.0.1'
+
+
+def test_download_and_upload_measure(server):
+    download = measure('127.0.0.1', server.port, DOWNLOAD, streams=1, duration=0.2)
+    assert download['bytes'] > 0
+    assert download['mbps'] > 0
+
+    upload = measure('127.0.0.1', server.port, UPLOAD, streams=1, duration=0.2)
+    # Bytes confirmados pelo servidor, não os enviados pelo cliente
+    assert upload['bytes'] > 0
+    assert upload['streams'][0]['error'] is None
+
+
+def test_idle_client_is_dropped_and_slot_released(server):
+    idle = connect(server)
+    try:
+        started = time.monotonic()
+        # O cliente nunca envia o cabeçalho: o servidor fecha após HEADER_TIMEOUT
+        assert wait_closed(idle) == b''
+        assert time.monotonic() - started < 3
+    finally:
+        idle.close()
+
+    # A vaga única voltou a ficar livre
+    result = measure('127.0.0.1', server.port, DOWNLOAD, streams=1, duration=0.1)
+    assert result['bytes'] > 0
+    assert server.rejected == 0
+
+
+def test_connections_beyond_limit_are_rejected(server):
+    busy = connect(server)
+    try:
+        busy.sendall(HEADER.pack(DOWNLOAD, 1000))
+        busy.recv(1)
+        extra = connect(server)
+        try:
+            assert wait_closed(extra) == b''
+        finally:
+            extra.close()
+        assert server.rejected == 1
+    finally:
+        busy.close()
+
+
+def test_upload_stops_at_duration_plus_grace(server):
+    sock = connect(server)
+    try:
+        sock.sendall(HEADER.pack(UPLOAD, 100))
+        sock.sendall(PAYLOAD[:65536])
+        started = time.monotonic()
+        # O cliente não fecha a escrita: o servidor responde ao fim da duração mais a folga
+        received = COUNT.unpack(wait_closed(sock)[:COUNT.size])[0]
+        assert received == 65536
+        assert time.monotonic() - started < 3
+    finally:
+        sock.close()
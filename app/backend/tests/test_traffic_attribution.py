@@ -0,0 +1,115 @@
+"""Leitura das conexões TCP: mensagens sock_diag e /proc/net/tcp"""
+
+import socket
+import struct
+
+import pytest
+
+from traffic_attribution import SockDiagReader, parse_proc_net
+
+INET_DIAG_INFO = 2
+INET_DIAG_MEMINFO = 1
+TCP_ESTABLISHED = 1
+TCP_INFO_SIZE = 232
+
+
+def inet_diag_msg(family, state, src, sport, dst, dport, inode):
+    """inet_diag_msg (linux/inet_diag.h) na ordem do host, portas e endereços em ordem de rede"""
+    return struct.pack('=BBBB', family, state, 0, 0) + struct.pack('!HH', sport, dport) + \
+        src.ljust(16, b'\x00') + dst.ljust(16, b'\x00') + \
+        struct.pack('=I', 2) + b'\xff' * 8 + struct.pack('=IIIII', 0, 0, 0, 1000, inode)
+
+
+def attribute(kind, payload):
+    length = 4 + len(payload)
+    return struct.pack('=HH', length, kind) + payload + b'\x00' * (-length % 4)
+
+
+def tcp_info(bytes_acked, bytes_received):
+    info = bytearray(TCP_INFO_SIZE)
+    # tcpi_bytes_acked e tcpi_bytes_received (linux/tcp.h, kernel >= 4.2)
+    struct.pack_into('=QQ', info, 120, bytes_acked, bytes_received)
+    return bytes(info)
+
+
+def parse(message):
+    # Como em _dump: a mensagem começa após um cabeçalho netlink de 16 bytes
+    data = b'\x00' * 16 + message
+    return SockDiagReader._parse(data, 16, len(data))
+
+
+def test_parse_ipv4_connection_with_byte_counters():
+    message = (inet_diag_msg(socket.AF_INET, TCP_ESTABLISHED, bytes([192, 168, 1, 10]), 51234,
+                             bytes([93, 184, 216, 34]), 443, inode=987654)
+               # Atributo de tamanho não múltiplo de 4 antes do tcp_info: exige alinhamento
+               + attribute(INET_DIAG_MEMINFO, b'\x01\x02\x03\x04\x05')
+               + attribute(INET_DIAG_INFO, tcp_info(123456789012, 42)))
+
+    connection = parse(message)
+
+    assert connection.inode == 987654
+    assert connection.protocol == 'tcp'
+    assert connection.local == '192.168.1.10:51234'
+    assert connection.remote == '93.184.216.34:443'
+    assert connection.state == 'ESTABLISHED'
+    assert (connection.sent, connection.received) == (123456789012, 42)
+    assert connection.pid is None
+
+
+def test_parse_ipv6_connection():
+    src = socket.inet_pton(socket.AF_INET6, '2001:db8::1')
+    dst = socket.inet_pton(socket.AF_INET6, '::1')
+    message = (inet_diag_msg(socket.AF_INET6, 8, src, 8080, dst, 60000, inode=5)
+               + attribute(INET_DIAG_INFO, tcp_info(1, 2)))
+
+    connection = parse(message)
+
+    assert connection.local == '[2001:db8::1]:8080'
+    assert connection.remote == '[::1]:60000'
+    assert connection.state == 'CLOSE_WAIT'
+
+
+def test_parse_fixed_buffer():
+    # 127.0.0.1:8080 -> 127.0.0.1:40000, inode 4096, 300 bytes enviados e 200 recebidos
+    message = bytes.fromhex(
+        '02010000' '1f909c40'
+        '7f000001' + '00' * 12 +
+        '7f000001' + '00' * 12 +
+        '00000000' + 'ff' * 8 +
+        '00000000' * 4 + struct.pack('=I', 4096).hex()
+    ) + struct.pack('=HH', 4 + TCP_INFO_SIZE, INET_DIAG_INFO) + tcp_info(300, 200)
+
+    connection = parse(message)
+
+    assert connection[:7] == (4096, 'tcp', '127.0.0.1:8080', '127.0.0.1:40000', 'ESTABLISHED', 300, 200)
+
+
+def test_parse_time_wait_without_inode():
+    message = (inet_diag_msg(socket.AF_INET, 6, bytes(4), 1, bytes(4), 2, inode=0)
+               + attribute(INET_DIAG_INFO, tcp_info(1, 2)))
+    assert parse(message) is None
+
+
+def test_parse_without_byte_counters_raises():
+    # tcp_info de kernels anteriores ao 4.2 termina antes de tcpi_bytes_acked
+    message = (inet_diag_msg(socket.AF_INET, TCP_ESTABLISHED, bytes(4), 1, bytes(4), 2, inode=7)
+               + attribute(INET_DIAG_INFO, bytes(104)))
+    with pytest.raises(OSError):
+        parse(message)
+
+
+def test_parse_proc_net_tcp():
+    data = (
+        b'  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n'
+        b'   0: 0100007F:0035 00000000:0000 0A 00000000:00000000 00:00000000 00000000   101        0 1111 1\n'
+        b'   1: 0A01A8C0:C822 22D8B85D:01BB 01 00000000:00000000 00:00000000 00000000  1000        0 2222 1\n'
+        b'   2: 0A01A8C0:C823 22D8B85D:01BB 06 00000000:00000000 03:00000000 00000000     0        0 0 3\n'
+    )
+    if struct.pack('=I', 1) != struct.pack('<I', 1):
+        pytest.skip('endereços de /proc/net/tcp no exemplo estão em little-endian')
+
+    connections = parse_proc_net(data, 'tcp')
+
+    assert len(connections) == 1
+    assert connections[0][:7] == (2222, 'tcp', '192.168.1.10:51234', '93.184.216.34:443',
+                                  'ESTABLISHED', None, None)
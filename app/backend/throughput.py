@@ -0,0 +1,249 @@
+"""
+Monitor de Rede - Teste de velocidade local contra um servidor de vazão embutido
+Para medir a capacidade da rede local (ou testar sem internet), o aplicativo
+pode abrir um servidor TCP de vazão em uma porta própria. O download é servido
+a partir de um buffer pré-alocado exposto como memoryview (sendall sem cópias
+por bloco) e o upload é descartado em um buffer fixo via recv_into. O caminho
+não passa pelo WSGI: cada conexão tem sua própria thread, que libera o GIL
+durante as chamadas de socket.
+
+O cliente abre várias conexões TCP em paralelo e informa a vazão por conexão
+e a agregada.
+
+O servidor não autentica os clientes: por padrão ouve apenas em 127.0.0.1 e
+aceita no máximo max_connections conexões simultâneas; as excedentes são
+fechadas sem resposta. Conexões que não enviam o cabeçalho em HEADER_TIMEOUT
+segundos, ou que ficam paradas por IO_TIMEOUT segundos, são encerradas, e o
+upload é lido no máximo até a duração pedida mais UPLOAD_GRACE segundos.
+
+Protocolo (por conexão): o cliente envia o cabeçalho '!cI' com a direção
+(b'D' download, b'U' upload) e a duração em ms. No download o servidor envia
+dados até a duração acabar e fecha a conexão; no upload o cliente envia até a
+duração acabar, fecha a escrita e recebe '!Q' com os bytes que o servidor leu.
+"""
+
+import os
+import time
+import socket
+import struct
+import logging
+import socketserver
+from threading import BoundedSemaphore, Thread
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 5201
+DEFAULT_BIND = '127.0.0.1'
+DEFAULT_MAX_CONNECTIONS = 16
+HEADER = struct.Struct('!cI')
+COUNT = struct.Struct('!Q')
+BLOCK_SIZE = 1024 * 1024
+SOCKET_BUFFER = 4 * 1024 * 1024
+MAX_DURATION_MS = 60 * 1000
+# Tempos limite (s): cabeçalho, cada operação de socket e folga do upload após a duração
+HEADER_TIMEOUT = 5.0
+IO_TIMEOUT = 10.0
+UPLOAD_GRACE = 2.0
+
+DOWNLOAD = b'D'
+UPLOAD = b'U'
+
+# Bloco único enviado repetidamente no download (bytes aleatórios, não compressíveis)
+PAYLOAD = memoryview(bytearray(os.urandom(BLOCK_SIZE)))
+
+
+def tune_socket(sock):
+    for option in (socket.SO_SNDBUF, socket.SO_RCVBUF):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, option, SOCKET_BUFFER)
+        except OSError:
+            pass
+
+
+def recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('Conexão encerrada durante o cabeçalho')
+        data += chunk
+    return data
+
+
+class ThroughputHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        tune_socket(sock)
+        # Sem tempo limite um cliente parado prenderia a thread e a vaga da conexão
+        sock.settimeout(HEADER_TIMEOUT)
+        try:
+            direction, duration_ms = HEADER.unpack(recv_exact(sock, HEADER.size))
+        except (OSError, struct.error):
+            return
+        duration = min(duration_ms, MAX_DURATION_MS) / 1000
+        sock.settimeout(IO_TIMEOUT)
+
+        if direction == DOWNLOAD:
+            deadline = time.monotonic() + duration
+            try:
+                while time.monotonic() < deadline:
+                    sock.sendall(PAYLOAD)
+            except OSError:
+                # Cliente encerrou antes do fim ou parou de ler
+                pass
+        elif direction == UPLOAD:
+            # Dados descartados em um buffer fixo, sem alocação por leitura
+            sink = memoryview(bytearray(BLOCK_SIZE))
+            received = 0
+            deadline = time.monotonic() + duration + UPLOAD_GRACE
+            try:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    sock.settimeout(min(remaining, IO_TIMEOUT))
+                    count = sock.recv_into(sink)
+                    if not count:
+                        break
+                    received += count
+            except socket.timeout:
+                # Duração esgotada (ou cliente parado): responde com o que foi lido
+                pass
+            except OSError:
+                return
+            try:
+                sock.settimeout(IO_TIMEOUT)
+                sock.sendall(COUNT.pack(received))
+            except OSError:
+                pass
+
+
+class ThroughputServer(socketserver.ThreadingTCPServer):
+    """Servidor TCP de vazão; uma thread por conexão, até max_connections"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host=DEFAULT_BIND, port=DEFAULT_PORT, max_connections=DEFAULT_MAX_CONNECTIONS):
+        super().__init__((host, port), ThroughputHandler)
+        self.max_connections = max(1, int(max_connections))
+        self.rejected = 0
+        self._slots = BoundedSemaphore(self.max_connections)
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            self.shutdown_request(request)
+            return
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            # Libera a vaga antes de fechar: o cliente pode reconectar logo ao ver o EOF
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def start(self):
+        self._thread = Thread(target=self.serve_forever, name='throughput-server', daemon=True)
+        self._thread.start()
+        logger.info(f"Servidor de vazão ouvindo em {self.server_address[0]}:{self.port}")
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def _stream(host, port, direction, duration, result):
+    """Executa uma conexão do teste e preenche result com bytes, tempo e latência"""
+    started = time.monotonic()
+    sock = socket.create_connection((host, port), timeout=duration + 10)
+    result['connect'] = time.monotonic() - started
+    try:
+        tune_socket(sock)
+        sock.sendall(HEADER.pack(direction, int(duration * 1000)))
+        started = time.monotonic()
+        total = 0
+        if direction == DOWNLOAD:
+            buffer = memoryview(bytearray(BLOCK_SIZE))
+            while True:
+                count = sock.recv_into(buffer)
+                if not count:
+                    break
+                total += count
+                result['bytes'] = total
+            elapsed = time.monotonic() - started
+        else:
+            deadline = started + duration
+            while time.monotonic() < deadline:
+                sock.sendall(PAYLOAD)
+                total += len(PAYLOAD)
+                result['bytes'] = total
+            elapsed = time.monotonic() - started
+            sock.shutdown(socket.SHUT_WR)
+            # Bytes efetivamente recebidos pelo servidor
+            total = COUNT.unpack(recv_exact(sock, COUNT.size))[0]
+        result['bytes'] = total
+        result['elapsed'] = elapsed
+    finally:
+        sock.close()
+
+
+def measure(host, port, direction, streams=4, duration=10.0, progress=None):
+    """Mede a vazão em uma direção com conexões paralelas
+
+    Retorna {'mbps', 'bytes', 'elapsed', 'latency', 'streams': [{'mbps', 'bytes'}, ...]}.
+    progress(fraction) é chamado periodicamente com a fração do tempo decorrido.
+    """
+    results = [{'bytes': 0, 'elapsed': 0.0, 'connect': 0.0, 'error': None} for _ in range(max(1, streams))]
+
+    def run(result):
+        try:
+            _stream(host, port, direction, duration, result)
+        except OSError as e:
+            result['error'] = str(e)
+
+    threads = [Thread(target=run, args=(result,), daemon=True) for result in results]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        threads[0].join(timeout=0.25)
+        if progress is not None:
+            progress(min((time.monotonic() - started) / duration, 1.0))
+    wall = time.monotonic() - started
+
+    errors = [result['error'] for result in results if result['error']]
+    if len(errors) == len(results):
+        raise ConnectionError(f"Servidor de vazão {host}:{port} indisponível: {errors[0]}")
+
+    per_stream = []
+    for result in results:
+        elapsed = result['elapsed'] or wall
+        per_stream.append({
+            'bytes': result['bytes'],
+            'mbps': result['bytes'] * 8 / elapsed / 1_000_000 if elapsed > 0 else 0.0,
+            'error': result['error']
+        })
+    total = sum(result['bytes'] for result in results)
+    elapsed = max(result['elapsed'] for result in results) or wall
+    connected = [result['connect'] for result in results if not result['error']]
+    return {
+        'bytes': total,
+        'elapsed': elapsed,
+        'mbps': total * 8 / elapsed / 1_000_000 if elapsed > 0 else 0.0,
+        'latency': sum(connected) / len(connected) * 1000 if connected else 0.0,
+        'streams': per_stream
+    }
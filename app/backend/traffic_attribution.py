@@ -0,0 +1,497 @@
+"""
+Monitor de Rede - Tráfego por conexão e por processo
+A cada intervalo as conexões TCP são lidas do kernel com seus contadores de
+bytes (sock_diag via netlink, campos bytes_acked/bytes_received de tcp_info)
+e a diferença desde a leitura anterior vira a taxa de cada conexão. O dono de
+cada socket é encontrado pelo inode, em um cache inode -> pid mantido de forma
+incremental: só processos novos têm /proc/<pid>/fd percorrido a cada ciclo, e a
+varredura completa só acontece quando aparecem sockets desconhecidos, no máximo
+uma vez a cada rescan_interval segundos.
+
+Sem sock_diag (kernels antigos, outros sistemas) as conexões vêm de
+/proc/net/tcp*, /proc/net/udp* ou psutil.net_connections, que não trazem
+contadores de bytes: os processos passam a ser classificados pelo número de
+conexões. Bytes de conexões encerradas entre duas leituras não são contados.
+"""
+
+import os
+import time
+import heapq
+import socket
+import struct
+import logging
+from collections import namedtuple
+from threading import Event, Thread
+
+logger = logging.getLogger(__name__)
+
+PSUTIL_AVAILABLE = True
+try:
+    import psutil
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+PROC = '/proc'
+
+# Conexão lida do kernel; sent/received são None quando não há contadores
+Connection = namedtuple('Connection', ('inode', 'protocol', 'local', 'remote', 'state', 'sent', 'received', 'pid'),
+                        defaults=(None,))
+
+# netlink / sock_diag (linux/netlink.h, linux/sock_diag.h, linux/inet_diag.h)
+NETLINK_SOCK_DIAG = 4
+SOCK_DIAG_BY_FAMILY = 20
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+INET_DIAG_INFO = 2
+TCP_LISTEN = 10
+
+NLMSG_HEADER = struct.Struct('=IHHII')
+INET_DIAG_REQ = struct.Struct('=BBBxI48s')
+INET_DIAG_MSG = struct.Struct('=BBBB2s2s16s16sI8sIIIII')
+RTA_HEADER = struct.Struct('=HH')
+PORT = struct.Struct('!H')
+
+# tcpi_bytes_acked e tcpi_bytes_received em struct tcp_info (Linux 4.2+)
+TCP_INFO_BYTES = struct.Struct('=QQ')
+TCP_INFO_BYTES_OFFSET = 120
+
+TCP_STATES = {
+    1: 'ESTABLISHED', 2: 'SYN_SENT', 3: 'SYN_RECV', 4: 'FIN_WAIT1', 5: 'FIN_WAIT2',
+    6: 'TIME_WAIT', 7: 'CLOSE', 8: 'CLOSE_WAIT', 9: 'LAST_ACK', 10: 'LISTEN', 11: 'CLOSING'
+}
+
+BY_PROCESS = 'process'
+BY_CONNECTION = 'connection'
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def _endpoint(family, address, port):
+    size = 4 if family == socket.AF_INET else 16
+    host = socket.inet_ntop(family, address[:size])
+    return f'[{host}]:{port}' if family == socket.AF_INET6 else f'{host}:{port}'
+
+
+class SockDiagReader:
+    """Lê as conexões TCP com contadores de bytes por um socket NETLINK_SOCK_DIAG"""
+
+    source = 'sock_diag'
+
+    def __init__(self):
+        self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_SOCK_DIAG)
+        self._sequence = 0
+        # Valida o suporte a tcp_info com contadores de bytes já na abertura
+        try:
+            self.read()
+        except OSError:
+            self._sock.close()
+            raise
+
+    def read(self):
+        connections = {}
+        for family in (socket.AF_INET, socket.AF_INET6):
+            for connection in self._dump(family):
+                connections[connection.inode] = connection
+        return connections
+
+    def _dump(self, family):
+        self._sequence += 1
+        request = INET_DIAG_REQ.pack(family, socket.IPPROTO_TCP, 1 << (INET_DIAG_INFO - 1),
+                                     0xffffffff & ~(1 << TCP_LISTEN), b'')
+        header = NLMSG_HEADER.pack(NLMSG_HEADER.size + len(request), SOCK_DIAG_BY_FAMILY,
+                                   NLM_F_REQUEST | NLM_F_DUMP, self._sequence, 0)
+        self._sock.send(header + request)
+
+        while True:
+            data = self._sock.recv(65536)
+            offset = 0
+            while offset + NLMSG_HEADER.size <= len(data):
+                length, kind, _, _, _ = NLMSG_HEADER.unpack_from(data, offset)
+                if kind == NLMSG_DONE:
+                    return
+                if kind == NLMSG_ERROR:
+                    error = struct.unpack_from('=i', data, offset + NLMSG_HEADER.size)[0]
+                    raise OSError(-error, os.strerror(-error))
+                connection = self._parse(data, offset + NLMSG_HEADER.size, offset + length)
+                if connection is not None:
+                    yield connection
+                offset += _align(length)
+
+    @staticmethod
+    def _parse(data, start, end):
+        (family, state, _, _, sport, dport, src, dst,
+         _, _, _, _, _, _, inode) = INET_DIAG_MSG.unpack_from(data, start)
+        if not inode:
+            # TIME_WAIT: sem socket de usuário
+            return None
+        sent = received = None
+        offset = start + INET_DIAG_MSG.size
+        while offset + RTA_HEADER.size <= end:
+            length, kind = RTA_HEADER.unpack_from(data, offset)
+            if length < RTA_HEADER.size:
+                break
+            if kind == INET_DIAG_INFO and length - RTA_HEADER.size >= TCP_INFO_BYTES_OFFSET + TCP_INFO_BYTES.size:
+                sent, received = TCP_INFO_BYTES.unpack_from(data, offset + RTA_HEADER.size + TCP_INFO_BYTES_OFFSET)
+            offset += _align(length)
+        if sent is None:
+            raise OSError('tcp_info sem contadores de bytes (kernel anterior ao 4.2)')
+        return Connection(inode, 'tcp', _endpoint(family, src, PORT.unpack(sport)[0]),
+                          _endpoint(family, dst, PORT.unpack(dport)[0]),
+                          TCP_STATES.get(state, str(state)), sent, received)
+
+    def close(self):
+        self._sock.close()
+
+
+def _proc_address(value):
+    """Converte "0100007F:0035" (/proc/net/tcp) em "127.0.0.1:53" """
+    address, _, port = value.partition(':')
+    raw = bytes.fromhex(address)
+    # Cada palavra de 32 bits está na ordem do host
+    raw = b''.join(struct.pack('>I', struct.unpack('=I', raw[i:i + 4])[0]) for i in range(0, len(raw), 4))
+    family = socket.AF_INET if len(raw) == 4 else socket.AF_INET6
+    return _endpoint(family, raw, int(port, 16))
+
+
+def parse_proc_net(data, protocol):
+    """Conexões de /proc/net/{tcp,tcp6,udp,udp6} (sem contadores de bytes)"""
+    connections = []
+    for line in data.split(b'\n')[1:]:
+        fields = line.split()
+        if len(fields) < 10:
+            continue
+        inode = int(fields[9])
+        state = int(fields[3], 16)
+        if not inode or (protocol == 'tcp' and state == TCP_LISTEN):
+            continue
+        connections.append(Connection(
+            inode, protocol, _proc_address(fields[1].decode('ascii')), _proc_address(fields[2].decode('ascii')),
+            TCP_STATES.get(state, str(state)) if protocol == 'tcp' else None, None, None))
+    return connections
+
+
+class ProcNetReader:
+    """Lista as conexões de /proc/net/tcp*, /proc/net/udp*"""
+
+    source = 'proc'
+    FILES = (('tcp', 'tcp'), ('tcp6', 'tcp'), ('udp', 'udp'), ('udp6', 'udp'))
+
+    def __init__(self, proc=PROC):
+        self.proc = proc
+
+    def read(self):
+        connections = {}
+        for name, protocol in self.FILES:
+            try:
+                with open(os.path.join(self.proc, 'net', name), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                continue
+            for connection in parse_proc_net(data, protocol):
+                connections[connection.inode] = connection
+        return connections
+
+    def close(self):
+        pass
+
+
+class PsutilReader:
+    """Conexões de psutil.net_connections, que já informam o pid"""
+
+    source = 'psutil'
+
+    def read(self):
+        connections = {}
+        for index, conn in enumerate(psutil.net_connections(kind='inet')):
+            if conn.status == psutil.CONN_LISTEN:
+                continue
+            local = f'{conn.laddr.ip}:{conn.laddr.port}' if conn.laddr else ''
+            remote = f'{conn.raddr.ip}:{conn.raddr.port}' if conn.raddr else ''
+            protocol = 'tcp' if conn.type == socket.SOCK_STREAM else 'udp'
+            # Sem inode: a chave é a própria conexão
+            key = (protocol, local, remote, conn.pid, index if not conn.raddr else 0)
+            connections[key] = Connection(key, protocol, local, remote, conn.status, None, None, conn.pid)
+        return connections
+
+    def close(self):
+        pass
+
+
+def open_reader():
+    """Melhor fonte disponível: sock_diag, /proc/net ou psutil"""
+    if hasattr(socket, 'AF_NETLINK'):
+        try:
+            return SockDiagReader()
+        except OSError as e:
+            logger.info(f"sock_diag indisponível ({e}); conexões lidas sem contadores de bytes")
+    if os.path.exists(os.path.join(PROC, 'net', 'tcp')):
+        return ProcNetReader()
+    if PSUTIL_AVAILABLE:
+        return PsutilReader()
+    return None
+
+
+class ProcessIndex:
+    """Cache inode -> pid atualizado de forma incremental (varredura completa limitada)"""
+
+    def __init__(self, proc=PROC, rescan_interval=30.0, clock=time.monotonic):
+        self.proc = proc
+        self.rescan_interval = rescan_interval
+        self.clock = clock
+        self.scans = 0
+        self.rescans = 0
+        self._pids = {}
+        self._owners = {}
+        self._started = {}
+        self._pending = set()
+        self._negative = set()
+        self._last_rescan = None
+
+    def _scan(self, pid):
+        """Lê os sockets de um processo; retorna (nome, {inodes})"""
+        self.scans += 1
+        fd_dir = os.path.join(self.proc, str(pid), 'fd')
+        inodes = set()
+        try:
+            for fd in os.listdir(fd_dir):
+                try:
+                    target = os.readlink(os.path.join(fd_dir, fd))
+                except OSError:
+                    continue
+                if target.startswith('socket:['):
+                    inodes.add(int(target[8:-1]))
+        except OSError:
+            # Processo encerrado ou sem permissão
+            pass
+        try:
+            with open(os.path.join(self.proc, str(pid), 'comm'), 'rb') as f:
+                name = f.read().strip().decode('utf-8', 'replace')
+        except OSError:
+            name = str(pid)
+        return name, inodes
+
+    def _index(self, pid):
+        name, inodes = self._scan(pid)
+        previous = self._pids.get(pid)
+        if previous is not None:
+            for inode in previous[1] - inodes:
+                self._owners.pop(inode, None)
+        self._pids[pid] = (name, inodes)
+        for inode in inodes:
+            self._owners[inode] = pid
+
+    def _forget(self, pid):
+        self._started.pop(pid, None)
+        _, inodes = self._pids.pop(pid)
+        for inode in inodes:
+            if self._owners.get(inode) == pid:
+                del self._owners[inode]
+
+    def resolve(self, inodes):
+        """Retorna {inode: pid} para os inodes informados"""
+        pids = {int(name) for name in os.listdir(self.proc) if name.isdigit()}
+        for pid in self._pids.keys() - pids:
+            self._forget(pid)
+        now = self.clock()
+        # Processos novos são lidos assim que aparecem
+        for pid in pids - self._pids.keys():
+            self._index(pid)
+            if self._last_rescan is not None:
+                self._started[pid] = now
+
+        if self._last_rescan is None:
+            # Primeira chamada: todos os processos acabaram de ser lidos
+            self._last_rescan = now
+        else:
+            missing = {inode for inode in inodes
+                       if inode not in self._owners and inode not in self._negative}
+            if missing - self._pending:
+                # Inodes novos sem dono: relê só os processos que surgiram há pouco,
+                # que costumam abrir conexões logo depois da primeira leitura
+                recent = now - self.rescan_interval
+                for pid, started in list(self._started.items()):
+                    if started > recent:
+                        self._index(pid)
+                    else:
+                        del self._started[pid]
+                missing = {inode for inode in missing if inode not in self._owners}
+            if missing and now - self._last_rescan >= self.rescan_interval:
+                # Varredura de todos os processos, no máximo uma a cada rescan_interval
+                self.rescans += 1
+                self._last_rescan = now
+                for pid in list(self._pids):
+                    self._index(pid)
+                missing = {inode for inode in missing if inode not in self._owners}
+                # Sem dono mesmo assim (outro namespace, sem permissão): não é procurado de novo
+                self._negative.update(missing)
+                missing = set()
+            self._pending = missing
+
+        # Consultas negativas valem enquanto a conexão existir
+        self._negative.intersection_update(inodes)
+        return {inode: self._owners[inode] for inode in inodes if inode in self._owners}
+
+    def name(self, pid):
+        entry = self._pids.get(pid)
+        return entry[0] if entry is not None else None
+
+
+class TrafficAttribution:
+    """Amostra periodicamente o tráfego por conexão e o agrega por processo
+
+    get_config() fornece trafficAttribution (ativo), trafficInterval e
+    trafficRescanInterval a cada ciclo. on_sample(attribution) é chamado após
+    cada amostra.
+    """
+
+    def __init__(self, get_config, on_sample=None, reader=None, index=None):
+        self.get_config = get_config
+        self.on_sample = on_sample
+        self.reader = reader
+        self.index = index
+        self.connections = []
+        self.processes = []
+        self.timestamp = None
+        self.interval = None
+        self.samples = 0
+        self._previous = None
+        self._last_time = None
+        self._stop = Event()
+        self._thread = None
+
+    @property
+    def source(self):
+        return self.reader.source if self.reader is not None else None
+
+    @property
+    def has_bytes(self):
+        return self.source == SockDiagReader.source
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._loop, name='traffic-attribution', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def _loop(self):
+        try:
+            while True:
+                config = self.get_config()
+                interval = max(float(config.get('trafficInterval', 5)), 0.5)
+                if config.get('trafficAttribution'):
+                    try:
+                        self.sample()
+                    except Exception as e:
+                        logger.error(f"Erro ao amostrar o tráfego por processo: {e}")
+                        # Reabre a fonte no próximo ciclo (resposta netlink pode ter ficado pela metade)
+                        if self.reader is not None:
+                            self.reader.close()
+                            self.reader = None
+                        self._previous = None
+                elif self._previous is not None:
+                    # Desativado: a próxima ativação começa de uma nova linha de base
+                    self._previous = None
+                if self._stop.wait(interval):
+                    break
+        finally:
+            if self.reader is not None:
+                self.reader.close()
+
+    def sample(self):
+        if self.reader is None:
+            self.reader = open_reader()
+            if self.reader is None:
+                raise RuntimeError('Nenhuma fonte de conexões disponível')
+        if self.index is None and not isinstance(self.reader, PsutilReader):
+            self.index = ProcessIndex()
+        if self.index is not None:
+            self.index.rescan_interval = float(self.get_config().get('trafficRescanInterval', 30))
+
+        connections = self.reader.read()
+        now = time.monotonic()
+        owners = self.index.resolve(connections.keys()) if self.index is not None else {}
+
+        baseline = self._previous is None
+        elapsed = now - self._last_time if not baseline else 0
+        scale = 8 / elapsed / 1_000_000 if elapsed > 0 else 0.0
+        previous = self._previous or {}
+
+        rows = []
+        processes = {}
+        for key, connection in connections.items():
+            pid = connection.pid if connection.pid is not None else owners.get(key)
+            row = {
+                'protocol': connection.protocol,
+                'local': connection.local,
+                'remote': connection.remote,
+                'state': connection.state,
+                'pid': pid,
+                'process': self.index.name(pid) if self.index is not None and pid is not None else None,
+                'download': 0.0,
+                'upload': 0.0,
+                'received': 0,
+                'sent': 0
+            }
+            if connection.sent is not None and not baseline:
+                # Conexão nova desde a última leitura: todos os bytes são do intervalo
+                last_sent, last_received = previous.get(key, (0, 0))
+                row['sent'] = max(connection.sent - last_sent, 0)
+                row['received'] = max(connection.received - last_received, 0)
+                row['upload'] = row['sent'] * scale
+                row['download'] = row['received'] * scale
+            rows.append(row)
+
+            process = processes.get(pid)
+            if process is None:
+                process = processes[pid] = {
+                    'pid': pid, 'process': row['process'], 'connections': 0,
+                    'download': 0.0, 'upload': 0.0, 'received': 0, 'sent': 0
+                }
+            process['connections'] += 1
+            for field in ('download', 'upload', 'received', 'sent'):
+                process[field] += row[field]
+
+        self._previous = {key: (connection.sent, connection.received)
+                          for key, connection in connections.items() if connection.sent is not None}
+        self._last_time = now
+        self.connections = rows
+        self.processes = list(processes.values())
+        self.timestamp = time.time() * 1000
+        self.interval = elapsed
+        self.samples += 1
+
+        if self.on_sample is not None:
+            self.on_sample(self)
+
+    def top(self, count=10, by=BY_PROCESS):
+        """Os count maiores (taxa total, ou número de conexões sem contadores de bytes)"""
+        items = self.processes if by == BY_PROCESS else self.connections
+        if self.has_bytes:
+            key = lambda item: item['download'] + item['upload']
+        else:
+            key = lambda item: item.get('connections', 1)
+        # Seleção com heap: O(n log k), sem ordenar todas as conexões
+        return heapq.nlargest(max(int(count), 0), items, key=key)
+
+    def stats(self):
+        return {
+            'source': self.source,
+            'bytes': self.has_bytes,
+            'timestamp': self.timestamp,
+            'interval': self.interval,
+            'samples': self.samples,
+            'connections': len(self.connections),
+            'processes': len(self.processes),
+            'fdScans': self.index.scans if self.index is not None else 0,
+            'rescans': self.index.rescans if self.index is not None else 0
+        }
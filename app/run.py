@@ -46,7 +46,8 @@ REQUIRED_PACKAGES = [
 OPTIONAL_PACKAGES = [
     'reportlab',  # Para geração de PDF, pode requerer compilação
     'speedtest-cli',  # Para testes de velocidade
-    'netifaces'   # Para detalhes de rede, pode requerer compilação
+    'netifaces',  # Para detalhes de rede, pode requerer compilação
+    'waitress'    # Servidor WSGI de produção (multithread, funciona no Windows)
 ]
 
 # Configurações